@@ -0,0 +1,145 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Throughput and latency of GET /submissions?limit=<page_size> and
+GET /submissions/<id> under concurrent clients, served by the Flask
+development server, single-threaded and threaded, and by waitress with
+several numbers of threads, when it is installed. Each server runs in
+a process of its own, over a temporary SQLite database with finished
+submissions.
+
+Usage: PYTHONPATH=. python benchmarks/api_server.py [clients]
+    [seconds] [submissions] [page_size]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+PORT = 15321
+
+SERVERS = [('development', 1), ('development', 8), ('waitress', 4),
+           ('waitress', 8), ('waitress', 16)]
+
+
+def serve(server, threads, submissions, path):
+    import datetime
+    import peewee
+
+    from broker.persistence.sqlite.model import JobIndex, JobPayload
+
+    peewee.SqliteDatabase(path).bind([JobIndex, JobPayload])
+
+    from flask import Flask
+    from broker.api.v10 import rest
+    from broker.service.api import v10
+    from kubejobs import KubeJobsExecutor
+
+    states = {}
+    for i in range(submissions):
+        job = KubeJobsExecutor('kj-%07d' % i, status='completed',
+                               data={'cmd': ['run'], 'img': 'job'})
+        job.starting_time = datetime.datetime(2019, 1, 1)
+        states[job.app_id] = job
+        v10.submissions[job.app_id] = job
+    v10.db_connector.put_many(states)
+
+    app = Flask(__name__)
+    app.register_blueprint(rest)
+    if server == 'waitress':
+        import waitress
+        waitress.serve(app, host='127.0.0.1', port=PORT, threads=threads,
+                       _quiet=True)
+    else:
+        app.run(host='127.0.0.1', port=PORT, threaded=threads > 1)
+
+
+def load(url, clients, seconds):
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.time() + seconds
+
+    def client():
+        session = requests.Session()
+        own = []
+        while time.time() < deadline:
+            start = time.time()
+            session.get(url).raise_for_status()
+            own.append(time.time() - start)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return (len(latencies) / float(seconds),
+            latencies[int(len(latencies) * 0.95)] * 1000)
+
+
+def wait_server(process):
+    while process.poll() is None:
+        try:
+            requests.get('http://127.0.0.1:%d/submissions/kj-0000000'
+                         % PORT)
+            return True
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    return False
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    submissions = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    page_size = int(sys.argv[4]) if len(sys.argv) > 4 else 100
+
+    print("%d clients, %d submissions, %d s per endpoint"
+          % (clients, submissions, seconds))
+    for server, threads in SERVERS:
+        path = tempfile.mktemp(suffix='.db')
+        process = subprocess.Popen(
+            [sys.executable, __file__, 'serve', server, str(threads),
+             str(submissions), path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_server(process):
+                print("%-11s %2d threads: not available" % (server, threads))
+                continue
+            base = 'http://127.0.0.1:%d/submissions' % PORT
+            for name, url in [('list', '%s?limit=%d' % (base, page_size)),
+                              ('status', '%s/kj-0000001' % base)]:
+                throughput, p95 = load(url, clients, seconds)
+                print("%-11s %2d threads, %-6s %7.1f req/s, p95 %7.1f ms"
+                      % (server, threads, name, throughput, p95))
+        finally:
+            process.terminate()
+            process.wait()
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), sys.argv[5])
+    else:
+        main()
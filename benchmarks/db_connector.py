@@ -0,0 +1,67 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Time to decode many stored jobs with the SQLite persistence, each
+executor creating a persistence connector of its own, as it used to,
+or using the one shared by the process.
+
+Usage: PYTHONPATH=. python benchmarks/db_connector.py [jobs]
+"""
+
+import sys
+import time
+
+import peewee
+
+from broker.persistence import connectors
+from broker.persistence.sqlite.model import JobIndex, JobPayload
+from broker.persistence.sqlite.plugin import SqliteJobPersistence
+from kubejobs import KubeJobsExecutor
+
+
+def decode_all(persistence, app_ids):
+    start = time.time()
+    for app_id in app_ids:
+        persistence.get(app_id)
+    return time.time() - start
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    db = peewee.SqliteDatabase(':memory:')
+    db.bind([JobIndex, JobPayload])
+    SqliteJobPersistence.legacy_migrated = True
+    persistence = connectors.job_persistence('sqlite')
+
+    states = dict([('kj-%07d' % i, KubeJobsExecutor('kj-%07d' % i))
+                   for i in range(jobs)])
+    persistence.put_many(states)
+
+    shared = decode_all(persistence, states)
+
+    get_db_connector = KubeJobsExecutor.get_db_connector
+    KubeJobsExecutor.get_db_connector = \
+        lambda self: connectors.create_job_persistence('sqlite')
+    own = decode_all(persistence, states)
+    KubeJobsExecutor.get_db_connector = get_db_connector
+
+    print("%d jobs" % jobs)
+    print("connector per executor: %8.1f ms" % (own * 1000))
+    print("shared connector:       %8.1f ms" % (shared * 1000))
+
+
+if __name__ == "__main__":
+    main()
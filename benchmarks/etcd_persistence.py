@@ -0,0 +1,126 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Throughput of the etcd job persistence with 100 executors writing
+and reading their states in parallel, comparing the previous global
+locks around every operation with the lock-free reads and per-key
+compare-and-swap writes. The calls are made against an in-memory
+stand-in of etcd that adds a fixed round trip to every request, so
+the numbers only reflect how the operations contend with each other.
+
+Usage: PYTHONPATH=. python benchmarks/etcd_persistence.py [operations]
+"""
+
+import sys
+import threading
+import time
+
+from broker.persistence.etcd_db.plugin import Etcd3JobPersistence
+from broker.tests.unit.mocks.etcd_mock import MockEtcd
+from broker.tests.unit.mocks.state_mock import StateMock
+
+EXECUTORS = 100
+ROUND_TRIP = 0.001
+
+
+class EtcdStandIn(MockEtcd):
+    """ MockEtcd with a round trip on each request. """
+
+    def get(self, key):
+        time.sleep(ROUND_TRIP)
+        return MockEtcd.get(self, key)
+
+    def get_prefix(self, prefix):
+        time.sleep(ROUND_TRIP)
+        return MockEtcd.get_prefix(self, prefix)
+
+    def transaction(self, compare, success=None, failure=None):
+        time.sleep(ROUND_TRIP)
+        return MockEtcd.transaction(self, compare, success, failure)
+
+    def lock(self, name, ttl=60):
+        return StandInLock(MockEtcd.lock(self, name, ttl))
+
+
+class StandInLock():
+    """ A distributed lock costs a round trip to acquire it and
+    another to release it.
+    """
+
+    def __init__(self, lock):
+        self.lock = lock
+
+    def __enter__(self):
+        time.sleep(ROUND_TRIP)
+        self.lock.acquire()
+
+    def __exit__(self, *args):
+        time.sleep(ROUND_TRIP)
+        self.lock.release()
+
+
+class LockedJobPersistence(Etcd3JobPersistence):
+    """ The previous behaviour: every operation holds a lock named
+    after the operation, shared by every job.
+    """
+
+    def put_many(self, states):
+        with self.etcd_connection.lock('put', ttl=5):
+            Etcd3JobPersistence.put_many(self, states)
+
+    def get(self, app_id):
+        with self.etcd_connection.lock('get', ttl=5):
+            return Etcd3JobPersistence.get(self, app_id)
+
+
+def executor(persistence, app_id, operations):
+    state = StateMock(app_id)
+    for _ in range(operations):
+        persistence.put(app_id, state)
+        persistence.get(app_id)
+
+
+def measure(persistence_class, operations):
+    etcd = EtcdStandIn()
+    threads = []
+    for i in range(EXECUTORS):
+        persistence = persistence_class('localhost', 2379)
+        persistence.etcd_connection = etcd
+        threads.append(threading.Thread(
+            target=executor, args=(persistence, 'kj-%d' % i, operations)))
+
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    return EXECUTORS * operations * 2 / elapsed
+
+
+def main():
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    print("executors: %d, put+get cycles each: %d, round trip: %.1f ms"
+          % (EXECUTORS, operations, ROUND_TRIP * 1000))
+    print("global locks:        %8.0f ops/s"
+          % measure(LockedJobPersistence, operations))
+    print("compare-and-swap:    %8.0f ops/s"
+          % measure(Etcd3JobPersistence, operations))
+
+
+if __name__ == "__main__":
+    main()
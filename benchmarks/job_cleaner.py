@@ -0,0 +1,83 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Cost of scheduling and cancelling resource deletions in the job
+cleaner with many pending deletions, and how many times its worker
+wakes up while they are pending. Deadlines are spread over a day, so
+no deletion is actually run.
+
+Usage: PYTHONPATH=. python benchmarks/job_cleaner.py [pending]
+"""
+
+import random
+import sys
+import threading
+import time
+
+from broker.service.job_cleaner_daemon import JobCleanerDaemon
+
+
+class CountingCondition(object):
+    """ Condition that counts the wake-ups of the worker. """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.wakeups = 0
+
+    def __enter__(self):
+        return self.condition.__enter__()
+
+    def __exit__(self, *args):
+        return self.condition.__exit__(*args)
+
+    def wait(self, timeout=None):
+        result = self.condition.wait(timeout)
+        self.wakeups += 1
+        return result
+
+    def notify(self):
+        self.condition.notify()
+
+
+def main():
+    pending = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    random.seed(0)
+    lifetimes = [random.randint(60, 86400) for _ in range(pending)]
+
+    cleaner = JobCleanerDaemon({})
+    cleaner.condition = CountingCondition()
+
+    start = time.time()
+    for i, lifetime in enumerate(lifetimes):
+        cleaner.insert_element('kj-%d' % i, lifetime)
+    insert = (time.time() - start) / pending * 1e6
+
+    cleaner.condition.wakeups = 0
+    time.sleep(2)
+    idle_wakeups = cleaner.condition.wakeups
+
+    start = time.time()
+    for i in range(0, pending, 2):
+        cleaner.cancel('kj-%d' % i)
+    cancel = (time.time() - start) / (pending // 2) * 1e6
+
+    print("pending deletions: %d" % pending)
+    print("insert:            %8.2f us/op" % insert)
+    print("cancel:            %8.2f us/op" % cancel)
+    print("idle wake-ups:     %8d in 2 s" % idle_wakeups)
+
+
+if __name__ == "__main__":
+    main()
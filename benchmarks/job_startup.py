@@ -0,0 +1,111 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Submission-to-running latency of a job whose startup steps take a
+fixed time, comparing the steps run one after another (the previous
+behaviour of start_application) with the startup stage graph. The
+durations are scaled down from what each step usually takes against
+a cluster.
+
+Usage: PYTHONPATH=. python benchmarks/job_startup.py [scale]
+"""
+
+import sys
+import time
+
+from kubejobs import KubeJobsExecutor
+
+DURATIONS = {
+    'redis': 10,
+    'metrics': 6,
+    'visualization': 2,
+    'queue': 4,
+    'monitoring': 0.1,
+    'controlling': 0.1
+}
+
+
+class StubExecutor(KubeJobsExecutor):
+    """ Sleeps instead of provisioning each service. """
+
+    scale = 0.1
+
+    def step(self, name):
+        time.sleep(DURATIONS[name] * self.scale)
+
+    def setup_redis(self):
+        self.step('redis')
+
+    def setup_metric_persistence(self, data):
+        self.step('metrics')
+        return {}, None
+
+    def update_visualizer_info(self, data, database_data, redis_ip):
+        pass
+
+    def start_visualization(self, data):
+        self.step('visualization')
+
+    def fill_queue_and_trigger_job(self, data, ready=None):
+        self.step('queue')
+        if ready is not None:
+            ready()
+        return 0
+
+    def update_monitor_info(self, database_data, datasource_type,
+                            queue_size):
+        pass
+
+    def start_monitoring(self, data):
+        self.step('monitoring')
+
+    def start_controlling(self, data):
+        self.step('controlling')
+
+    def run_sequentially(self, data):
+        self.setup_redis()
+        database_data, datasource_type = self.setup_metric_persistence(data)
+        self.update_visualizer_info(data, database_data, self.redis_ip)
+        self.start_visualization(data)
+        queue_size = self.fill_queue_and_trigger_job(data)
+        self.update_monitor_info(database_data, datasource_type, queue_size)
+        self.start_monitoring(data)
+        self.start_controlling(data)
+
+
+def measure(run):
+    start = time.time()
+    run({})
+    return time.time() - start
+
+
+def main():
+    StubExecutor.scale = float(sys.argv[1]) if len(sys.argv) > 1 else 0.1
+
+    executor = StubExecutor('kj-bench')
+    executor.data = {}
+    sequential = measure(executor.run_sequentially)
+    graph = measure(executor.run_startup_stages)
+
+    print("stage durations (s): %s"
+          % ", ".join("%s=%.2f" % (k, v * StubExecutor.scale)
+                      for k, v in sorted(DURATIONS.items())))
+    print("sequential:  %.2f s" % sequential)
+    print("stage graph: %.2f s" % graph)
+    print("stage timings: %s" % executor.startup_timings)
+
+
+if __name__ == "__main__":
+    main()
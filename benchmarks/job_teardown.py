@@ -0,0 +1,76 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Time until the resources of jobs expiring together are deleted,
+when the teardown of one of them waits on a slow service. With one
+worker the deletions run one after another, as they used to.
+
+Usage: PYTHONPATH=. python benchmarks/job_teardown.py [jobs]
+"""
+
+import sys
+import time
+
+from broker.service.job_cleaner_daemon import JobCleanerDaemon
+
+TEARDOWN = 0.05
+SLOW_TEARDOWN = 2
+
+
+class Job(object):
+
+    def __init__(self, app_id, duration, done):
+        self.app_id = app_id
+        self.duration = duration
+        self.done = done
+
+    def delete_job_resources(self, raise_errors=False):
+        time.sleep(self.duration)
+        self.done[self.app_id] = time.monotonic()
+        return True
+
+
+def measure(workers, jobs):
+    done = {}
+    submissions = {'kj-slow': Job('kj-slow', SLOW_TEARDOWN, done)}
+    for i in range(jobs - 1):
+        app_id = 'kj-%d' % i
+        submissions[app_id] = Job(app_id, TEARDOWN, done)
+
+    cleaner = JobCleanerDaemon(submissions, workers=workers)
+    start = time.monotonic()
+    for app_id in sorted(submissions, reverse=True):
+        cleaner.insert_element(app_id, 0)
+    while len(done) < jobs:
+        time.sleep(0.01)
+
+    fast = [t - start for app_id, t in done.items() if app_id != 'kj-slow']
+    return max(fast), max(done.values()) - start, cleaner.metrics()
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    print("jobs: %d, teardown: %.2fs, slow teardown: %.2fs"
+          % (jobs, TEARDOWN, SLOW_TEARDOWN))
+    for workers in (1, 4, 8):
+        fast, total, metrics = measure(workers, jobs)
+        print("workers: %d  other jobs cleaned in %.2fs, all in %.2fs, "
+              "avg latency %.2fs" % (workers, fast, total,
+                                     metrics['avg_latency']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Per-call latency of a job status read, comparing a kubeconfig
+loaded on every call (the previous behaviour of the k8s helpers)
+with the cached client registry. The calls are made against a local
+stub of the Kubernetes API, so the numbers only reflect the client
+side cost: kubeconfig parsing, client setup and connection reuse.
+
+Usage: PYTHONPATH=. python benchmarks/k8s_client.py [calls]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+import kubernetes as kube
+
+from broker.utils.plugins import k8s_clients
+
+KUBECONFIG = """
+apiVersion: v1
+kind: Config
+clusters:
+- name: stub
+  cluster:
+    server: http://127.0.0.1:%d
+users:
+- name: stub
+  user:
+    token: stub
+contexts:
+- name: stub
+  context:
+    cluster: stub
+    user: stub
+current-context: stub
+"""
+
+JOB = json.dumps({
+    "apiVersion": "batch/v1",
+    "kind": "Job",
+    "metadata": {"name": "kj-bench", "namespace": "default"},
+    "status": {"active": 1}
+}).encode()
+
+
+class StubServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(JOB)))
+        self.end_headers()
+        self.wfile.write(JOB)
+
+    def log_message(self, *args):
+        pass
+
+
+def uncached_call(conf_path):
+    kube.config.load_kube_config(conf_path)
+    job_api = kube.client.BatchV1Api()
+    return job_api.read_namespaced_job_status(name="kj-bench",
+                                              namespace="default")
+
+
+def cached_call(conf_path):
+    job_api = k8s_clients.batch_v1(conf_path)
+    return job_api.read_namespaced_job_status(name="kj-bench",
+                                              namespace="default")
+
+
+def measure(call, conf_path, calls):
+    call(conf_path)
+    start = time.time()
+    for _ in range(calls):
+        call(conf_path)
+    return (time.time() - start) / calls * 1000
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    fd, conf_path = tempfile.mkstemp()
+    with os.fdopen(fd, 'w') as f:
+        f.write(KUBECONFIG % server.server_port)
+
+    try:
+        before = measure(uncached_call, conf_path, calls)
+        after = measure(cached_call, conf_path, calls)
+    finally:
+        server.shutdown()
+        os.remove(conf_path)
+
+    print("calls: %d" % calls)
+    print("load_kube_config per call: %.3f ms/call" % before)
+    print("cached client registry:    %.3f ms/call" % after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Time to list the stored submissions as GET /submissions used to,
+synchronizing each one with the cluster and rendering its full
+representation, against reading a page, or every row, of the index of
+the SQLite persistence. The status request of each synchronization is
+replaced by a fixed delay.
+
+Usage: PYTHONPATH=. python benchmarks/list_submissions.py [jobs]
+    [k8s_latency_ms] [page_size]
+"""
+
+import datetime
+import json
+import sys
+import time
+
+import peewee
+
+from broker.persistence.sqlite.model import JobIndex, JobPayload
+from broker.persistence.sqlite.plugin import SqliteJobPersistence
+from kubejobs import KubeJobsExecutor
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.005
+    page_size = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    db = peewee.SqliteDatabase(':memory:')
+    db.bind([JobIndex, JobPayload])
+    SqliteJobPersistence.legacy_migrated = True
+    persistence = SqliteJobPersistence()
+
+    states = {}
+    for i in range(jobs):
+        job = KubeJobsExecutor('kj-%07d' % i, status='completed',
+                               data={'cmd': ['run'], 'img': 'job'})
+        job.starting_time = datetime.datetime(2019, 1, 1) + \
+            datetime.timedelta(minutes=i)
+        states[job.app_id] = job
+    persistence.put_many(states)
+
+    start = time.time()
+    listed = {}
+    for app_id, job in persistence.get_all().items():
+        time.sleep(latency)
+        listed[app_id] = json.loads(job.__repr__())
+    legacy = time.time() - start
+
+    start = time.time()
+    page = persistence.get_index(status=['completed'], limit=page_size + 1)
+    paged = time.time() - start
+
+    start = time.time()
+    everything = persistence.get_index()
+    full = time.time() - start
+
+    print("%d submissions, %.0f ms per status request"
+          % (jobs, latency * 1000))
+    print("synchronize and render all: %8.2f s" % legacy)
+    print("index, page of %d:         %8.2f ms"
+          % (len(page) - 1, paged * 1000))
+    print("index, all %d rows:      %8.2f ms"
+          % (len(everything), full * 1000))
+
+
+if __name__ == "__main__":
+    main()
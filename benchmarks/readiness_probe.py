@@ -0,0 +1,55 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Time until a provisioned service is detected as ready, for
+services that become reachable after different delays, comparing a
+probe every 5 seconds (the previous behaviour of
+provision_redis_or_die) with the exponential backoff probe.
+
+Usage: PYTHONPATH=. python benchmarks/readiness_probe.py
+"""
+
+import time
+
+from broker.utils.plugins import k8s
+
+READY_AFTER = [0.3, 0.8, 2.5, 6]
+
+
+def fixed_interval_probe(probe, timeout, interval=5):
+    start = time.time()
+    while time.time() - start < timeout:
+        time.sleep(interval)
+        if probe():
+            return True
+    return False
+
+
+def measure(wait, ready_after):
+    start = time.time()
+    assert wait(lambda: time.time() - start >= ready_after, 60)
+    return time.time() - start
+
+
+def main():
+    print("%12s %14s %14s" % ("ready after", "every 5 s", "backoff"))
+    for ready_after in READY_AFTER:
+        before = measure(fixed_interval_probe, ready_after)
+        after = measure(k8s.probe_with_backoff, ready_after)
+        print("%11.1fs %13.2fs %13.2fs" % (ready_after, before, after))
+
+
+if __name__ == "__main__":
+    main()
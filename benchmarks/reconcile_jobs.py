@@ -0,0 +1,118 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Requests to the Kubernetes API, and time taken, to reconcile the
+unfinished submissions with the cluster when the manager starts,
+synchronizing each one, as it used to, or from a single list of the
+jobs. Some of the jobs are missing from the cluster. Every request is
+replaced by a fixed delay.
+
+Usage: PYTHONPATH=. python benchmarks/reconcile_jobs.py [jobs]
+    [missing_jobs] [k8s_latency_ms]
+"""
+
+import sys
+import time
+
+from broker.service import state_flusher
+from broker.service.job_status_watcher import JobStatusWatcher
+from kubejobs import KubeJobsExecutor
+
+
+class Obj(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class PersistenceStub(object):
+
+    def put_many(self, states):
+        pass
+
+    def put(self, app_id, state):
+        pass
+
+
+class ClusterStub(object):
+
+    def __init__(self, names, latency):
+        self.names = set(names)
+        self.latency = latency
+        self.requests = 0
+
+    def get_job_status(self, app_id, namespace="default"):
+        self.requests += 1
+        time.sleep(self.latency)
+        if app_id not in self.names:
+            raise Exception("Not found")
+        return Obj(active=1, conditions=[])
+
+    def list_jobs(self, namespace="default"):
+        self.requests += 1
+        time.sleep(self.latency)
+        return Obj(items=[Obj(metadata=Obj(name=name),
+                              status=Obj(active=1, conditions=[]))
+                          for name in self.names],
+                   metadata=Obj(resource_version='1'))
+
+    def watch_jobs(self, namespace="default", resource_version=None,
+                   timeout_seconds=60):
+        # Started by the watcher once the jobs are reconciled, it is
+        # not a request made to reconcile them
+        time.sleep(timeout_seconds)
+        return iter([])
+
+
+def executors(count):
+    jobs = []
+    for i in range(count):
+        job = KubeJobsExecutor('kj-%07d' % i, status='ongoing')
+        job.db_connector = PersistenceStub()
+        jobs.append(job)
+    return jobs
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    missing = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.002
+    state_flusher.FLUSHER.interval = 3600
+
+    names = ['kj-%07d' % i for i in range(missing, jobs)]
+    print("%d unfinished submissions, %d missing, %.0f ms per request"
+          % (jobs, missing, latency * 1000))
+
+    cluster = ClusterStub(names, latency)
+    restored = executors(jobs)
+    start = time.time()
+    for job in restored:
+        job.k8s = cluster
+        job.synchronize()
+    print("synchronize each job: %5d requests, %8.2f s"
+          % (cluster.requests, time.time() - start))
+
+    cluster = ClusterStub(names, latency)
+    watcher = JobStatusWatcher()
+    watcher.k8s = cluster
+    restored = executors(jobs)
+    start = time.time()
+    watcher.reconcile(restored)
+    print("single list:          %5d requests, %8.2f s"
+          % (cluster.requests, time.time() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Time spent by provision_redis_or_die for a sequence of
+submissions, creating a new Pod for each one or leasing it from a pool
+of idle Pods. The Kubernetes API is replaced by a stub where every Pod
+becomes Ready a fixed time after it is created, and every Service
+points to a local redis-server, which must be running.
+
+Usage: PYTHONPATH=. python benchmarks/redis_pool.py [redis_port]
+    [pod_start_seconds] [submissions] [interval_seconds] [pool_size]
+"""
+
+import sys
+import threading
+import time
+
+import kubernetes as kube
+
+from broker.service import api
+from broker.utils.plugins import k8s
+from broker.utils.plugins import redis_pool
+
+
+class Obj(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class ClusterStub(object):
+    """ Pods become Ready ``pod_start`` seconds after being created. """
+
+    def __init__(self, redis_port, pod_start):
+        self.redis_port = redis_port
+        self.pod_start = pod_start
+        self.ready_at = {}
+        self.lock = threading.Lock()
+
+    def core_v1(self, conf_path):
+        return self
+
+    def create_namespaced_pod(self, namespace, body):
+        with self.lock:
+            self.ready_at[body['metadata']['name']] = \
+                time.time() + self.pod_start
+
+    def create_namespaced_service(self, namespace, body):
+        port = Obj(node_port=self.redis_port)
+        return Obj(spec=Obj(ports=[port]))
+
+    def patch_namespaced_pod(self, name, namespace, body):
+        pass
+
+    def list_namespaced_pod(self, **kwargs):
+        return Obj(items=[])
+
+    def wait(self, name):
+        with self.lock:
+            ready_at = self.ready_at[name]
+        time.sleep(max(ready_at - time.time(), 0))
+        condition = kube.client.V1PodCondition(type='Ready', status='True')
+        return kube.client.V1Pod(
+            status=kube.client.V1PodStatus(conditions=[condition]))
+
+
+class WatchStub(object):
+
+    cluster = None
+
+    def stream(self, function, field_selector, **kwargs):
+        name = field_selector.split('=', 1)[1]
+        yield {'type': 'MODIFIED', 'object': self.cluster.wait(name)}
+
+    def stop(self):
+        pass
+
+
+def run(submissions, interval, pool):
+    latencies = []
+    for i in range(submissions):
+        start = time.time()
+        k8s.provision_redis_or_die('kj-%d' % i, pod_name=pool.lease())
+        latencies.append(time.time() - start)
+        time.sleep(max(interval - latencies[-1], 0))
+    return latencies
+
+
+def main():
+    redis_port = int(sys.argv[1]) if len(sys.argv) > 1 else 6379
+    pod_start = float(sys.argv[2]) if len(sys.argv) > 2 else 2
+    submissions = int(sys.argv[3]) if len(sys.argv) > 3 else 6
+    interval = float(sys.argv[4]) if len(sys.argv) > 4 else 1
+    pool_size = int(sys.argv[5]) if len(sys.argv) > 5 else 3
+
+    cluster = ClusterStub(redis_port, pod_start)
+    k8s.k8s_clients = cluster
+    WatchStub.cluster = cluster
+    k8s.kube.watch.Watch = WatchStub
+    api.redis_ip = '127.0.0.1'
+
+    print("pod start: %.1f s, %d submissions every %.1f s"
+          % (pod_start, submissions, interval))
+    for size in (0, pool_size):
+        pool = redis_pool.RedisPool(size)
+        pool.warm()
+        while pool.provisioning:
+            time.sleep(0.01)
+
+        latencies = run(submissions, interval, pool)
+        print("pool of %d: mean %.2f s, max %.2f s (%s)"
+              % (size, sum(latencies) / len(latencies), max(latencies),
+                 ", ".join("%.2f" % latency for latency in latencies)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Items/s when filling the job queue of a workload, comparing one
+RPUSH per item (the previous behaviour of push_jobs_to_redis) with
+the chunked and pipelined RPUSH. It needs a running redis-server,
+whose "job" key is overwritten.
+
+Usage: PYTHONPATH=. python benchmarks/redis_push.py [host] [port]
+"""
+
+import sys
+import time
+
+import redis
+
+from kubejobs import KubeJobsExecutor
+
+SIZES = [10000, 100000, 1000000]
+
+
+def per_item_push(rds, items):
+    for item in items:
+        rds.rpush("job", item)
+
+
+def measure(push, rds, items):
+    rds.delete("job")
+    start = time.time()
+    push(items)
+    elapsed = time.time() - start
+    assert rds.llen("job") == len(items)
+    return len(items) / elapsed
+
+
+def main():
+    host = sys.argv[1] if len(sys.argv) > 1 else 'localhost'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 6379
+
+    rds = redis.StrictRedis(host=host, port=port)
+    executor = KubeJobsExecutor('kj-bench', redis=rds)
+
+    print("%10s %16s %16s" % ("items", "per item (/s)", "pipelined (/s)"))
+    for size in SIZES:
+        items = ['http://workload.com/item-%d' % i for i in range(size)]
+        before = measure(lambda items: per_item_push(rds, items),
+                         rds, items)
+        after = measure(executor.push_to_queue, rds, items)
+        print("%10d %16.0f %16.0f" % (size, before, after))
+    rds.delete("job")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Memory used by the queues of many small jobs in one shared Redis,
+with namespaced keys, against the memory of an empty Redis, which is
+the least each job pays with a Redis of its own, and the time taken to
+delete the keys of every job by prefix. Needs a running redis-server,
+whose data is not touched outside the benchmark prefixes.
+
+Usage: PYTHONPATH=. python benchmarks/shared_redis.py [redis_port]
+    [jobs] [items_per_job]
+"""
+
+import sys
+import time
+
+import redis
+
+from broker.service import api
+from kubejobs import KubeJobsExecutor
+
+
+def main():
+    redis_port = int(sys.argv[1]) if len(sys.argv) > 1 else 6379
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    items = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    client = redis.StrictRedis(port=redis_port)
+    api.redis_push_chunk_size = 1000
+
+    before = client.info('memory')['used_memory']
+    executors = []
+    for i in range(jobs):
+        executor = KubeJobsExecutor('kj-bench%05d' % i, redis=client,
+                                    redis_prefix='kj-bench%05d:' % i)
+        executor.push_to_queue('item-%d' % n for n in range(items))
+        executor.rds.rpush(executor.key('job:errors'), 'error')
+        executors.append(executor)
+    used = client.info('memory')['used_memory'] - before
+
+    start = time.time()
+    for executor in executors:
+        executor.delete_redis_keys()
+    cleanup = time.time() - start
+
+    print("%d jobs, %d items each" % (jobs, items))
+    print("shared redis: %.1f KB per job" % (used / 1024.0 / jobs))
+    print("empty redis:  %.1f KB per job (before any item)"
+          % (before / 1024.0))
+    print("cleanup by prefix: %.2f ms per job, %d keys left"
+          % (cleanup * 1000 / jobs,
+             len(list(client.scan_iter(match='kj-bench*')))))
+
+
+if __name__ == "__main__":
+    main()
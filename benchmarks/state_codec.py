@@ -0,0 +1,96 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Encode/decode time and payload size of a job state for each
+codec available to the job persistence. Decoding rebuilds the whole
+executor, while reading the fields only parses the payload, as done
+to index the stored jobs.
+
+Usage: PYTHONPATH=. python benchmarks/state_codec.py [iterations]
+"""
+
+import copy
+import datetime
+import json
+import sys
+import time
+
+from broker.persistence import codec
+from kubejobs import KubeJobsExecutor
+
+REPORT = {
+    'final_error': 0.02,
+    'final_replicas': 8,
+    'min_error': -0.3,
+    'max_error': 0.4,
+    'heuristic_options': {'proportional_gain': 0.1,
+                          'derivative_gain': 0,
+                          'integral_gain': 0},
+    'scaling_strategy': 'pid'
+}
+
+
+def build_job():
+    with open('broker/tests/unit/mocks/body_request.json') as f:
+        data = json.load(f)
+
+    job = KubeJobsExecutor('kj-0000001',
+                           status='completed',
+                           data=copy.deepcopy(data),
+                           report=REPORT,
+                           job_resources_lifetime=300,
+                           redis_ip='10.0.0.1', redis_port=31001)
+    job.starting_time = datetime.datetime.now()
+    job.finish_time = datetime.datetime.now()
+    return job
+
+
+def measure(state_codec, job, iterations):
+    payload = state_codec.encode(job)
+
+    start = time.time()
+    for _ in range(iterations):
+        state_codec.encode(job)
+    encode = (time.time() - start) / iterations * 1e6
+
+    start = time.time()
+    for _ in range(iterations):
+        state_codec.decode(payload)
+    decode = (time.time() - start) / iterations * 1e6
+
+    start = time.time()
+    for _ in range(iterations):
+        state_codec.fields(payload)
+    fields = (time.time() - start) / iterations * 1e6
+
+    return encode, decode, fields, len(payload)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    job = build_job()
+
+    print("%-6s %14s %14s %14s %10s" % ("codec", "encode (us)",
+                                        "decode (us)", "fields (us)",
+                                        "bytes"))
+    for name in sorted(codec.CODECS):
+        encode, decode, fields, size = measure(codec.get_codec(name), job,
+                                               iterations)
+        print("%-6s %14.1f %14.1f %14.1f %10d" % (name, encode, decode,
+                                                  fields, size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Time to build and serialize the response of GET /submissions, as
+rendered by the API, for many finished submissions: through the JSON
+round trip of each executor representation, as it used to be, and
+through their cached status views, first built and then reused.
+
+Usage: PYTHONPATH=. python benchmarks/status_view.py [submissions]
+    [repetitions]
+"""
+
+import datetime
+import json
+import sys
+import time
+
+from broker.utils.serializer import JSONDictSerializer
+from kubejobs import KubeJobsExecutor
+
+REPORT = {
+    'final_error': 0.02,
+    'final_replicas': 8,
+    'min_error': -0.3,
+    'max_error': 0.4,
+    'execution_time': 312.5
+}
+
+
+def round_trip(submissions):
+    return dict([(app_id, json.loads(submission.__repr__()))
+                 for app_id, submission in submissions.items()])
+
+
+def status_views(submissions):
+    return dict([(app_id, dict(submission.status_view()))
+                 for app_id, submission in submissions.items()])
+
+
+def measure(build, submissions, repetitions):
+    serializer = JSONDictSerializer()
+    start = time.time()
+    for _ in range(repetitions):
+        serializer.serialize(build(submissions))
+    return (time.time() - start) / repetitions * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    submissions = {}
+    for i in range(count):
+        job = KubeJobsExecutor('kj-%07d' % i, status='completed',
+                               report=dict(REPORT),
+                               redis_ip='10.0.0.1', redis_port=31001)
+        job.starting_time = datetime.datetime(2019, 1, 1)
+        submissions[job.app_id] = job
+
+    first = measure(status_views, submissions, 1)
+    print("%d submissions" % count)
+    print("json round trip:        %8.1f ms"
+          % measure(round_trip, submissions, repetitions))
+    print("status views, building: %8.1f ms" % first)
+    print("status views, cached:   %8.1f ms"
+          % measure(status_views, submissions, repetitions))
+
+
+if __name__ == "__main__":
+    main()
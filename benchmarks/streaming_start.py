@@ -0,0 +1,106 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Time until the Job is created and until the queue is sealed when
+filling the job queue of a large workload, with and without
+stream_queue. The workload is served by a local HTTP server and the
+Job creation is not sent to any cluster. It needs a running
+redis-server, whose "job" and "job_sealed" keys are overwritten.
+
+Usage: PYTHONPATH=. python benchmarks/streaming_start.py [items] [host]
+       [port]
+"""
+
+import sys
+import threading
+import time
+
+import redis
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+from kubejobs import KubeJobsExecutor
+
+ITEM = "http://workload.com/item-%09d\n"
+
+
+class WorkloadServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    items = 0
+
+
+class WorkloadHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        items = self.server.items
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(ITEM % 0) * items))
+        self.end_headers()
+        for start in range(0, items, 10000):
+            self.wfile.write("".join(
+                ITEM % i
+                for i in range(start, min(start + 10000, items))).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class BenchmarkExecutor(KubeJobsExecutor):
+    """ Records when the Job would be created. """
+
+    def trigger_job(self, data):
+        self.triggered_at = time.time()
+
+
+def measure(rds, data):
+    rds.delete("job", "job_sealed")
+    executor = BenchmarkExecutor('kj-bench', redis=rds)
+    start = time.time()
+    executor.fill_queue_and_trigger_job(data)
+    sealed = time.time() - start
+    return executor.triggered_at - start, sealed
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    host = sys.argv[2] if len(sys.argv) > 2 else 'localhost'
+    port = int(sys.argv[3]) if len(sys.argv) > 3 else 6379
+
+    server = WorkloadServer(("127.0.0.1", 0), WorkloadHandler)
+    server.items = items
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    rds = redis.StrictRedis(host=host, port=port)
+    url = 'http://127.0.0.1:%d/workload' % server.server_port
+    print("workload: %d items" % items)
+    try:
+        for stream_queue in (False, True):
+            data = {'redis_workload': url, 'stream_queue': stream_queue}
+            triggered, sealed = measure(rds, data)
+            print("stream_queue=%-5s job created after %6.2f s, "
+                  "queue sealed after %6.2f s"
+                  % (stream_queue, triggered, sealed))
+    finally:
+        rds.delete("job", "job_sealed")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" A burst of submissions started with a thread each, as they used to
+be, or through the SubmissionQueue. The setup of each job is replaced
+by calls to a stub of the cluster services, which serve a few calls at
+a time and make the others wait. Reports the peak of concurrent setups,
+the median and total time to start the accepted jobs, and the
+submissions refused.
+
+Usage: PYTHONPATH=. python benchmarks/submission_queue.py [submissions]
+    [workers] [queue_size] [service_capacity]
+"""
+
+import sys
+import threading
+import time
+
+from broker import exceptions as ex
+from broker.service.submission_queue import SubmissionQueue
+
+# Calls made by the setup of a job, and the time the service takes to
+# serve each one
+CALLS_PER_SETUP = 10
+CALL_TIME = 0.005
+
+
+class ServiceStub(object):
+
+    def __init__(self, capacity):
+        self.slots = threading.Semaphore(capacity)
+        self.lock = threading.Lock()
+        self.setups = 0
+        self.peak = 0
+
+    def setup(self):
+        with self.lock:
+            self.setups += 1
+            self.peak = max(self.peak, self.setups)
+        for _ in range(CALLS_PER_SETUP):
+            with self.slots:
+                time.sleep(CALL_TIME)
+        with self.lock:
+            self.setups -= 1
+
+
+class ExecutorStub(object):
+
+    def __init__(self, app_id, service, started):
+        self.app_id = app_id
+        self.service = service
+        self.started = started
+        self.queue_position = None
+        self.submitted_at = time.time()
+        self.startup_latency = None
+
+    def setup_application(self, data):
+        self.service.setup()
+
+    def finish_application(self):
+        self.startup_latency = time.time() - self.submitted_at
+        self.started.release()
+
+    def start_application(self, data):
+        self.setup_application(data)
+        self.finish_application()
+
+
+def burst(submissions, service, start):
+    started = threading.Semaphore(0)
+    begin = time.time()
+    accepted = []
+    for i in range(submissions):
+        executor = ExecutorStub('kj-%d' % i, service, started)
+        try:
+            start(executor)
+            accepted.append(executor)
+        except ex.TooManyRequestsException:
+            pass
+    for _ in accepted:
+        started.acquire()
+    latencies = sorted(executor.startup_latency for executor in accepted)
+    return len(accepted), latencies[len(latencies) // 2], \
+        time.time() - begin
+
+
+def main():
+    submissions = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    queue_size = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    capacity = int(sys.argv[4]) if len(sys.argv) > 4 else 8
+
+    def thread_each(executor):
+        threading.Thread(target=executor.start_application,
+                         args=({},)).start()
+
+    print("%d submissions, services serving %d calls at a time"
+          % (submissions, capacity))
+    runs = [('thread per submission', thread_each)]
+    for size in (submissions, queue_size):
+        queue = SubmissionQueue(workers, size)
+        runs.append(('queue of %d, %d workers' % (size, workers),
+                     lambda executor, queue=queue:
+                     queue.submit(executor, {})))
+
+    for name, start in runs:
+        service = ServiceStub(capacity)
+        accepted, median, elapsed = burst(submissions, service, start)
+        print("%-26s %4d concurrent setups, %4d started, median %5.2f s, "
+              "all in %5.2f s, %4d refused"
+              % (name, service.peak, accepted, median, elapsed,
+                 submissions - accepted))
+
+
+if __name__ == "__main__":
+    main()
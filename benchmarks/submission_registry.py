@@ -0,0 +1,75 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Time to restore the stored submissions when the manager starts,
+decoding every job and scanning the finished ones, as it used to, or
+reading the index into a SubmissionRegistry and decoding only the
+unfinished jobs, with the SQLite persistence.
+
+Usage: PYTHONPATH=. python benchmarks/submission_registry.py [jobs]
+    [unfinished_jobs]
+"""
+
+import datetime
+import sys
+import time
+
+import peewee
+
+from broker.persistence import codec
+from broker.persistence.sqlite.model import JobIndex, JobPayload
+from broker.persistence.sqlite.plugin import SqliteJobPersistence
+from broker.service.submission_registry import SubmissionRegistry
+from kubejobs import KubeJobsExecutor
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    unfinished = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    db = peewee.SqliteDatabase(':memory:')
+    db.bind([JobIndex, JobPayload])
+    SqliteJobPersistence.legacy_migrated = True
+    persistence = SqliteJobPersistence()
+
+    states = {}
+    for i in range(jobs):
+        status = 'ongoing' if i < unfinished else 'completed'
+        job = KubeJobsExecutor('kj-%07d' % i, status=status,
+                               data={'cmd': ['run'], 'img': 'job'})
+        job.starting_time = datetime.datetime(2019, 1, 1)
+        states[job.app_id] = job
+    persistence.put_many(states)
+
+    start = time.time()
+    submissions = persistence.get_all()
+    ongoing = [job for job in submissions.values()
+               if not job.job_completed and not job.terminated]
+    persistence.get_finished_jobs()
+    legacy = time.time() - start
+
+    start = time.time()
+    registry = SubmissionRegistry(persistence)
+    ongoing = [registry[row['app_id']] for row in registry.rows()
+               if row['status'] not in codec.FINAL_STATES]
+    lazy = time.time() - start
+
+    print("%d stored submissions, %d unfinished" % (jobs, len(ongoing)))
+    print("decode every job:    %8.1f ms" % (legacy * 1000))
+    print("submission registry: %8.1f ms" % (lazy * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Peak memory and time of loading a workload into the job queue,
+comparing the whole file downloaded and split before the push (the
+previous behaviour of get_workload) with the streamed download. The
+workload is served by a local HTTP server and the pushed items are
+discarded, so only the memory used by the download is measured.
+
+Usage: PYTHONPATH=. python benchmarks/workload_download.py [items]
+"""
+
+import sys
+import threading
+import time
+import tracemalloc
+
+import requests
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+from kubejobs import KubeJobsExecutor
+
+ITEM = "http://workload.com/item-%09d\n"
+
+
+class WorkloadServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    items = 0
+
+
+class WorkloadHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        items = self.server.items
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(ITEM % 0) * items))
+        self.end_headers()
+        for start in range(0, items, 10000):
+            self.wfile.write("".join(
+                ITEM % i
+                for i in range(start, min(start + 10000, items))).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class NullPipeline(object):
+
+    def rpush(self, key, *values):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def set(self, key, value):
+        pass
+
+    def execute(self):
+        pass
+
+
+class NullRedis(object):
+
+    def pipeline(self, transaction=True):
+        return NullPipeline()
+
+
+class WholeFileExecutor(KubeJobsExecutor):
+    """ Downloads and splits the whole file before pushing it. """
+
+    def stream_workload(self, data):
+        return requests.get(data['redis_workload']).text.split('\n')[:-1]
+
+
+def measure(executor, data):
+    tracemalloc.start()
+    start = time.time()
+    pushed = executor.push_jobs_to_redis(data)
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return pushed, elapsed, peak / 1024.0 / 1024.0
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    server = WorkloadServer(("127.0.0.1", 0), WorkloadHandler)
+    server.items = items
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    data = {'redis_workload': 'http://127.0.0.1:%d/workload'
+            % server.server_port}
+    print("workload: %d items, %.1f MB"
+          % (items, len(ITEM % 0) * items / 1024.0 / 1024.0))
+    try:
+        for name, executor_class in [("whole file", WholeFileExecutor),
+                                     ("streamed", KubeJobsExecutor)]:
+            executor = executor_class('kj-bench', redis=NullRedis())
+            pushed, elapsed, peak = measure(executor, data)
+            assert pushed == items
+            print("%-12s %8.2f s %10.1f MB peak" % (name, elapsed, peak))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
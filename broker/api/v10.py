@@ -44,7 +44,7 @@ def run_submission(data):
     """ Run a new submission and returns a submission id.
 
     Normal response codes: 202
-    Error response codes: 400, 401
+    Error response codes: 400, 401, 429
     """
     return u.render(api.run_submission(data))
 
@@ -71,22 +71,27 @@ def terminate_submission(submission_id, data):
 
 @rest.get('/submissions')
 def list_submissions():
-    """ List all submissions (done or not).
+    """ List all submissions (done or not), as last synchronized
+    with the cluster, or synchronized first with ?fresh=true. A page
+    of them is listed when filtered by status, since or until, or
+    paginated by limit and cursor.
 
     Normal response codes: 200
     Error response codes: 400, 401
     """
-    return u.render(api.list_submissions())
+    return u.render(api.list_submissions(u.get_request_args()))
 
 
 @rest.get('/submissions/<submission_id>')
 def submission_status(submission_id):
-    """ Show status of a specific submission.
+    """ Show status of a specific submission, as last synchronized
+    with the cluster, or synchronized first with ?fresh=true.
 
     Normal response codes: 200
     Error response codes: 400
     """
-    return u.render(api.submission_status(submission_id))
+    return u.render(api.submission_status(submission_id,
+                                          u.get_request_args()))
 
 
 @rest.get('/submissions/<submission_id>/report')
@@ -13,9 +13,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import signal
+
 from flask import Flask
+from werkzeug.serving import make_server
 from broker.api.v10 import rest
 from broker.service import api
+from broker.service import state_flusher
 from broker.utils import logger
 
 
@@ -23,4 +27,41 @@ def main():
     app = Flask(__name__)
     app.register_blueprint(rest)
     logger.configure_logging()
-    app.run(host='0.0.0.0', port=api.port)
+    # Stopping the container sends SIGTERM, handled like a Ctrl+C
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        serve(app)
+    finally:
+        shutdown()
+
+
+def serve(app):
+    if api.server == 'waitress':
+        try:
+            import waitress
+        except ImportError:
+            raise Exception("The waitress server is not installed. "
+                            "Run: pip install waitress")
+        # Stops on SystemExit, after giving the ongoing requests up to
+        # 5 seconds to finish
+        waitress.serve(app, host='0.0.0.0', port=api.port,
+                       threads=api.server_threads)
+    else:
+        server = make_server('0.0.0.0', api.port, app,
+                             threaded=api.server_threads > 1)
+        # The request threads are joined when the server is closed, on
+        # SystemExit, instead of being killed with the process
+        server.daemon_threads = False
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+
+def stop(signum, frame):
+    raise SystemExit(0)
+
+
+def shutdown():
+    """ Write the job states not yet flushed before exiting. """
+    state_flusher.FLUSHER.flush()
@@ -133,6 +133,16 @@ class BadRequestException(Exception):
         self.message = message
 
 
+class TooManyRequestsException(Exception):
+
+    code = "TOO_MANY_REQUESTS"
+
+    def __init__(self, retry_after,
+                 message="Too many submissions waiting to start"):
+        self.retry_after = retry_after
+        self.message = message
+
+
 class MalformedRequestBody(GenericException):
     code = "MALFORMED_REQUEST_BODY"
     message_template = ("Malformed message body: %(reason)s")
@@ -154,6 +164,16 @@ class MaxRetriesExceeded(GenericException):
         super(MaxRetriesExceeded, self).__init__(formatted_message)
 
 
+class ConcurrentUpdateException(GenericException):
+    code = "CONCURRENT_UPDATE"
+    message_template = "Modified by another writer: %s"
+
+    def __init__(self, keys):
+        self.keys = keys
+        super(ConcurrentUpdateException, self).__init__(
+            self.message_template % ", ".join(keys))
+
+
 class ClusterNotCreatedException(GenericException):
     code = "CLUSTER_NOT_CREATED"
     message = "Cluster could not be created"
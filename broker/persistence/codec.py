@@ -0,0 +1,169 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import dill
+import inspect
+import json
+
+from importlib import import_module
+
+
+# Fields of a job kept apart from its payload by the persistence, so
+# the jobs can be listed and filtered without being decoded
+INDEX_FIELDS = ['status', 'starting_time', 'finish_time',
+                'del_resources_authorization', 'job_resources_lifetime']
+
+# Statuses from which a stored job cannot change any more
+FINAL_STATES = ['completed', 'failed', 'error', 'stopped',
+                'terminated', 'not found']
+
+# Rebuild parameters named differently from the attribute of the job
+# they restore
+FIELD_ALIASES = {'del_resources_auth': 'del_resources_authorization'}
+
+
+class DillCodec(object):
+    """ Serializes the whole job object with dill. """
+
+    name = 'dill'
+
+    def encode(self, state):
+        return dill.dumps(state)
+
+    def decode(self, payload):
+        return dill.loads(payload)
+
+    def fields(self, payload):
+        return _reduce_fields(self.decode(payload))
+
+
+class JSONCodec(object):
+    """ Serializes a job as the named arguments of the function that
+    rebuilds it, as returned by its ``__reduce__`` method:
+
+        {"schema_version": 1,
+         "rebuild": "kubejobs:rebuild",
+         "fields": {"app_id": "kj-123", ...}}
+
+    Payloads written by DillCodec are still decoded, so existing
+    rows are read normally and rewritten in JSON on the next update.
+    """
+
+    name = 'json'
+    SCHEMA_VERSION = 1
+
+    def encode(self, state):
+        rebuild, _ = state.__reduce__()
+        document = {
+            "schema_version": JSONCodec.SCHEMA_VERSION,
+            "rebuild": "%s:%s" % (rebuild.__module__, rebuild.__name__),
+            "fields": _reduce_fields(state)
+        }
+        return json.dumps(document, default=_encode_value).encode('utf-8')
+
+    def decode(self, payload):
+        if not self.is_json(payload):
+            return dill.loads(payload)
+
+        document = self._load(payload)
+        module_name, function_name = document['rebuild'].split(':')
+        rebuild = getattr(import_module(module_name), function_name)
+
+        # Fields no longer accepted by the rebuild function are ignored
+        parameters = _parameters(rebuild)
+        fields = dict([(k, v) for k, v in document['fields'].items()
+                       if k in parameters])
+        return rebuild(**fields)
+
+    def fields(self, payload):
+        if not self.is_json(payload):
+            return _reduce_fields(dill.loads(payload))
+        return self._load(payload)['fields']
+
+    def is_json(self, payload):
+        return payload[:1] in (b'{', '{')
+
+    def _load(self, payload):
+        if isinstance(payload, bytes):
+            payload = payload.decode('utf-8')
+        document = json.loads(payload, object_hook=_decode_value)
+        if document.get('schema_version', 0) > JSONCodec.SCHEMA_VERSION:
+            raise ValueError("Unsupported job state schema version: %s"
+                             % document.get('schema_version'))
+        return document
+
+
+CODECS = {
+    DillCodec.name: DillCodec,
+    JSONCodec.name: JSONCodec
+}
+
+
+def get_codec(name=JSONCodec.name):
+    if name not in CODECS:
+        raise ValueError("Unknown job state codec: %s" % name)
+    return CODECS[name]()
+
+
+def index_fields(fields):
+    """ The INDEX_FIELDS of a job, from the named arguments of its
+    rebuild function returned by ``fields``.
+    """
+    attributes = dict([(FIELD_ALIASES.get(name, name), value)
+                       for name, value in fields.items()])
+    return dict([(field, attributes.get(field)) for field in INDEX_FIELDS])
+
+
+def state_index(state):
+    """ The INDEX_FIELDS of a job, read from its attributes. """
+    return dict([(field, getattr(state, field, None))
+                 for field in INDEX_FIELDS])
+
+
+def encode_index(fields):
+    return json.dumps(fields, default=_encode_value).encode('utf-8')
+
+
+def decode_index(payload):
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8')
+    return json.loads(payload, object_hook=_decode_value)
+
+
+_signatures = {}
+
+
+def _parameters(rebuild):
+    if rebuild not in _signatures:
+        _signatures[rebuild] = list(inspect.signature(rebuild).parameters)
+    return _signatures[rebuild]
+
+
+def _reduce_fields(state):
+    rebuild, args = state.__reduce__()
+    return dict(zip(_parameters(rebuild), args))
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError("%r is not JSON serializable" % value)
+
+
+def _decode_value(obj):
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.datetime.fromisoformat(obj["__datetime__"])
+    return obj
@@ -0,0 +1,61 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from broker.persistence import codec as state_codec
+from broker.persistence.etcd_db import plugin as etcd
+from broker.persistence.sqlite import plugin as sqlite
+from broker.service import api
+
+_job_connectors = {}
+# Reentrant, since loading the legacy SQLite states builds executors,
+# which ask for the connector being created
+_job_connectors_lock = threading.RLock()
+
+
+def job_persistence(plugin_name, ip=None, port=None,
+                    codec_name=state_codec.JSONCodec.name):
+    """ Job persistence connector of a backend, created once and shared
+    by the whole process, so that the executors do not open an etcd
+    channel, or create the SQLite tables, of their own.
+    """
+    key = (plugin_name, ip, port, codec_name)
+    with _job_connectors_lock:
+        if key not in _job_connectors:
+            connector = create_job_persistence(plugin_name, ip, port,
+                                               codec_name)
+            _job_connectors.setdefault(key, connector)
+        return _job_connectors[key]
+
+
+def configured_job_persistence():
+    """ Shared job persistence connector of the configured backend. """
+    return job_persistence(api.plugin_name,
+                           getattr(api, 'persistence_ip', None),
+                           getattr(api, 'persistence_port', None),
+                           api.persistence_codec)
+
+
+def create_job_persistence(plugin_name, ip=None, port=None,
+                           codec_name=state_codec.JSONCodec.name):
+    codec = state_codec.get_codec(codec_name)
+    if plugin_name == 'etcd':
+        return etcd.Etcd3JobPersistence(ip, port, codec)
+    elif plugin_name == 'sqlite':
+        return sqlite.SqliteJobPersistence(codec)
+
+    else:
+        raise Exception('Unknown database name')
@@ -0,0 +1,145 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from etcd3 import events
+
+from broker.utils.logger import Log
+
+CACHE_LOG = Log("Etcd3JobCache", "logs/etcd_job_cache.log")
+
+
+class Etcd3JobCache(object):
+    """ In-process copy of the values stored under a prefix. It is
+    loaded with a single ranged read and then kept current by a watch
+    on the prefix, starting right after the revision of that read, so
+    the writes of every manager replica are seen without new scans.
+
+    Each value is kept as returned by ``parse``, called once when it
+    is cached, or as stored when no ``parse`` is given.
+
+    Entries keep the mod_revision of the key, and an update is only
+    applied when it is newer than the cached one, so the local writes
+    and their watch events can arrive in any order. Deleted keys are
+    kept as tombstones for the same reason, until the watch reaches
+    their revision. Local writes the watch has already reached are
+    ignored, as their events were applied.
+    """
+
+    def __init__(self, etcd_connection, prefix='kj-', parse=None):
+        self.etcd_connection = etcd_connection
+        self.prefix = prefix
+        self.parse = parse
+        self.entries = {}
+        self.tombstones = set()
+        # Revision up to which every event has been applied
+        self.watched_revision = 0
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.watch_id = None
+
+    def load(self):
+        with self.lock:
+            if self.loaded:
+                return
+
+            response = self.etcd_connection.get_prefix_response(self.prefix)
+            for kv in response.kvs:
+                self._update(kv.key.decode(), kv.mod_revision, kv.value)
+            self.watched_revision = response.header.revision
+
+            self.watch_id = self.etcd_connection.add_watch_prefix_callback(
+                self.prefix, self.on_watch,
+                start_revision=response.header.revision + 1)
+            self.loaded = True
+
+    def on_watch(self, response):
+        # The watch reports a failure, like a compacted revision or a
+        # lost connection, by calling back with the exception
+        if isinstance(response, Exception):
+            CACHE_LOG.log("Watch on %s failed: %s" % (self.prefix, response))
+            self.invalidate()
+            return
+
+        with self.lock:
+            for event in response.events:
+                payload = None
+                if not isinstance(event, events.DeleteEvent):
+                    payload = event.value
+                self._update(event.key.decode(), event.mod_revision, payload)
+                self.watched_revision = max(self.watched_revision,
+                                            event.mod_revision)
+            self._prune()
+
+    def update(self, key, revision, payload):
+        """ Apply a write made by this process, without waiting for
+        its watch event. ``payload`` is None for a deleted key.
+        """
+        with self.lock:
+            if self.loaded and revision > self.watched_revision:
+                self._update(key, revision, payload)
+
+    def invalidate(self):
+        """ Drop the cached values. They are loaded again on the next
+        read.
+        """
+        with self.lock:
+            if self.watch_id is not None:
+                try:
+                    self.etcd_connection.cancel_watch(self.watch_id)
+                except Exception as e:
+                    CACHE_LOG.log("Error canceling watch: %s" % e)
+            self.watch_id = None
+            self.entries = {}
+            self.tombstones = set()
+            self.watched_revision = 0
+            self.loaded = False
+
+    def items(self):
+        """ Every cached key as (key, revision, value). """
+        self.load()
+        with self.lock:
+            return [(key, revision, value)
+                    for key, (revision, value) in self.entries.items()
+                    if value is not None]
+
+    def get(self, key):
+        """ The (revision, value) of ``key``, or None. """
+        self.load()
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry if entry is not None and entry[1] is not None \
+                else None
+
+    def _update(self, key, revision, payload):
+        current = self.entries.get(key)
+        if current is not None and current[0] >= revision:
+            return
+
+        if payload is None:
+            self.tombstones.add(key)
+        else:
+            self.tombstones.discard(key)
+            if self.parse is not None:
+                payload = self.parse(payload)
+        self.entries[key] = (revision, payload)
+
+    def _prune(self):
+        # No event older than the watched revision can arrive any more
+        for key in list(self.tombstones):
+            if self.entries[key][0] <= self.watched_revision:
+                del self.entries[key]
+                self.tombstones.discard(key)
@@ -12,51 +12,276 @@
 # implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import dill
 import etcd3
 import json
 
+from broker import exceptions as ex
+from broker.persistence import codec as state_codec
 from broker.persistence.persistence_interface import PersistenceInterface
+from broker.persistence.etcd_db.cache import Etcd3JobCache
 from broker.persistence.etcd_db.model import Plugin
 
 
 class Etcd3JobPersistence(PersistenceInterface):
+    """ Job persistence over etcd. Reads take no lock, and writes are
+    compare-and-swap transactions on the mod_revision last seen for
+    each key, so that jobs never contend on a shared lock.
 
-    def __init__(self, ip, port):
+    The INDEX_FIELDS of each job are stored under INDEX_PREFIX, in the
+    same transaction as its payload, so the jobs are listed from a
+    watched in-process cache of the index without decoding them.
+    """
+
+    JOB_PREFIX = 'kj-'
+    INDEX_PREFIX = 'asperathos_index:'
+    MAX_TXN_OPS = 128
+    MAX_CAS_RETRIES = 3
+
+    transient_errors = (etcd3.exceptions.ConnectionFailedError,
+                        etcd3.exceptions.ConnectionTimeoutError,
+                        etcd3.exceptions.InternalServerError)
+
+    def __init__(self, ip, port, codec=None):
 
+        self.codec = codec or state_codec.get_codec()
         self.etcd_connection = etcd3.client(str(ip), str(port))
+        self.revisions = {}
+
+    @property
+    def etcd_connection(self):
+        return self._etcd_connection
+
+    @etcd_connection.setter
+    def etcd_connection(self, connection):
+        self._etcd_connection = connection
+        self.cache = Etcd3JobCache(connection,
+                                   Etcd3JobPersistence.JOB_PREFIX)
+        self.index_cache = Etcd3JobCache(connection,
+                                         Etcd3JobPersistence.INDEX_PREFIX,
+                                         state_codec.decode_index)
+        self.index_backfilled = False
 
     def put(self, app_id, state):
-        with self.etcd_connection.lock('put', ttl=5):
-            ser = dill.dumps(state)
-            self.etcd_connection.put(str(app_id), ser)
+        self.put_many({app_id: state})
+
+    def put_many(self, states):
+        payloads = [(str(app_id), self.codec.encode(state),
+                     state_codec.encode_index(state_codec.state_index(state)))
+                    for app_id, state in states.items()]
+        # etcd limits the number of operations of a transaction, and
+        # each job takes two: its payload and its index
+        chunk = Etcd3JobPersistence.MAX_TXN_OPS // 2
+        conflicts = []
+        for i in range(0, len(payloads), chunk):
+            try:
+                self.compare_and_swap(payloads[i:i + chunk])
+            except ex.ConcurrentUpdateException as e:
+                conflicts.extend(e.keys)
+        if conflicts:
+            raise ex.ConcurrentUpdateException(conflicts)
+
+    def compare_and_swap(self, payloads):
+        """ Write all ``payloads``, as (key, payload, index), in one
+        transaction, provided that no key has been modified since its
+        last known revision. A key written by someone else is not
+        overwritten: its current revision is read in the same
+        transaction, the other keys are written again, and a
+        ConcurrentUpdateException lists the keys left out. As their
+        revision is now known, the next write of those keys goes
+        through.
+        """
+        transactions = self.etcd_connection.transactions
+        conflicts = []
+        for _ in range(Etcd3JobPersistence.MAX_CAS_RETRIES):
+            if not payloads:
+                break
+            compare = [transactions.mod(key) == self.revisions.get(key, 0)
+                       for key, value, index in payloads]
+            success = []
+            for key, value, index in payloads:
+                success.append(transactions.put(key, value))
+                success.append(transactions.put(self.index_key(key), index))
+            failure = [transactions.get(key)
+                       for key, value, index in payloads]
+
+            succeeded, responses = self.etcd_connection.transaction(
+                compare=compare, success=success, failure=failure)
+
+            if succeeded:
+                revision = responses[0].response_put.header.revision
+                for key, value, index in payloads:
+                    self.revisions[key] = revision
+                    self.cache.update(key, revision, value)
+                    self.index_cache.update(self.index_key(key), revision,
+                                            index)
+                payloads = []
+                break
+
+            modified = []
+            for (key, value, index), kvs in zip(payloads, responses):
+                current = kvs[0][1].mod_revision if kvs else 0
+                if current != self.revisions.get(key, 0):
+                    modified.append(key)
+                self.revisions[key] = current
+            conflicts.extend(modified)
+            payloads = [payload for payload in payloads
+                        if payload[0] not in modified]
+
+        if payloads:
+            conflicts.extend(payload[0] for payload in payloads)
+        if conflicts:
+            raise ex.ConcurrentUpdateException(conflicts)
 
     def get(self, app_id):
-        with self.etcd_connection.lock('get', ttl=5):
-            data = self.etcd_connection.get(str(app_id))[0]
-            return dill.loads(data)
+        data, metadata = self.etcd_connection.get(str(app_id))
+        if metadata is not None:
+            self.revisions[str(app_id)] = metadata.mod_revision
+        return self.codec.decode(data)
+
+    def get_many(self, app_ids):
+        """ The stored jobs among ``app_ids``, by app_id. """
+        items = []
+        for app_id in app_ids:
+            entry = self.cache.get(str(app_id))
+            if entry is not None:
+                items.append((str(app_id),) + entry)
+        return self.decode_items(items)
 
     def get_finished_jobs(self):
-        all_jobs = self.get_all()
-        finished_jobs = filter(lambda a: a.del_resources_authorization is True,
-                               all_jobs.values())
-        return finished_jobs
+        finished = []
+        for app_id, fields in self.index_items():
+            if not fields['del_resources_authorization']:
+                continue
+            entry = self.cache.get(app_id)
+            if entry is not None:
+                finished.append((app_id,) + entry)
+        return self.decode_items(finished)
 
     def delete(self, app_id):
-        with self.etcd_connection.lock('del', ttl=5):
-            self.etcd_connection.delete(str(app_id))
+        transactions = self.etcd_connection.transactions
+        key = str(app_id)
+        succeeded, responses = self.etcd_connection.transaction(
+            compare=[],
+            success=[transactions.delete(key),
+                     transactions.delete(self.index_key(key))],
+            failure=[])
+        revision = responses[0].response_delete_range.header.revision
+        self.revisions.pop(key, None)
+        self.cache.update(key, revision, None)
+        self.index_cache.update(self.index_key(key), revision, None)
+
+    def delete_all(self, prefix=JOB_PREFIX):
+        self.etcd_connection.delete_prefix(prefix)
+        self.etcd_connection.delete_prefix(Etcd3JobPersistence.INDEX_PREFIX)
+        self.revisions.clear()
+        self.cache.invalidate()
+        self.index_cache.invalidate()
+
+    def get_all(self):
+        return self.decode_items(self.cache.items())
+
+    def get_index(self, status=None, since=None, until=None,
+                  after=None, limit=None):
+        """ The index of the jobs, without their payloads, ordered by
+        app_id. Takes the same filters as the SQLite persistence.
+        """
+        jobs = []
+        for app_id, fields in sorted(self.index_items()):
+            starting_time = fields['starting_time']
+            if status and fields['status'] not in status:
+                continue
+            if since is not None and \
+               (starting_time is None or starting_time < since):
+                continue
+            if until is not None and \
+               (starting_time is None or starting_time >= until):
+                continue
+            if after is not None and app_id <= after:
+                continue
+            jobs.append(dict(fields, app_id=app_id))
+            if limit is not None and len(jobs) == limit:
+                break
+        return jobs
 
-    def delete_all(self, prefix='kj-'):
-        with self.etcd_connection.lock('delall', ttl=5):
-            self.etcd_connection.delete_prefix(prefix)
+    def index_items(self):
+        """ The INDEX_FIELDS of every job as (app_id, fields). """
+        if not self.index_backfilled:
+            self.backfill_index()
+        prefix = Etcd3JobPersistence.INDEX_PREFIX
+        return [(key[len(prefix):], fields)
+                for key, revision, fields in self.index_cache.items()]
 
-    def get_all(self, prefix="kj-"):
+    def backfill_index(self):
+        """ Write the index of the jobs stored before it existed. The
+        payload of each of them is decoded this one time, and the
+        index is only written if the payload is still the one read.
+        """
+        transactions = self.etcd_connection.transactions
+        for key, revision, payload in self.cache.items():
+            if self.index_cache.get(self.index_key(key)) is not None:
+                continue
+            index = state_codec.encode_index(
+                state_codec.index_fields(self.codec.fields(payload)))
+            succeeded, responses = self.etcd_connection.transaction(
+                compare=[transactions.mod(key) == revision],
+                success=[transactions.put(self.index_key(key), index)],
+                failure=[])
+            if succeeded:
+                self.index_cache.update(
+                    self.index_key(key),
+                    responses[0].response_put.header.revision, index)
+        self.index_backfilled = True
 
-        with self.etcd_connection.lock('getall', ttl=5):
-            all_jobs = dict([(m.key, dill.loads(n)) for (n, m)
-                             in self.etcd_connection.get_prefix(prefix)])
+    def index_key(self, key):
+        return Etcd3JobPersistence.INDEX_PREFIX + key
+
+    def decode_items(self, items):
+        jobs = {}
+        for key, revision, payload in items:
+            self.revisions[key] = revision
+            jobs[key] = self.codec.decode(payload)
+        return jobs
+
+
+class Etcd3CleanupPersistence(PersistenceInterface):
+    """ Pending resource deletions, as the deadline of each job. The
+    deadlines are stored as fixed width strings, so that etcd returns
+    them in order.
+    """
+
+    CLEANUP_PREFIX = 'asperathos_cleanup:'
+
+    def __init__(self, ip, port):
+
+        self.etcd_connection = etcd3.client(str(ip), str(port))
+
+    def put(self, app_id, deadline):
+        self.etcd_connection.put(
+            Etcd3CleanupPersistence.CLEANUP_PREFIX + str(app_id),
+            '%020.6f' % deadline)
+
+    def get(self, app_id):
+        data, metadata = self.etcd_connection.get(
+            Etcd3CleanupPersistence.CLEANUP_PREFIX + str(app_id))
+        return float(data) if data is not None else None
+
+    def delete(self, app_id):
+        self.etcd_connection.delete(
+            Etcd3CleanupPersistence.CLEANUP_PREFIX + str(app_id))
+
+    def delete_all(self):
+        self.etcd_connection.delete_prefix(
+            Etcd3CleanupPersistence.CLEANUP_PREFIX)
 
-        return all_jobs
+    def get_all(self):
+        """ Every pending deletion as (app_id, deadline), the earliest
+        deadline first.
+        """
+        prefix = Etcd3CleanupPersistence.CLEANUP_PREFIX
+        deadlines = self.etcd_connection.get_prefix(
+            prefix, sort_order='ascend', sort_target='value')
+        return [(metadata.key.decode()[len(prefix):], float(value))
+                for value, metadata in deadlines]
 
 
 class Etcd3PluginPersistence(PersistenceInterface):
@@ -83,43 +308,37 @@ class Etcd3PluginPersistence(PersistenceInterface):
                         component=component,
                         module=plugin_module)
 
-        with self.etcd_connection.lock('put', ttl=5):
-            self.etcd_connection.\
-                put('{}{}-{}'.format(Etcd3PluginPersistence.PLUGIN_PREFIX,
-                                     plugin_name, component),
-                    json.dumps(plugin_data))
+        self.etcd_connection.\
+            put('{}{}-{}'.format(Etcd3PluginPersistence.PLUGIN_PREFIX,
+                                 plugin_name, component),
+                json.dumps(plugin_data))
 
         return plugin
 
     def get(self, plugin_name):
-        with self.etcd_connection.lock('get', ttl=5):
-            data = self.etcd_connection.\
-                get('{}{}'.format(Etcd3PluginPersistence.PLUGIN_PREFIX,
-                                  plugin_name))[0]
-            return data
+        data = self.etcd_connection.\
+            get('{}{}'.format(Etcd3PluginPersistence.PLUGIN_PREFIX,
+                              plugin_name))[0]
+        return data
 
     def get_by_name_and_component(self, plugin_name, component):
-        with self.etcd_connection.lock('get', ttl=5):
-            data = self.etcd_connection.\
-                get('{}{}-{}'.format(Etcd3PluginPersistence.PLUGIN_PREFIX,
-                                     plugin_name, component))[0]
-            return data
+        data = self.etcd_connection.\
+            get('{}{}-{}'.format(Etcd3PluginPersistence.PLUGIN_PREFIX,
+                                 plugin_name, component))[0]
+        return data
 
     def delete(self, plugin_name):
-        with self.etcd_connection.lock('del', ttl=5):
-            self.etcd_connection.\
-                delete('{}{}'.format(Etcd3PluginPersistence.PLUGIN_PREFIX,
-                                     plugin_name))
+        self.etcd_connection.\
+            delete('{}{}'.format(Etcd3PluginPersistence.PLUGIN_PREFIX,
+                                 plugin_name))
 
     def delete_all(self):
-        with self.etcd_connection.lock('delall', ttl=5):
-            self.etcd_connection.\
-                delete_prefix(Etcd3PluginPersistence.PLUGIN_PREFIX)
+        self.etcd_connection.\
+            delete_prefix(Etcd3PluginPersistence.PLUGIN_PREFIX)
 
     def get_all(self, prefix=PLUGIN_PREFIX):
 
-        with self.etcd_connection.lock('getall', ttl=5):
-            raw_plugins = self.etcd_connection.get_prefix(prefix)
+        raw_plugins = self.etcd_connection.get_prefix(prefix)
 
         plugins = []
         for p, metadata in raw_plugins:
@@ -24,14 +24,24 @@ def required(fun):
 @six.add_metaclass(abc.ABCMeta)
 class PersistenceInterface(object):
 
+    # Errors after which the same write may succeed if tried again
+    transient_errors = ()
+
     @required
     def put(self, key, value):
         pass
 
+    def put_many(self, values):
+        for key, value in values.items():
+            self.put(key, value)
+
     @required
     def get(self, key):
         pass
 
+    def get_many(self, keys):
+        return dict([(key, self.get(key)) for key in keys])
+
     @required
     def delete(self, key):
         pass
@@ -37,11 +37,46 @@ class BaseModel(peewee.Model):
 
 
 class JobState(BaseModel):
+    """ Legacy table holding each job as a single serialized blob.
+    It is only read to migrate its rows to JobIndex and JobPayload.
+    """
 
     app_id = peewee.CharField(unique=True)
     obj_serialized = peewee.BlobField()
 
 
+class JobIndex(BaseModel):
+    """ Queryable fields of a job, filtered without deserializing
+    the job itself.
+    """
+
+    app_id = peewee.CharField(unique=True)
+    status = peewee.CharField(null=True, index=True)
+    starting_time = peewee.DateTimeField(null=True, index=True)
+    finish_time = peewee.DateTimeField(null=True, index=True)
+    del_resources_authorization = peewee.BooleanField(default=False,
+                                                      index=True)
+    job_resources_lifetime = peewee.IntegerField(default=0)
+
+
+class JobPayload(BaseModel):
+    """ The serialized job, including its data and report, which is
+    only loaded when the job itself is needed.
+    """
+
+    app_id = peewee.CharField(unique=True)
+    obj_serialized = peewee.BlobField()
+
+
+class CleanupDeadline(BaseModel):
+    """ When the resources of a finished job are due to be deleted,
+    as a Unix timestamp.
+    """
+
+    app_id = peewee.CharField(unique=True)
+    deadline = peewee.DoubleField(index=True)
+
+
 class Plugin(BaseModel):
 
     name = peewee.CharField()
@@ -13,8 +13,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from broker.persistence import codec as state_codec
 from broker.persistence.persistence_interface import PersistenceInterface
-from broker.persistence.sqlite.model import JobState, Plugin
+from broker.persistence.sqlite.model import db, JobState, JobIndex, \
+    JobPayload, CleanupDeadline, Plugin
 
 import dill
 import peewee
@@ -22,46 +24,158 @@ import peewee
 
 class SqliteJobPersistence(PersistenceInterface):
 
-    def __init__(self):
-        try:
-            JobState.create_table()
-        except peewee.OperationalError:
-            pass
+    INDEX_FIELDS = state_codec.INDEX_FIELDS
 
-    def put(self, app_id, state):
-        new_state = JobState(app_id=app_id,
-                             obj_serialized=dill.dumps(state))
-        try:
-            new_state.save()
+    # Largest number of app_ids bound to a single query
+    MAX_QUERY_IDS = 500
+
+    # Raised while the database is locked by another writer
+    transient_errors = (peewee.OperationalError,)
 
-        except peewee.IntegrityError:
-            query = JobState.update({JobState.
-                                     obj_serialized: dill.dumps(state)}).\
-                                     where(JobState.app_id == app_id)
-            query.execute()
+    # Set once the legacy JobState rows have been migrated. Loading
+    # them builds executors which create new persistence objects.
+    legacy_migrated = False
+
+    def __init__(self, codec=None):
+        self.codec = codec or state_codec.get_codec()
+        db.create_tables([JobIndex, JobPayload], safe=True)
+        if not SqliteJobPersistence.legacy_migrated:
+            SqliteJobPersistence.legacy_migrated = True
+            self.migrate_legacy_states()
+
+    def migrate_legacy_states(self):
+        """ Move the jobs stored as a single blob in the legacy
+        JobState table into the indexed tables.
+        """
+        if not JobState.table_exists():
+            return
+
+        for obj in JobState.select():
+            self.put(obj.app_id, dill.loads(obj.obj_serialized))
+        JobState.drop_table()
+
+    def index_fields(self, state):
+        fields = {}
+        for field in SqliteJobPersistence.INDEX_FIELDS:
+            value = getattr(state, field, None)
+            if value is not None:
+                fields[field] = value
+        return fields
+
+    def put(self, app_id, state):
+        self.put_many({app_id: state})
+
+    def put_many(self, states):
+        rows = [(app_id, self.index_fields(state), self.codec.encode(state))
+                for app_id, state in states.items()]
+        with db.atomic():
+            for app_id, fields, serialized in rows:
+                JobIndex.insert(app_id=app_id, **fields).\
+                    on_conflict_replace().execute()
+                JobPayload.insert(app_id=app_id,
+                                  obj_serialized=serialized).\
+                    on_conflict_replace().execute()
 
     def get(self, app_id):
-        state = JobState.get(JobState.app_id == app_id)
-        return dill.loads(state.obj_serialized)
+        state = JobPayload.get(JobPayload.app_id == app_id)
+        return self.codec.decode(state.obj_serialized)
+
+    def get_many(self, app_ids):
+        """ The stored jobs among ``app_ids``, by app_id. """
+        app_ids = list(app_ids)
+        chunk = SqliteJobPersistence.MAX_QUERY_IDS
+        jobs = {}
+        for i in range(0, len(app_ids), chunk):
+            states = JobPayload.select().\
+                where(JobPayload.app_id.in_(app_ids[i:i + chunk]))
+            for obj in states:
+                jobs[obj.app_id] = self.codec.decode(obj.obj_serialized)
+        return jobs
 
     def get_finished_jobs(self):
-        return dict(filter(lambda obj: obj[1].del_resources_authorization,
-                           self.get_all().items()))
+        finished_states = JobPayload.select().\
+            join(JobIndex, on=(JobPayload.app_id == JobIndex.app_id)).\
+            where(JobIndex.del_resources_authorization == True)  # noqa: E712
+        return dict([(obj.app_id, self.codec.decode(obj.obj_serialized))
+                     for obj in finished_states])
 
     def delete(self, app_id):
-        state = JobState.get(JobState.app_id == app_id)
-        state.delete_instance()
+        with db.atomic():
+            JobIndex.delete().\
+                where(JobIndex.app_id == app_id).execute()
+            JobPayload.delete().\
+                where(JobPayload.app_id == app_id).execute()
 
     def delete_all(self):
-        JobState.delete()
+        with db.atomic():
+            JobIndex.delete().execute()
+            JobPayload.delete().execute()
+
+    def get_index(self, status=None, since=None, until=None,
+                  after=None, limit=None):
+        """ The index of the jobs, without their payloads, ordered by
+        app_id. The jobs can be filtered by a list of ``status`` and
+        by a ``since`` (inclusive) and ``until`` (exclusive) range of
+        starting times. A page of ``limit`` jobs starts right after
+        the app_id ``after``.
+
+        Returns:
+            list -- A dict with the app_id and INDEX_FIELDS of each job
+        """
+        query = JobIndex.select().order_by(JobIndex.app_id)
+        if status:
+            query = query.where(JobIndex.status.in_(status))
+        if since is not None:
+            query = query.where(JobIndex.starting_time >= since)
+        if until is not None:
+            query = query.where(JobIndex.starting_time < until)
+        if after is not None:
+            query = query.where(JobIndex.app_id > after)
+        if limit is not None:
+            query = query.limit(limit)
+
+        return [dict([('app_id', obj.app_id)] +
+                     [(field, getattr(obj, field))
+                      for field in SqliteJobPersistence.INDEX_FIELDS])
+                for obj in query]
 
     def get_all(self):
-        all_states = JobState.select()
-        all_jobs = dict([(obj.app_id, dill.loads(obj.obj_serialized))
+        all_states = JobPayload.select()
+        all_jobs = dict([(obj.app_id,
+                          self.codec.decode(obj.obj_serialized))
                          for obj in all_states])
         return all_jobs
 
 
+class SqliteCleanupPersistence(PersistenceInterface):
+    """ Pending resource deletions, as the deadline of each job. """
+
+    def __init__(self):
+        db.create_tables([CleanupDeadline], safe=True)
+
+    def put(self, app_id, deadline):
+        CleanupDeadline.insert(app_id=app_id, deadline=deadline).\
+            on_conflict_replace().execute()
+
+    def get(self, app_id):
+        return CleanupDeadline.get(CleanupDeadline.app_id == app_id).deadline
+
+    def delete(self, app_id):
+        CleanupDeadline.delete().\
+            where(CleanupDeadline.app_id == app_id).execute()
+
+    def delete_all(self):
+        CleanupDeadline.delete().execute()
+
+    def get_all(self):
+        """ Every pending deletion as (app_id, deadline), the earliest
+        deadline first.
+        """
+        deadlines = CleanupDeadline.select().\
+            order_by(CleanupDeadline.deadline)
+        return [(obj.app_id, obj.deadline) for obj in deadlines]
+
+
 class SqlitePluginPersistence(PersistenceInterface):
 
     def __init__(self):
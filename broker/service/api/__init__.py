@@ -14,8 +14,8 @@
 # limitations under the License.
 
 import configparser
-import kubernetes as kube
 from broker.utils.logger import Log
+from broker.utils.plugins import k8s_clients
 
 API_LOG = Log("APIv10", "logs/APIv10.log")
 CONFIG_PATH = "./data/conf"
@@ -38,6 +38,41 @@ try:
     plugins = config.get('general', 'plugins').split(',')
     cleaner_interval = config.getint('general', 'cleaner_interval',
                                      fallback=1)
+    # Milliseconds between two batched writes of the job states
+    state_flush_interval = config.getint('general', 'state_flush_interval',
+                                         fallback=100)
+    # Resource deletions of expired jobs run in a pool of workers and
+    # are retried with an exponential backoff, in seconds
+    cleaner_workers = config.getint('general', 'cleaner_workers',
+                                    fallback=4)
+    cleaner_retries = config.getint('general', 'cleaner_retries',
+                                    fallback=3)
+    cleaner_backoff = config.getfloat('general', 'cleaner_backoff',
+                                      fallback=5)
+    # Seconds the deletion of the resources of a job may take, over
+    # every request it makes
+    teardown_timeout = config.getfloat('general', 'teardown_timeout',
+                                       fallback=30)
+    # Submissions are started by a pool of workers, with at most
+    # submission_cluster_limit starting on each cluster (0 for no
+    # limit). Beyond submission_queue_size waiting submissions, new
+    # ones are refused with a 429.
+    submission_workers = config.getint('general', 'submission_workers',
+                                       fallback=8)
+    submission_queue_size = config.getint('general',
+                                          'submission_queue_size',
+                                          fallback=100)
+    submission_cluster_limit = config.getint('general',
+                                             'submission_cluster_limit',
+                                             fallback=0)
+    # HTTP server of the API: "development", the Flask server, or
+    # "waitress", which must be installed. Both run a single process,
+    # since the submissions and their trackers live in its memory.
+    server = config.get('general', 'server', fallback='development')
+    # Requests served at the same time. The development server runs
+    # each request in a new thread when this is greater than 1. The
+    # cluster configuration is not locked, so only one by default.
+    server_threads = config.getint('general', 'server_threads', fallback=1)
 
     """ Validate if really exists a section to listed plugins """
     for plugin in plugins:
@@ -59,10 +94,21 @@ try:
         plugin_name = 'sqlite'
         local_database_path = 'local_database/db.db'
 
+    # Format used to serialize the job states: json or dill
+    persistence_codec = config.get('persistence', 'codec', fallback='json')
+
     if 'kubejobs' in plugins:
 
         # Setting default values for the necessary variables
         k8s_conf_path = CONFIG_PATH
+        # Number of workload items sent by each RPUSH
+        redis_push_chunk_size = 1000
+        # Idle redis Pods kept running for the next jobs, 0 disables it
+        redis_pool_size = 0
+        # Redis servers shared by every job, as (host, port) pairs. When
+        # set, each job uses keys prefixed by its app_id in one of them
+        # instead of its own redis Pod
+        shared_redis = []
 
         # If explicitly stated in the cfg file, overwrite the variables
         if(config.has_section('kubejobs')):
@@ -73,11 +119,26 @@ try:
                 count_queue = config.get('kubejobs', 'count_queue')
             if(config.has_option('kubejobs', 'redis_ip')):
                 redis_ip = config.get('kubejobs', 'redis_ip')
+            if(config.has_option('kubejobs', 'redis_push_chunk_size')):
+                redis_push_chunk_size = \
+                    config.getint('kubejobs', 'redis_push_chunk_size')
+            if(config.has_option('kubejobs', 'redis_pool_size')):
+                redis_pool_size = config.getint('kubejobs',
+                                                'redis_pool_size')
+            if(config.has_option('kubejobs', 'shared_redis')):
+                for shard in config.get('kubejobs',
+                                        'shared_redis').split(','):
+                    if shard.strip():
+                        shard_host, shard_port = shard.strip().rsplit(':', 1)
+                        shared_redis.append((shard_host, int(shard_port)))
 
 except Exception as e:
     API_LOG.log("Error: %s" % e)
     quit()
 
+if server not in ('development', 'waitress'):
+    raise Exception("Unknown server '%s'" % server)
+
 
 def get_node_cluster(k8s_conf_path):
     """ Gets the IP address of one slave node contained
@@ -92,8 +153,7 @@ def get_node_cluster(k8s_conf_path):
         string -- The node IP
     """
     try:
-        kube.config.load_kube_config(k8s_conf_path)
-        CoreV1Api = kube.client.CoreV1Api()
+        CoreV1Api = k8s_clients.core_v1(k8s_conf_path)
         for node in CoreV1Api.list_node().items:
             is_ready = \
                 [s for s in node.status.conditions
@@ -22,15 +22,23 @@ import datetime
 import threading
 
 from broker.service import plugin_service
+from broker.service import state_flusher
 from broker.persistence import check_basic_plugins
+from broker.persistence import codec
+from broker.persistence import connectors
 from broker.persistence.etcd_db import plugin as etcd
 from broker.persistence.sqlite import plugin as sqlite
 from broker.service import api
 from broker.utils.logger import Log
 from broker.utils.framework import authorizer
 from broker.utils.framework import visualizer
+from broker.utils.plugins import k8s_clients
+from broker.utils.plugins import redis_pool
 from broker import exceptions as ex
 from broker.service.job_cleaner_daemon import JobCleanerDaemon
+from broker.service.job_status_watcher import JobStatusWatcher
+from broker.service.submission_queue import SubmissionQueue
+from broker.service.submission_registry import SubmissionRegistry
 
 API_LOG = Log("APIv10", "logs/APIv10.log")
 
@@ -39,39 +47,70 @@ activated_cluster = None
 
 SSH_KEY_PATH = '/root/.ssh/id_rsa.pub'
 
+# Largest page of submissions returned by list_submissions
+SUBMISSIONS_PAGE_MAX_SIZE = 1000
+
 CLUSTER_CONF_PATH = "./data/clusters"
 
 
 def setup_database():
+    # The same job connector is shared by every executor
     if api.plugin_name == 'etcd':
-        return (etcd.Etcd3JobPersistence(api.persistence_ip,
-                                         api.persistence_port),
+        return (connectors.configured_job_persistence(),
                 etcd.Etcd3PluginPersistence(api.persistence_ip,
                                             api.persistence_port))
     elif api.plugin_name == 'sqlite':
-        return (sqlite.SqliteJobPersistence(),
+        return (connectors.configured_job_persistence(),
                 sqlite.SqlitePluginPersistence())
 
     else:
         raise Exception('Unknown database name')
 
 
+def setup_cleanup_schedule():
+    if api.plugin_name == 'etcd':
+        return etcd.Etcd3CleanupPersistence(api.persistence_ip,
+                                            api.persistence_port)
+    elif api.plugin_name == 'sqlite':
+        return sqlite.SqliteCleanupPersistence()
+
+    else:
+        raise Exception('Unknown database name')
+
+
 db_connector, plugin_connector = setup_database()
+cleanup_connector = setup_cleanup_schedule()
 check_basic_plugins(plugin_connector)
 
 
 def restore_submissions_backup(db_connector):
-    return db_connector.get_all()
+    # Only the index of the stored jobs is read, each job is decoded
+    # when first needed
+    return SubmissionRegistry(db_connector)
 
 
 submissions = restore_submissions_backup(db_connector)
-job_cleaner_svc = JobCleanerDaemon(submissions)
+job_cleaner_svc = JobCleanerDaemon(submissions, api.cleaner_workers,
+                                   api.cleaner_retries, api.cleaner_backoff,
+                                   cleanup_connector)
+job_status_watcher = JobStatusWatcher()
+
+submission_queue = SubmissionQueue(api.submission_workers,
+                                   api.submission_queue_size,
+                                   api.submission_cluster_limit)
 
 
 def delete_jobs_resources_or_activate_cleaner_svc():
-    finished_jobs = db_connector.get_finished_jobs()
-    for job_id in finished_jobs:
-        job = finished_jobs[job_id]
+    # The stored cleanup schedule resumes the cleaner. The finished jobs
+    # without a stored deletion, like the ones finished before an
+    # upgrade, are found in the index and scheduled too.
+    restored = set(job_cleaner_svc.restore())
+
+    finished_jobs = [submissions[row['app_id']]
+                     for row in submissions.rows()
+                     if row['del_resources_authorization'] and
+                     row['app_id'] not in restored]
+    for job in finished_jobs:
         now = datetime.datetime.now()
         elapsed_time = (now - job.finish_time)
         if elapsed_time.total_seconds() >= job.job_resources_lifetime:
@@ -90,27 +129,64 @@ delete_jobs_resources_or_activate_cleaner_svc()
 
 
 def create_thread(job):
-    thread = threading.Thread(target=job.wait_job_finish)
+    thread = threading.Thread(target=job.wait_job_finish,
+                              kwargs={'reconciled': True})
     thread.daemon = True
     thread.start()
 
 
-def recover_ongoing_jobs_thread(jobs):
-    for key in jobs:
-        job = jobs[key]
-        if not job.job_completed and not job.terminated:
-            create_thread(job)
+def unfinished_jobs(jobs):
+    """ The jobs whose stored status is not final, the only ones that
+    can still be running. Only these are decoded at startup.
+    """
+    return [jobs[row['app_id']]
+            for row in jobs.rows()
+            if row['status'] not in codec.FINAL_STATES]
 
 
-recover_ongoing_jobs_thread(submissions)
+def recover_ongoing_jobs_thread(jobs):
+    # Also the jobs that ended while the manager was down, so they are
+    # reported and their resources are cleaned up
+    for job in jobs:
+        create_thread(job)
 
 
 def synchronize_jobs_with_the_cluster(jobs):
-    for key in jobs:
-        jobs[key].synchronize()
-
+    try:
+        job_status_watcher.reconcile(jobs)
+    except Exception as e:
+        API_LOG.log("Error listing the jobs, synchronizing one by "
+                    "one: %s" % e)
+        for job in jobs:
+            job.synchronize()
+
+
+def requeue_submissions(jobs):
+    """ Queue again the submissions stored while waiting to start. """
+    for job in jobs:
+        data = job.data or {}
+        try:
+            submission_queue.submit(job, data, data.get('cluster_name'))
+        except ex.TooManyRequestsException as e:
+            job.fail(e)
+
+
+ongoing_jobs = []
+queued_jobs = []
+for job in unfinished_jobs(submissions):
+    if job.job_completed or job.terminated:
+        continue
+    # A created job has no resources in the cluster yet
+    if job.get_application_state() == 'created':
+        queued_jobs.append(job)
+    else:
+        ongoing_jobs.append(job)
+synchronize_jobs_with_the_cluster(ongoing_jobs)
+recover_ongoing_jobs_thread(ongoing_jobs)
+requeue_submissions(queued_jobs)
 
-synchronize_jobs_with_the_cluster(submissions)
+# Start creating the idle redis Pods before the first submission
+redis_pool.POOL.start()
 
 
 def install_plugin(data):
@@ -221,27 +297,122 @@ def end_submission(submission_id, data, hard_finish):
     return {"job_id": submission_id}
 
 
-def list_submissions():
-    submissions_status = {}
-    for key in submissions:
+def list_submissions(args=None):
+    """ List the submissions. Without query arguments, every
+    submission is listed by id, as returned by submission_status.
+    Otherwise the submissions are read from the index of the
+    persistence and paginated by app_id.
 
-        submission = submissions.get(key)
+    Query arguments:
+        fresh -- Synchronize each submission with the cluster first,
+                 only without the other arguments
+        status -- Comma-separated list of statuses
+        since, until -- ISO 8601 range of starting times
+        limit -- Maximum number of submissions in the page
+        cursor -- The next_cursor returned with the previous page
+    Raises:
+        ex.BadRequestException -- Invalid query arguments
+    """
+    args = args or {}
+    if not [arg for arg in args if arg != 'fresh']:
+        fresh = is_fresh(args)
+        submissions_status = {}
+        for key, submission in list(submissions.items()):
+            submissions_status[key] = submission_snapshot(submission,
+                                                          fresh)
+
+        return submissions_status
+
+    status = args.get('status')
+    if status:
+        status = [s.strip() for s in status.split(',')]
+    limit = parse_query_argument(args, 'limit', int)
+    if limit is not None and limit <= 0:
+        raise ex.BadRequestException("limit must be a positive integer")
+    if limit is not None:
+        limit = min(limit, SUBMISSIONS_PAGE_MAX_SIZE)
+
+    # One more row tells whether there is a next page
+    rows = db_connector.get_index(
+        status=status,
+        since=parse_query_argument(args, 'since', parse_time),
+        until=parse_query_argument(args, 'until', parse_time),
+        after=args.get('cursor') or None,
+        limit=limit + 1 if limit is not None else None)
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]['app_id']
+
+    return {"submissions": [{"app_id": row['app_id'],
+                             "status": row['status'],
+                             "starting_time":
+                                 format_time(row['starting_time']),
+                             "finish_time": format_time(row['finish_time'])}
+                            for row in rows],
+            "next_cursor": next_cursor}
+
+
+def submission_snapshot(submission, fresh=False):
+    """ The status of the submission as last seen by the job status
+    tracker, with the time it was seen in ``last_synced_at``. With
+    ``fresh``, it is read from the cluster first.
+
+    The jobs already finished when the manager started are not read
+    from the cluster again, so their ``last_synced_at`` is None and
+    their status is the final one stored.
+    """
+    if fresh:
         submission.synchronize()
-        submissions_status[key] = \
-            json.loads(submission.__repr__())
+    if hasattr(submission, 'status_view'):
+        snapshot = dict(submission.status_view())
+    else:
+        snapshot = json.loads(submission.__repr__())
+    snapshot['last_synced_at'] = \
+        format_time(getattr(submission, 'last_synced_at', None))
+    return snapshot
+
+
+def is_fresh(args):
+    return (args or {}).get('fresh', '').lower() in ('true', '1')
+
 
-    return submissions_status
+def parse_query_argument(args, name, parse):
+    value = args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return parse(value)
+    except ValueError:
+        raise ex.BadRequestException("Invalid %s: %s" % (name, value))
+
+
+def parse_time(value):
+    """ An ISO 8601 time as the naive local time in which the jobs
+    store their starting times. A time with an offset is converted.
+    """
+    time = datetime.datetime.fromisoformat(value)
+    if time.tzinfo is not None:
+        time = time.astimezone().replace(tzinfo=None)
+    return time
+
+
+def format_time(value):
+    if value is None:
+        return None
+    return value.strftime('%Y-%m-%dT%H:%M:%S.%fGMT')
 
 
-def submission_status(submission_id):
+def submission_status(submission_id, args=None):
     if submission_id not in submissions:
         API_LOG.log("Wrong request")
         raise ex.BadRequestException()
 
     # TODO: Update status of application with more informations
 
-    return json.loads(submissions.
-                      get(submission_id).__repr__())
+    return submission_snapshot(submissions.get(submission_id),
+                               is_fresh(args))
 
 
 def submission_report(submission_id):
@@ -459,6 +630,7 @@ def delete_cluster(cluster_name, data):
         if(filecmp.cmp("%s/%s/%s" % (CLUSTER_CONF_PATH, conf_name,
                                      conf_name), api.k8s_conf_path)):
             open(api.k8s_conf_path, 'w').close()
+            k8s_clients.invalidate(api.k8s_conf_path)
 
         shutil.rmtree("%s/%s/" % (CLUSTER_CONF_PATH, conf_name))
 
@@ -496,11 +668,13 @@ def activate_cluster(cluster_name, data):
     elif(cluster_name == activated_cluster):
         shutil.copyfile("%s/%s/%s" % (CLUSTER_CONF_PATH, conf_name,
                                       conf_name), api.k8s_conf_path)
+        k8s_clients.invalidate(api.k8s_conf_path)
         API_LOG.log("Cluster already activated in this Asperathos instance!")
         status = "success"
     else:
         shutil.copyfile("%s/%s/%s" % (CLUSTER_CONF_PATH, conf_name,
                                       conf_name), api.k8s_conf_path)
+        k8s_clients.invalidate(api.k8s_conf_path)
         status = "success"
         clusters[cluster_name]['active'] = True
 
@@ -553,6 +727,8 @@ def delete_submission(submission_id, data):
         job_isnt_ongoing = submission.get_application_state() != "ongoing"
         if job_isnt_ongoing and not delete_authorized:
 
+            state_flusher.FLUSHER.discard(submission_id)
+            job_cleaner_svc.cancel(submission_id)
             db_connector.delete(submission_id)
             del submissions[submission_id]
             API_LOG.log("%s submission deleted from this \
@@ -1,57 +1,265 @@
+import heapq
+import itertools
 import time
 import threading
 
-from broker.utils.accumulated_sum_linked_list import AccumulatedSumLinkedList
+from concurrent.futures import ThreadPoolExecutor
+
+from broker.utils.logger import Log
+
+CLEANER_LOG = Log("JobCleanerDaemon", "logs/job_cleaner_daemon.log")
 
 
 class JobCleanerDaemon():
+    """ Deletes the resources of finished jobs when their lifetime
+    expires. Pending deletions are kept in a heap ordered by absolute
+    deadline, and the worker sleeps on a condition until the earliest
+    deadline or until a new deletion is scheduled.
+
+    A job has at most one pending deletion. Cancelling or rescheduling
+    it only updates ``deadlines``, and the outdated heap entries are
+    skipped when they reach the top.
+
+    Due deletions run in a pool of ``workers`` threads, so a slow
+    service only holds the deletion that is waiting on it. A failed
+    deletion is scheduled again after ``backoff`` seconds, doubled on
+    each attempt. The last of ``retries`` attempts logs the failure
+    and gives up, as a single attempt used to.
 
-    def __init__(self, submissions):
+    When a ``cleanup_connector`` is given, the deadline of every
+    pending deletion is also stored there, as a Unix timestamp, so
+    that ``restore`` resumes the schedule after a restart. It is
+    written after releasing the condition, so a slow store does not
+    hold the scheduling.
+    """
+
+    def __init__(self, submissions, workers=4, retries=3, backoff=5,
+                 cleanup_connector=None):
         self.submissions = submissions
-        self.queue = AccumulatedSumLinkedList()
+        self.cleanup_connector = cleanup_connector
+        self.queue = []
+        self.deadlines = {}
+        # Unix timestamp of each deletion not finished yet, as stored
+        self.stored = {}
+        self.store_lock = threading.Lock()
+        self.attempts = {}
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
         self.thread = None
         self.active = False
+        self.retries = retries
+        self.backoff = backoff
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.stats = {'submitted': 0, 'running': 0, 'succeeded': 0,
+                      'retried': 0, 'failed': 0,
+                      'total_latency': 0.0, 'max_latency': 0.0}
 
     def start_delete_resources_management(self):
-        while not self.queue.is_empty():
-            time.sleep(1)
-            self.queue.head.value.remaining_time -= 1
-            if self.queue.head.value.remaining_time <= 0:
-                jobs_finished_ids = self.queue.pop().value.get_app_ids()
-                for job_id in jobs_finished_ids:
-                    job = self.submissions[job_id]
-                    job.delete_job_resources()
-        self.active = False
+        while True:
+            app_ids = self.wait_next_deadline()
+            if app_ids is None:
+                return
 
-    def insert_element(self, app_id, time):
-        element = JobRepr(app_id, time)
-        self.queue.insert(element)
-        if not self.active:
-            self.active = True
-            self.start_thread()
+            for app_id in app_ids:
+                try:
+                    job = self.submissions.get(app_id)
+                except Exception as e:
+                    self.read_failed(app_id, e)
+                    continue
+                with self.condition:
+                    if job is None:
+                        self.attempts.pop(app_id, None)
+                        self.stored.pop(app_id, None)
+                    else:
+                        self.stats['submitted'] += 1
+                if job is None:
+                    self.store(app_id)
+                    continue
+                self.pool.submit(self.teardown, job)
 
-    def start_thread(self):
-        self.thread = \
-            threading.Thread(target=self.start_delete_resources_management)
-        self.thread.daemon = True
-        self.thread.start()
+    def teardown(self, job):
+        with self.condition:
+            attempt = self.attempts.get(job.app_id, 0) + 1
+            self.stats['running'] += 1
+
+        start = time.monotonic()
+        try:
+            deleted = job.delete_job_resources(
+                raise_errors=attempt < self.retries)
+            result = 'failed' if deleted is False else 'succeeded'
+        except Exception as e:
+            result = 'retried'
+            CLEANER_LOG.log("Error deleting resources of %s, attempt %d: %s"
+                            % (job.app_id, attempt, e))
+        latency = time.monotonic() - start
+
+        with self.condition:
+            self.stats['running'] -= 1
+            self.stats[result] += 1
+            self.stats['total_latency'] += latency
+            self.stats['max_latency'] = max(self.stats['max_latency'],
+                                            latency)
+            if result == 'retried':
+                self.attempts[job.app_id] = attempt
+                self.enqueue(job.app_id, self.backoff * 2 ** (attempt - 1))
+            else:
+                self.attempts.pop(job.app_id, None)
+                self.stored.pop(job.app_id, None)
+        self.store(job.app_id)
+
+        CLEANER_LOG.log("Teardown of %s %s in %.2fs (attempt %d, %s)"
+                        % (job.app_id, result, latency, attempt,
+                           self.metrics()))
 
+    def read_failed(self, app_id, error):
+        """ Schedule again the deletion of a job whose state could
+        not be read, as a failed attempt of its teardown.
+        """
+        with self.condition:
+            attempt = self.attempts.get(app_id, 0) + 1
+            if attempt < self.retries:
+                self.attempts[app_id] = attempt
+                self.enqueue(app_id, self.backoff * 2 ** (attempt - 1))
+            else:
+                self.attempts.pop(app_id, None)
+                self.stored.pop(app_id, None)
+        self.store(app_id)
 
-class JobRepr():
+        CLEANER_LOG.log("Error reading %s, attempt %d: %s"
+                        % (app_id, attempt, error))
 
-    def __init__(self, app_id, remaining_time):
+    def wait_next_deadline(self):
+        """ Block until the earliest deadline and return the ids of
+        every job due by then, or None when there is nothing left to
+        wait for.
+        """
+        with self.condition:
+            while True:
+                self.drop_outdated()
+                if not self.queue:
+                    self.active = False
+                    return None
 
-        self.remaining_time = remaining_time
-        self.app_ids = [app_id]
+                now = time.monotonic()
+                if self.queue[0][0] > now:
+                    self.condition.wait(self.queue[0][0] - now)
+                    continue
 
-    def get_app_ids(self):
-        return self.app_ids
+                app_ids = []
+                while self.queue and self.queue[0][0] <= now:
+                    deadline, _, app_id = heapq.heappop(self.queue)
+                    if self.deadlines.get(app_id) == deadline:
+                        del self.deadlines[app_id]
+                        app_ids.append(app_id)
+                return app_ids
 
-    def get_remaining_time(self):
-        return self.remaining_time
+    def metrics(self):
+        """ Queue depth and teardown latency of the cleaner. """
+        with self.condition:
+            finished = self.stats['succeeded'] + self.stats['retried'] + \
+                self.stats['failed']
+            return {
+                'pending': len(self.deadlines),
+                'queued': self.stats['submitted'] - finished -
+                self.stats['running'],
+                'running': self.stats['running'],
+                'succeeded': self.stats['succeeded'],
+                'retried': self.stats['retried'],
+                'failed': self.stats['failed'],
+                'avg_latency': self.stats['total_latency'] / finished
+                if finished else 0.0,
+                'max_latency': self.stats['max_latency']
+            }
 
-    def set_remaining_time(self, new_remaining_time):
-        self.remaining_time = new_remaining_time
+    def insert_element(self, app_id, remaining_time):
+        with self.condition:
+            self.attempts.pop(app_id, None)
+            self.enqueue(app_id, remaining_time)
+        self.store(app_id)
 
-    def __repr__(self):
-        return str(self.app_ids) + ": " + str(self.remaining_time) + " sec"
+    def restore(self):
+        """ Schedule again the deletions stored by a previous run.
+        Deletions whose deadline has passed are run right away.
+
+        Returns:
+            list -- The app_ids of the restored deletions
+        """
+        if self.cleanup_connector is None:
+            return []
+
+        deadlines = self.cleanup_connector.get_all()
+        now = time.time()
+        with self.condition:
+            for app_id, deadline in deadlines:
+                self.enqueue(app_id, max(deadline - now, 0), deadline)
+        return [app_id for app_id, deadline in deadlines]
+
+    def enqueue(self, app_id, remaining_time, stored=None):
+        """ Schedule the deletion of ``app_id`` in ``remaining_time``
+        seconds. Called holding the condition, the new deadline is
+        then written by ``store``, unless it is the ``stored`` one.
+        """
+        deadline = time.monotonic() + remaining_time
+        with self.condition:
+            self.stored[app_id] = stored or time.time() + remaining_time
+            self.deadlines[app_id] = deadline
+            heapq.heappush(self.queue,
+                           (deadline, next(self.sequence), app_id))
+            self.compact()
+            self.condition.notify()
+            if not self.active:
+                self.active = True
+                self.start_thread()
+
+    def cancel(self, app_id):
+        with self.condition:
+            self.attempts.pop(app_id, None)
+            self.stored.pop(app_id, None)
+            cancelled = self.deadlines.pop(app_id, None) is not None
+            self.compact()
+            self.condition.notify()
+        self.store(app_id)
+        return cancelled
+
+    def pending(self):
+        with self.condition:
+            return len(self.deadlines)
+
+    def store(self, app_id):
+        """ Write the current deadline of ``app_id``, or remove it when
+        no deletion is pending. Called without the condition. The
+        writes are serialized and each one reads the latest deadline,
+        so the last write is never an outdated one.
+        """
+        if self.cleanup_connector is None:
+            return
+        with self.store_lock:
+            with self.condition:
+                deadline = self.stored.get(app_id)
+            try:
+                if deadline is None:
+                    self.cleanup_connector.delete(app_id)
+                else:
+                    self.cleanup_connector.put(app_id, deadline)
+            except Exception as e:
+                CLEANER_LOG.log("Error storing the deadline of %s: %s"
+                                % (app_id, e))
+
+    def drop_outdated(self):
+        while self.queue and \
+                self.deadlines.get(self.queue[0][2]) != self.queue[0][0]:
+            heapq.heappop(self.queue)
+
+    def compact(self):
+        # Rebuild the heap once most of its entries are outdated, so
+        # that cancellations do not keep it growing
+        if len(self.queue) > 2 * len(self.deadlines) + 64:
+            self.queue = [(deadline, next(self.sequence), app_id)
+                          for app_id, deadline in self.deadlines.items()]
+            heapq.heapify(self.queue)
+
+    def start_thread(self):
+        self.thread = \
+            threading.Thread(target=self.start_delete_resources_management)
+        self.thread.daemon = True
+        self.thread.start()
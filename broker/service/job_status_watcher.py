@@ -0,0 +1,188 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import threading
+import time
+
+from broker.service import state_flusher
+from broker.utils.logger import Log
+from broker.utils.plugins import k8s
+
+WATCHER_LOG = Log("JobStatusWatcher", "logs/job_status_watcher.log")
+
+
+class JobStatusWatcher():
+    """ Tracks the status of every registered job through a single
+    Kubernetes list+watch stream, dispatching each Job event to the
+    executor that owns it. The watch is resumed from the last
+    resource version seen and the jobs are listed again only when
+    that version has expired.
+
+    Each time the jobs are listed, and each time a watch ends without
+    errors, every registered executor is marked as synchronized, so
+    their states can be read as up-to-date snapshots.
+    """
+
+    def __init__(self, namespace="default", watch_timeout=60,
+                 retry_interval=5):
+        self.namespace = namespace
+        self.watch_timeout = watch_timeout
+        self.retry_interval = retry_interval
+        self.k8s = k8s
+        self.executors = {}
+        self.resource_version = None
+        self.lock = threading.Lock()
+        self.thread = None
+        self.active = False
+
+    def register(self, executor):
+        with self.lock:
+            self.executors[executor.app_id] = executor
+            if not self.active:
+                self.active = True
+                self.start_thread()
+
+    def unregister(self, app_id):
+        with self.lock:
+            self.executors.pop(app_id, None)
+
+    def get_executor(self, app_id):
+        with self.lock:
+            return self.executors.get(app_id)
+
+    def start_status_tracking(self):
+        while True:
+            with self.lock:
+                if not self.executors:
+                    self.active = False
+                    return
+            try:
+                if self.resource_version is None:
+                    self.list_jobs()
+                self.watch_jobs()
+            except Exception as e:
+                WATCHER_LOG.log("Watch on jobs interrupted: %s" % e)
+                self.resource_version = None
+                time.sleep(self.retry_interval)
+
+    def list_jobs(self):
+        job_list = self.k8s.list_jobs(self.namespace)
+        found = set()
+        for job in job_list.items:
+            found.add(job.metadata.name)
+            self.dispatch('MODIFIED', job)
+
+        # A registered job missing from a fresh list has been deleted
+        # while the watch was not running
+        with self.lock:
+            missing = [app_id for app_id in self.executors
+                       if app_id not in found]
+        for app_id in missing:
+            self.dispatch_deletion(app_id)
+
+        self.resource_version = job_list.metadata.resource_version
+        self.mark_synced()
+
+    def reconcile(self, executors):
+        """ Update ``executors`` from a single list of the jobs of the
+        namespace. The ones whose job is missing are marked as not
+        found and their states are written in one batch.
+
+        The executors are registered before the list, so no event is
+        lost between the list and the watch, and the ones still
+        running are left registered. When the watch is not running
+        yet, it is started right after this list.
+        """
+        with self.lock:
+            for executor in executors:
+                self.executors[executor.app_id] = executor
+
+        job_list = self.k8s.list_jobs(self.namespace)
+        jobs = dict([(job.metadata.name, job) for job in job_list.items])
+
+        missing = []
+        for executor in executors:
+            job = jobs.get(executor.app_id)
+            if job is None:
+                missing.append(executor)
+                continue
+            try:
+                executor.update_from_job_status(job.status)
+            except Exception as e:
+                WATCHER_LOG.log("Error updating job %s: %s"
+                                % (executor.app_id, e))
+
+        for executor in missing:
+            executor.mark_job_not_found(flush=False)
+        if missing:
+            state_flusher.FLUSHER.flush()
+
+        running = False
+        for executor in executors:
+            if executor.job_completed or executor.terminated:
+                self.unregister(executor.app_id)
+            else:
+                running = True
+
+        with self.lock:
+            if running and not self.active:
+                self.resource_version = job_list.metadata.resource_version
+                self.active = True
+                self.start_thread()
+
+    def watch_jobs(self):
+        stream = self.k8s.watch_jobs(self.namespace,
+                                     self.resource_version,
+                                     self.watch_timeout)
+        for event in stream:
+            if event['type'] == 'ERROR':
+                # The resource version is too old, list the jobs again
+                self.resource_version = None
+                return
+            job = event['object']
+            self.resource_version = job.metadata.resource_version
+            self.dispatch(event['type'], job)
+        self.mark_synced()
+
+    def mark_synced(self):
+        now = datetime.datetime.now()
+        with self.lock:
+            for executor in self.executors.values():
+                executor.last_synced_at = now
+
+    def dispatch(self, event_type, job):
+        app_id = job.metadata.name
+        if event_type == 'DELETED':
+            self.dispatch_deletion(app_id)
+            return
+
+        executor = self.get_executor(app_id)
+        if executor is not None:
+            try:
+                executor.update_from_job_status(job.status)
+            except Exception as e:
+                WATCHER_LOG.log("Error updating job %s: %s" % (app_id, e))
+
+    def dispatch_deletion(self, app_id):
+        executor = self.get_executor(app_id)
+        if executor is not None:
+            executor.mark_job_not_found()
+            self.unregister(app_id)
+
+    def start_thread(self):
+        self.thread = threading.Thread(target=self.start_status_tracking)
+        self.thread.daemon = True
+        self.thread.start()
@@ -0,0 +1,158 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import atexit
+import threading
+import time
+
+from broker import exceptions as ex
+from broker.service import api
+from broker.utils.logger import Log
+
+FLUSHER_LOG = Log("StateFlusher", "logs/state_flusher.log")
+
+
+class StateFlusher():
+    """ Coalesces the writes of job states. Executors mark themselves
+    as dirty and a single writer thread persists every dirty state
+    once per ``interval`` seconds, in one batch per persistence
+    connector. States that must not be lost, like terminal ones, are
+    written right away with ``flush``.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.dirty = {}
+        # Number of batches taken and not written yet holding each job,
+        # and the jobs discarded while they were in one of them
+        self.taken = {}
+        self.discarded = set()
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.thread = None
+        self.active = False
+
+    def mark_dirty(self, executor):
+        with self.lock:
+            self.dirty[executor.app_id] = executor
+            if not self.active:
+                self.active = True
+                self.start_thread()
+
+    def discard(self, app_id):
+        """ Stop writing the state of ``app_id``, even from a batch
+        already taken. Waits for the write in progress, so the stored
+        job can be deleted right after.
+        """
+        with self.write_lock:
+            with self.lock:
+                self.dirty.pop(app_id, None)
+                if app_id in self.taken:
+                    self.discarded.add(app_id)
+
+    def take(self, batch):
+        for app_id in batch:
+            self.taken[app_id] = self.taken.get(app_id, 0) + 1
+        return batch
+
+    def flush(self, executor=None):
+        """ Write the state of ``executor``, or every dirty state if
+        no executor is given, without waiting for the next batch.
+        """
+        with self.lock:
+            if executor is None:
+                batch, self.dirty = self.take(self.dirty), {}
+            else:
+                self.dirty.pop(executor.app_id, None)
+                batch = self.take({executor.app_id: executor})
+        self.write(batch)
+
+    def start_flushing(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.dirty:
+                    self.active = False
+                    return
+                batch, self.dirty = self.take(self.dirty), {}
+            self.write(batch)
+
+    def write(self, batch):
+        # Serializing the writes keeps an older state encoded by one
+        # thread from overwriting a newer one written by another
+        with self.write_lock:
+            connectors = {}
+            with self.lock:
+                for app_id, executor in batch.items():
+                    if app_id in self.discarded:
+                        continue
+                    connector = executor.db_connector
+                    connectors.setdefault(id(connector), (connector, {}))
+                    connectors[id(connector)][1][app_id] = executor
+            try:
+                for connector, states in connectors.values():
+                    self.write_states(connector, states)
+            finally:
+                self.release(batch)
+
+    def release(self, batch):
+        with self.lock:
+            for app_id in batch:
+                self.taken[app_id] -= 1
+                if not self.taken[app_id]:
+                    del self.taken[app_id]
+                    self.discarded.discard(app_id)
+
+    def write_states(self, connector, states, retry=True):
+        try:
+            connector.put_many(states)
+        except ex.ConcurrentUpdateException as e:
+            # Each state is written by the executor that owns the job,
+            # and the failed transaction read the revisions stored by
+            # the other writer, so the next write of these states
+            # replaces them
+            conflicts = dict((app_id, states[app_id])
+                             for app_id in e.keys if app_id in states)
+            if retry:
+                self.write_states(connector, conflicts, retry=False)
+            else:
+                FLUSHER_LOG.log("Modified again while retrying %s: %s"
+                                % (list(conflicts), e))
+                self.requeue(conflicts)
+        except connector.transient_errors as e:
+            FLUSHER_LOG.log("Error persisting %s: %s"
+                            % (list(states), e))
+            self.requeue(states)
+        except Exception as e:
+            # Writing these states again would fail the same way
+            FLUSHER_LOG.log("Not persisting %s: %s"
+                            % (list(states), e))
+
+    def requeue(self, states):
+        with self.lock:
+            for app_id, executor in states.items():
+                self.dirty.setdefault(app_id, executor)
+            if not self.active:
+                self.active = True
+                self.start_thread()
+
+    def start_thread(self):
+        self.thread = threading.Thread(target=self.start_flushing)
+        self.thread.daemon = True
+        self.thread.start()
+
+
+FLUSHER = StateFlusher(api.state_flush_interval / 1000.0)
+atexit.register(FLUSHER.flush)
@@ -0,0 +1,155 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from broker import exceptions as ex
+from broker.utils.logger import Log
+
+QUEUE_LOG = Log("SubmissionQueue", "logs/submission_queue.log")
+
+
+class SubmissionQueue():
+    """ Starts the submissions in a pool of ``workers`` threads, in the
+    order they arrive, with at most ``cluster_limit`` of them starting
+    on each cluster at the same time, or no limit when it is 0. A
+    submission whose cluster is busy is passed over by the ones queued
+    behind it.
+
+    Up to ``max_size`` submissions wait to start, each executor
+    knowing its ``queue_position``. Further submissions are refused
+    with a TooManyRequestsException, whose retry_after estimates, from
+    the average startup time, when the queue will have room again.
+
+    A worker is held only while the job is set up. The end of each job
+    is then waited for in a thread of its own, as before. A submission
+    still waiting can be cancelled.
+    """
+
+    def __init__(self, workers=8, max_size=100, cluster_limit=0):
+        self.workers = workers
+        self.max_size = max_size
+        self.cluster_limit = cluster_limit
+        self.queue = []
+        self.running = {}
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.startups = 0
+        self.startup_time = 0.0
+
+    def submit(self, executor, data, cluster=None):
+        """ Queue the start of ``executor`` with the submission
+        ``data`` on ``cluster``, None meaning the active one.
+
+        Raises:
+            ex.TooManyRequestsException -- The queue is full
+        """
+        with self.lock:
+            if len(self.queue) >= self.max_size:
+                raise ex.TooManyRequestsException(self.retry_after())
+            self.queue.append((executor, data, cluster))
+            executor.queue_position = len(self.queue)
+            self.dispatch()
+
+    def dispatch(self):
+        """ Hand the first queued submissions whose cluster is not busy
+        to the idle workers. Called holding the lock.
+        """
+        idle = self.workers - sum(self.running.values())
+        started = []
+        for submission in self.queue:
+            if idle == 0:
+                break
+            cluster = submission[2]
+            if self.cluster_limit and \
+               self.running.get(cluster, 0) >= self.cluster_limit:
+                continue
+            self.running[cluster] = self.running.get(cluster, 0) + 1
+            idle -= 1
+            started.append(submission)
+
+        if not started:
+            return
+        for submission in started:
+            self.queue.remove(submission)
+            submission[0].queue_position = None
+            self.pool.submit(self.start, *submission)
+        self.update_positions()
+
+    def cancel(self, executor):
+        """ Take ``executor`` out of the queue, unless it has already
+        been handed to a worker.
+
+        Returns:
+            bool -- Whether it was still waiting to start
+        """
+        with self.lock:
+            for submission in self.queue:
+                if submission[0] is executor:
+                    self.queue.remove(submission)
+                    executor.queue_position = None
+                    self.update_positions()
+                    return True
+        return False
+
+    def update_positions(self):
+        for position, (executor, _, _) in enumerate(self.queue):
+            executor.queue_position = position + 1
+
+    def start(self, executor, data, cluster):
+        start = time.monotonic()
+        try:
+            executor.setup_application(data)
+            started = True
+        except Exception as e:
+            started = False
+            QUEUE_LOG.log("Error starting %s: %s" % (executor.app_id, e))
+        finally:
+            with self.lock:
+                self.running[cluster] -= 1
+                if not self.running[cluster]:
+                    del self.running[cluster]
+                self.startups += 1
+                self.startup_time += time.monotonic() - start
+                self.dispatch()
+
+        if started:
+            thread = threading.Thread(target=executor.finish_application)
+            thread.daemon = True
+            thread.start()
+
+    def retry_after(self):
+        """ Seconds until the queue is expected to have room, at least
+        one. Called holding the lock.
+        """
+        if not self.startups:
+            return 1
+        average = self.startup_time / self.startups
+        return max(1, int(math.ceil(average * len(self.queue) /
+                                    self.workers)))
+
+    def metrics(self):
+        with self.lock:
+            return {
+                'queued': len(self.queue),
+                'starting': sum(self.running.values()),
+                'started': self.startups,
+                'avg_startup_time': self.startup_time / self.startups
+                if self.startups else 0.0
+            }
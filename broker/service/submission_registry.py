@@ -0,0 +1,104 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+
+class SubmissionRegistry(object):
+    """ The submissions of the manager by app_id, used like a dict of
+    executors. Only the index of the stored jobs is read when the
+    registry is created, and each executor is decoded from the
+    persistence the first time it is accessed.
+    """
+
+    def __init__(self, db_connector):
+        self.db_connector = db_connector
+        self.lock = threading.Lock()
+        self.executors = {}
+        self.index = dict([(row['app_id'], row)
+                           for row in db_connector.get_index()])
+
+    def get(self, app_id, default=None):
+        with self.lock:
+            executor = self.executors.get(app_id)
+            if executor is None and app_id in self.index:
+                # Decoded while holding the lock, so every caller gets
+                # the same executor
+                executor = self.db_connector.get(app_id)
+                self.executors[app_id] = executor
+        return executor if executor is not None else default
+
+    def rows(self, status=None):
+        """ The index rows of the submissions stored when the registry
+        was created, optionally only the ones whose status is in
+        ``status``, without decoding them.
+        """
+        with self.lock:
+            return [row for row in self.index.values()
+                    if status is None or row['status'] in status]
+
+    def items(self):
+        """ Every submission as (app_id, executor). The executors not
+        decoded yet are read from the persistence in one batch, without
+        holding the lock. An executor decoded meanwhile by ``get`` is
+        kept, so every caller still gets the same one.
+        """
+        with self.lock:
+            missing = [app_id for app_id in self.index
+                       if app_id not in self.executors]
+        stored = self.db_connector.get_many(missing) if missing else {}
+
+        with self.lock:
+            for app_id, executor in stored.items():
+                if app_id in self.index:
+                    self.executors.setdefault(app_id, executor)
+            return [(app_id, self.executors[app_id])
+                    for app_id in self._keys()
+                    if app_id in self.executors]
+
+    def keys(self):
+        with self.lock:
+            return self._keys()
+
+    def _keys(self):
+        return list(self.index) + [app_id for app_id in self.executors
+                                   if app_id not in self.index]
+
+    def __getitem__(self, app_id):
+        executor = self.get(app_id)
+        if executor is None:
+            raise KeyError(app_id)
+        return executor
+
+    def __setitem__(self, app_id, executor):
+        with self.lock:
+            self.executors[app_id] = executor
+
+    def __delitem__(self, app_id):
+        with self.lock:
+            if app_id not in self.executors and app_id not in self.index:
+                raise KeyError(app_id)
+            self.executors.pop(app_id, None)
+            self.index.pop(app_id, None)
+
+    def __contains__(self, app_id):
+        with self.lock:
+            return app_id in self.executors or app_id in self.index
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
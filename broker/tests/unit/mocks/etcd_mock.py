@@ -0,0 +1,248 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from etcd3 import etcdrpc
+from etcd3 import events
+
+
+class KVMetadata():
+    """
+    Class that represents a mock of the metadata of an etcd key
+    """
+
+    def __init__(self, key, mod_revision):
+        self.key = key.encode()
+        self.mod_revision = mod_revision
+
+
+class Header():
+
+    def __init__(self, revision):
+        self.revision = revision
+
+
+class KV():
+
+    def __init__(self, key, value, mod_revision):
+        self.key = key.encode()
+        self.value = value
+        self.mod_revision = mod_revision
+
+
+class RangeResponse():
+
+    def __init__(self, kvs, revision):
+        self.kvs = kvs
+        self.header = Header(revision)
+
+
+class PutEvent(events.PutEvent):
+
+    def __init__(self, key, value, mod_revision):
+        self.key = key.encode()
+        self.value = value
+        self.mod_revision = mod_revision
+
+
+class DeleteEvent(events.DeleteEvent):
+
+    def __init__(self, key, mod_revision):
+        self.key = key.encode()
+        self.value = b''
+        self.mod_revision = mod_revision
+
+
+class WatchResponse():
+
+    def __init__(self, events):
+        self.events = events
+
+
+class ModCompare():
+
+    def __init__(self, key):
+        self.key = key
+
+    def __eq__(self, revision):
+        return ('mod', self.key, revision)
+
+
+class Transactions():
+    """
+    Class that represents a mock of the etcd transaction operations
+    """
+
+    def mod(self, key):
+        return ModCompare(key)
+
+    def put(self, key, value):
+        return ('put', key, value)
+
+    def get(self, key):
+        return ('get', key)
+
+    def delete(self, key):
+        return ('delete', key)
+
+
+class MockEtcd():
+    """
+    Class that represents a mock of the etcd3 client
+    """
+
+    def __init__(self):
+        """ Constructor of the mock of an etcd3 client
+
+        Returns:
+            MockEtcd: An in-memory key-value store with revisions
+        """
+        self.store = {}
+        self.revision = 0
+        self.transactions = Transactions()
+        self.mutex = threading.Lock()
+        self.locks = {}
+        self.history = []
+        self.watches = {}
+
+    def _put(self, key, value):
+        self.revision += 1
+        self.store[key] = (value, self.revision)
+        self.history.append(PutEvent(key, value, self.revision))
+
+    def _delete(self, key):
+        if self.store.pop(key, None) is not None:
+            self.history.append(DeleteEvent(key, self.revision))
+
+    def _get(self, key):
+        if key not in self.store:
+            return None, None
+        value, mod_revision = self.store[key]
+        return value, KVMetadata(key, mod_revision)
+
+    def get(self, key):
+        with self.mutex:
+            return self._get(key)
+
+    def get_prefix(self, prefix, sort_order=None, sort_target='key'):
+        with self.mutex:
+            keys = [key for key in self.store if key.startswith(prefix)]
+            if sort_target == 'value':
+                keys.sort(key=lambda key: self.store[key][0])
+            else:
+                keys.sort()
+            if sort_order == 'descend':
+                keys.reverse()
+            return [self._get(key) for key in keys]
+
+    def get_prefix_response(self, prefix):
+        with self.mutex:
+            kvs = [KV(key, value, mod_revision)
+                   for key, (value, mod_revision) in sorted(self.store.items())
+                   if key.startswith(prefix)]
+            return RangeResponse(kvs, self.revision)
+
+    def put(self, key, value):
+        with self.mutex:
+            self._put(key, value)
+        self.notify()
+
+    def delete(self, key):
+        with self.mutex:
+            self.revision += 1
+            self._delete(key)
+        self.notify()
+
+    def delete_prefix(self, prefix):
+        with self.mutex:
+            self.revision += 1
+            for key in [k for k in self.store if k.startswith(prefix)]:
+                self._delete(key)
+        self.notify()
+
+    def transaction(self, compare, success=None, failure=None):
+        """ Function that simulates an etcd transaction. Only
+        mod_revision comparisons, puts, deletes and gets are supported.
+        """
+        with self.mutex:
+            succeeded = all(self.store.get(key, (None, 0))[1] == revision
+                            for _, key, revision in compare)
+            operations = success if succeeded else failure
+            responses = []
+            if succeeded:
+                self.revision += 1
+            # Puts and deletes are answered with the raw ResponseOp
+            # messages, as the real client does
+            header = etcdrpc.ResponseHeader(revision=self.revision)
+            for operation in operations or []:
+                if operation[0] == 'put':
+                    self.store[operation[1]] = (operation[2], self.revision)
+                    self.history.append(PutEvent(operation[1], operation[2],
+                                                 self.revision))
+                    responses.append(etcdrpc.ResponseOp(
+                        response_put=etcdrpc.PutResponse(header=header)))
+                elif operation[0] == 'delete':
+                    self._delete(operation[1])
+                    responses.append(etcdrpc.ResponseOp(
+                        response_delete_range=etcdrpc.DeleteRangeResponse(
+                            header=header)))
+                else:
+                    value, metadata = self._get(operation[1])
+                    responses.append([(value, metadata)]
+                                     if metadata is not None else [])
+        self.notify()
+        return succeeded, responses
+
+    def add_watch_prefix_callback(self, prefix, callback,
+                                  start_revision=None):
+        """ Function that simulates a watch on a prefix. Events are
+        delivered synchronously, after the operation that caused them.
+        """
+        with self.mutex:
+            watch_id = len(self.watches) + 1
+            self.watches[watch_id] = [prefix, callback, start_revision or
+                                      self.revision + 1]
+        self.notify()
+        return watch_id
+
+    def cancel_watch(self, watch_id):
+        with self.mutex:
+            self.watches.pop(watch_id, None)
+
+    def fail_watches(self, error):
+        with self.mutex:
+            watches = list(self.watches.values())
+        for prefix, callback, start_revision in watches:
+            callback(error)
+
+    def notify(self):
+        with self.mutex:
+            deliveries = []
+            for watch in self.watches.values():
+                prefix, callback, start_revision = watch
+                pending = [e for e in self.history
+                           if e.mod_revision >= start_revision and
+                           e.key.decode().startswith(prefix)]
+                watch[2] = self.revision + 1
+                if pending:
+                    deliveries.append((callback, WatchResponse(pending)))
+        for callback, response in deliveries:
+            callback(response)
+
+    def lock(self, name, ttl=60):
+        with self.mutex:
+            lock = self.locks.setdefault(name, threading.Lock())
+        return lock
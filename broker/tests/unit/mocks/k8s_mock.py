@@ -19,13 +19,32 @@ class Job():
     Class that represents a mock of the Job object
     """
 
-    def __init__(self, active):
+    def __init__(self, active, name=None, resource_version=None):
         """ Constructor of the mock of a Job object
 
         Returns:
             Job: The simulation of a Job object
         """
         self.status = Status(active)
+        self.metadata = Metadata(name, resource_version)
+
+
+class JobList():
+    """
+    Class that represents a mock of the JobList object
+    """
+
+    def __init__(self, items, resource_version):
+        self.items = items
+        self.metadata = Metadata(None, resource_version)
+
+
+class Metadata():
+
+    def __init__(self, name, resource_version):
+
+        self.name = name
+        self.resource_version = resource_version
 
 
 class Condition():
@@ -103,12 +122,13 @@ class MockKube():
         """
         pass
 
-    def provision_redis_or_die(self, app_id):
+    def provision_redis_or_die(self, app_id, pod_name=None):
         """ Function that simulates the provision of death of
         the redis
 
         Args:
             app_id (string): Representing id of the application
+            pod_name (string): Representing the pooled Pod to be used
 
         Returns:
             tuple: Representing the redis_ip and node_port
@@ -140,12 +160,16 @@ class MockKube():
         """
         pass
 
-    def terminate_job(self, app_id):
+    def terminate_job(self, app_id, redis=True, timeout=None):
         """ Function that simulates a termination
         of the job.
 
         Args:
             app_id (string): Representing id of the application
+            redis (bool): Representing whether the redis resources
+                          are deleted too
+            timeout (float): Representing the seconds each request
+                             may take
 
         Returns:
             None
@@ -176,3 +200,26 @@ class MockKube():
         """
         sts = Status(None)
         return sts
+
+    def list_jobs(self, namespace="default"):
+        """ Function that simulates the listing of the jobs
+        of a namespace.
+
+        Args:
+            namespace (string): Representing the namespace of the jobs
+
+        Returns:
+            JobList: The jobs of the namespace, all of them active
+        """
+        items = [Job(replicas, name, "1") for name, replicas
+                 in self.jobs[namespace].items()]
+        return JobList(items, "1")
+
+    def watch_jobs(self, namespace="default", resource_version=None,
+                   timeout_seconds=60):
+        """ Function that simulates a watch on the jobs of a namespace.
+
+        Returns:
+            list: The events registered in ``self.events``
+        """
+        return getattr(self, 'events', [])
@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import fnmatch
+
 from broker.utils.logger import Log
 
 """
@@ -30,6 +32,7 @@ class MockRedis():
 
     def __init__(self):
         self.map = {"job": []}
+        self.pipelines = []
         self.logger = Log('redis_mock_log', 'redis_mock.log')
 
     """ Function the simulates the push of a job in the
@@ -44,11 +47,22 @@ class MockRedis():
         None
     """
 
-    def rpush(self, metric_queue, metric):
+    def rpush(self, metric_queue, *metrics):
         if self.map.get(metric_queue) is None:
             self.map[metric_queue] = []
 
-        self.map[metric_queue].append(metric)
+        self.map[metric_queue].extend(metrics)
+        return len(self.map[metric_queue])
+
+    """ Function the simulates the creation of a redis pipeline
+
+    Returns:
+        MockPipeline: Buffers the commands until it is executed
+    """
+
+    def pipeline(self, transaction=True):
+        self.pipelines.append(MockPipeline(self))
+        return self.pipelines[-1]
 
     """ Function the simulates the pop of a job from the
         redis queue
@@ -66,16 +80,97 @@ class MockRedis():
         except Exception as e:
             self.logger.log(e)
 
-    """ Function the simulates the deletion of a
-        redis queue
+    """ Function the simulates the deletion of
+        redis queues
 
     Args:
-        queue_name (string): Representing the name of the queue to
-                             be deleted.
+        queue_names (string): Representing the names of the queues to
+                              be deleted.
 
     Returns:
         None
     """
 
+    def delete(self, *queue_names):
+        for queue_name in queue_names:
+            self.map.pop(queue_name, None)
+
+    """ Function the simulates iterating over the redis keys
+
+    Args:
+        match (string): Representing the pattern of the keys
+        count (int): Representing the number of keys per iteration
+
+    Returns:
+        generator: The keys matching the pattern
+    """
+
+    def scan_iter(self, match="*", count=None):
+        for key in list(self.map):
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+    """ Function the simulates setting a redis key
+
+    Args:
+        key (string): Representing the key
+        value (Object): Representing the value of the key
+
+    Returns:
+        None
+    """
+
+    def set(self, key, value):
+        self.map[key] = value
+
+    """ Function the simulates getting a redis key
+
+    Args:
+        key (string): Representing the key
+
+    Returns:
+        Object: Representing the value of the key
+    """
+
+    def get(self, key):
+        return self.map.get(key)
+
+
+class MockPipeline():
+
+    """ Constructor of the mock of a redis pipeline
+
+    Args:
+        redis (MockRedis): The redis mock that runs the commands
+
+    Returns:
+        MockPipeline: The simulation of a redis pipeline
+    """
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+        self.executions = 0
+
+    def rpush(self, metric_queue, *metrics):
+        self.commands.append((self.redis.rpush, (metric_queue,) + metrics))
+        return self
+
     def delete(self, queue_name):
-        self.map.pop(queue_name)
+        self.commands.append((self.redis.delete, (queue_name,)))
+        return self
+
+    def set(self, key, value):
+        self.commands.append((self.redis.set, (key, value)))
+        return self
+
+    """ Function the simulates the execution of the buffered commands
+
+    Returns:
+        list: The result of each command
+    """
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        self.executions += 1
+        return [command(*args) for command, args in commands]
@@ -0,0 +1,44 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+
+
+class StateMock():
+    """
+    Class that represents a mock of a job state stored by the
+    persistence backends
+    """
+
+    def __init__(self, app_id, status='ongoing',
+                 del_resources_authorization=False,
+                 starting_time=datetime.datetime(2019, 1, 1)):
+        self.app_id = app_id
+        self.status = status
+        self.starting_time = starting_time
+        self.finish_time = None
+        self.del_resources_authorization = del_resources_authorization
+        self.job_resources_lifetime = 10
+        self.data = {'cmd': ['python', 'job.py']}
+
+    def __reduce__(self):
+        return (rebuild, (self.app_id, self.status,
+                          self.del_resources_authorization,
+                          self.starting_time))
+
+
+def rebuild(app_id, status, del_resources_authorization, starting_time):
+    return StateMock(app_id, status, del_resources_authorization,
+                     starting_time)
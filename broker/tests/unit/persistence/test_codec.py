@@ -0,0 +1,92 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import json
+import unittest
+
+from broker.persistence import codec
+from kubejobs import KubeJobsExecutor
+
+
+class TestJSONCodec(unittest.TestCase):
+
+    """
+    Set up a KubeJobsExecutor to be serialized
+    """
+
+    def setUp(self):
+        self.codec = codec.get_codec('json')
+        self.job = KubeJobsExecutor('kj-000001',
+                                    status='completed',
+                                    data={'cmd': ['python', 'job.py']},
+                                    report={'final_replicas': 2},
+                                    job_resources_lifetime=30,
+                                    del_resources_authorization=True,
+                                    redis_ip='0.0.0.0', redis_port=2364)
+        self.job.starting_time = datetime.datetime(2019, 1, 1, 12, 0, 0)
+        self.job.finish_time = datetime.datetime(2019, 1, 1, 13, 0, 0)
+
+    def tearDown(self):
+        pass
+
+    def assert_same_job(self, job):
+        self.assertEqual(job.app_id, self.job.app_id)
+        self.assertEqual(job.status, self.job.status)
+        self.assertEqual(job.data, self.job.data)
+        self.assertEqual(job.report, self.job.report)
+        self.assertEqual(job.starting_time, self.job.starting_time)
+        self.assertEqual(job.finish_time, self.job.finish_time)
+        self.assertEqual(job.job_resources_lifetime, 30)
+        self.assertTrue(job.del_resources_authorization)
+        self.assertEqual(job.redis_port, 2364)
+
+    def test_encode_decode(self):
+        payload = self.codec.encode(self.job)
+        document = json.loads(payload.decode('utf-8'))
+        self.assertEqual(document['schema_version'],
+                         codec.JSONCodec.SCHEMA_VERSION)
+        self.assertEqual(document['rebuild'], 'kubejobs:rebuild')
+        self.assert_same_job(self.codec.decode(payload))
+
+    def test_decode_dill_payload(self):
+        payload = codec.get_codec('dill').encode(self.job)
+        self.assert_same_job(self.codec.decode(payload))
+
+    def test_fields(self):
+        fields = self.codec.fields(self.codec.encode(self.job))
+        self.assertEqual(fields['status'], 'completed')
+        self.assertEqual(fields['finish_time'], self.job.finish_time)
+        self.assertTrue(fields['del_resources_auth'])
+
+    def test_unknown_fields_are_ignored(self):
+        document = json.loads(self.codec.encode(self.job).decode('utf-8'))
+        document['fields']['removed_field'] = 1
+        job = self.codec.decode(json.dumps(document).encode('utf-8'))
+        self.assertEqual(job.app_id, self.job.app_id)
+
+    def test_newer_schema_version(self):
+        document = json.loads(self.codec.encode(self.job).decode('utf-8'))
+        document['schema_version'] = codec.JSONCodec.SCHEMA_VERSION + 1
+        with self.assertRaises(ValueError):
+            self.codec.decode(json.dumps(document).encode('utf-8'))
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            codec.get_codec('pickle')
+
+
+if __name__ == "__main__":
+    unittest.main()
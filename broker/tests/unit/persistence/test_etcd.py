@@ -0,0 +1,278 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import unittest
+
+from broker import exceptions as ex
+from broker.persistence.etcd_db.plugin import Etcd3JobPersistence, \
+    Etcd3CleanupPersistence
+from broker.tests.unit.mocks.etcd_mock import MockEtcd
+from broker.tests.unit.mocks.state_mock import StateMock
+from kubejobs import KubeJobsExecutor
+
+
+class TestEtcd3JobPersistence(unittest.TestCase):
+
+    """
+    Set up an Etcd3JobPersistence over a mock of etcd
+    """
+
+    def setUp(self):
+        self.persistence = Etcd3JobPersistence('localhost', 2379)
+        self.etcd = MockEtcd()
+        self.persistence.etcd_connection = self.etcd
+
+    def tearDown(self):
+        pass
+
+    def test_put_and_get(self):
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        state = self.persistence.get('kj-1')
+        self.assertEqual(state.app_id, 'kj-1')
+        self.assertEqual(state.status, 'ongoing')
+
+    def test_put_does_not_lock(self):
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        self.persistence.get('kj-1')
+        self.persistence.get_all()
+        self.assertEqual(self.etcd.locks, {})
+
+    def test_put_many(self):
+        self.persistence.put_many(dict([('kj-%d' % i, StateMock('kj-%d' % i))
+                                        for i in range(300)]))
+        self.assertEqual(len(self.persistence.get_all()), 300)
+
+    def test_put_tracks_revision(self):
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        revision = self.persistence.revisions['kj-1']
+        self.persistence.put('kj-1', StateMock('kj-1', 'completed'))
+        self.assertGreater(self.persistence.revisions['kj-1'], revision)
+        self.assertEqual(self.persistence.get('kj-1').status, 'completed')
+
+    def test_put_after_concurrent_update(self):
+        self.persistence.put('kj-1', StateMock('kj-1'))
+
+        other = Etcd3JobPersistence('localhost', 2379)
+        other.etcd_connection = self.etcd
+        other.get('kj-1')
+        other.put('kj-1', StateMock('kj-1', 'failed'))
+
+        with self.assertRaises(ex.ConcurrentUpdateException) as error:
+            self.persistence.put_many({
+                'kj-1': StateMock('kj-1', 'completed'),
+                'kj-2': StateMock('kj-2')})
+        self.assertEqual(error.exception.keys, ['kj-1'])
+        self.assertEqual(self.persistence.get('kj-1').status, 'failed')
+        self.assertEqual(self.persistence.get('kj-2').status, 'ongoing')
+
+        # The revision of the other write is now known
+        self.persistence.put('kj-1', StateMock('kj-1', 'completed'))
+        self.assertEqual(self.persistence.get('kj-1').status, 'completed')
+        self.assertEqual(self.persistence.revisions['kj-1'],
+                         self.etcd.store['kj-1'][1])
+
+    def test_get_all_keys(self):
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        self.assertEqual(list(self.persistence.get_all()), ['kj-1'])
+
+    def test_get_all_loads_once(self):
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        reads = []
+        get_prefix_response = self.etcd.get_prefix_response
+        self.etcd.get_prefix_response = \
+            lambda prefix: reads.append(prefix) or get_prefix_response(prefix)
+
+        self.persistence.get_all()
+        self.persistence.put('kj-2', StateMock('kj-2'))
+        jobs = self.persistence.get_all()
+
+        self.assertEqual(sorted(jobs), ['kj-1', 'kj-2'])
+        self.assertEqual(reads, ['kj-'])
+
+    def test_get_all_sees_other_replicas(self):
+        self.persistence.get_all()
+
+        other = Etcd3JobPersistence('localhost', 2379)
+        other.etcd_connection = self.etcd
+        other.put('kj-1', StateMock('kj-1', 'completed'))
+
+        jobs = self.persistence.get_all()
+        self.assertEqual(jobs['kj-1'].status, 'completed')
+
+        other.delete('kj-1')
+        self.assertEqual(self.persistence.get_all(), {})
+
+    def test_get_finished_jobs(self):
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        self.persistence.put('kj-2', StateMock('kj-2', 'completed', True))
+
+        finished = self.persistence.get_finished_jobs()
+        self.assertEqual(list(finished), ['kj-2'])
+        self.assertTrue(finished['kj-2'].del_resources_authorization)
+
+        self.persistence.put('kj-2', StateMock('kj-2', 'completed', False))
+        self.assertEqual(self.persistence.get_finished_jobs(), {})
+
+    def test_real_executor(self):
+        job = KubeJobsExecutor('kj-1', status='completed',
+                               del_resources_authorization=True,
+                               starting_time=datetime.datetime(2019, 1, 1))
+        self.persistence.put('kj-1', job)
+        self.persistence.put('kj-2', KubeJobsExecutor('kj-2'))
+
+        finished = self.persistence.get_finished_jobs()
+        self.assertEqual(list(finished), ['kj-1'])
+        self.assertTrue(finished['kj-1'].del_resources_authorization)
+
+        index = self.persistence.get_index()
+        self.assertEqual(index[0]['del_resources_authorization'], True)
+        self.assertEqual(index[0]['status'], 'completed')
+        self.assertEqual(index[0]['starting_time'],
+                         datetime.datetime(2019, 1, 1))
+        self.assertEqual(index[1]['del_resources_authorization'], False)
+
+    def test_index_does_not_decode(self):
+        self.persistence.put('kj-1', KubeJobsExecutor(
+            'kj-1', status='completed', del_resources_authorization=True))
+        self.persistence.put('kj-2', KubeJobsExecutor('kj-2'))
+
+        other = Etcd3JobPersistence('localhost', 2379)
+        other.etcd_connection = self.etcd
+        decoded = []
+        other.codec.decode = lambda payload: decoded.append(payload)
+        other.codec.fields = lambda payload: decoded.append(payload)
+
+        index = other.get_index(status=['completed'])
+        self.assertEqual([job['app_id'] for job in index], ['kj-1'])
+        self.assertTrue(index[0]['del_resources_authorization'])
+        self.assertEqual(decoded, [])
+
+    def test_backfill_index(self):
+        job = KubeJobsExecutor('kj-1', status='completed',
+                               del_resources_authorization=True)
+        self.etcd.put('kj-1', self.persistence.codec.encode(job))
+
+        index = self.persistence.get_index()
+        self.assertEqual(index[0]['app_id'], 'kj-1')
+        self.assertTrue(index[0]['del_resources_authorization'])
+        self.assertIn('asperathos_index:kj-1', self.etcd.store)
+        self.assertEqual(list(self.persistence.get_finished_jobs()),
+                         ['kj-1'])
+
+    def test_watch_failure_reloads(self):
+        self.persistence.get_all()
+        self.etcd.fail_watches(Exception("compacted"))
+        self.assertFalse(self.persistence.cache.loaded)
+        self.assertEqual(self.etcd.watches, {})
+
+        self.etcd.put('kj-1', self.persistence.codec.encode(
+            StateMock('kj-1')))
+        self.assertEqual(list(self.persistence.get_all()), ['kj-1'])
+        self.assertTrue(self.persistence.cache.loaded)
+
+    def put_jobs(self):
+        for day, status in enumerate(['ongoing', 'completed', 'failed',
+                                      'completed'], 1):
+            app_id = 'kj-%d' % day
+            self.persistence.put(app_id, StateMock(
+                app_id, status,
+                starting_time=datetime.datetime(2019, 1, day)))
+
+    def test_get_index(self):
+        self.put_jobs()
+        index = self.persistence.get_index()
+
+        self.assertEqual([job['app_id'] for job in index],
+                         ['kj-1', 'kj-2', 'kj-3', 'kj-4'])
+        self.assertEqual(index[1]['status'], 'completed')
+        self.assertEqual(index[1]['starting_time'],
+                         datetime.datetime(2019, 1, 2))
+
+    def test_get_index_filters(self):
+        self.put_jobs()
+
+        def app_ids(**kwargs):
+            return [job['app_id']
+                    for job in self.persistence.get_index(**kwargs)]
+
+        self.assertEqual(app_ids(status=['completed', 'failed']),
+                         ['kj-2', 'kj-3', 'kj-4'])
+        self.assertEqual(app_ids(since=datetime.datetime(2019, 1, 2),
+                                 until=datetime.datetime(2019, 1, 4)),
+                         ['kj-2', 'kj-3'])
+        self.assertEqual(app_ids(status=['completed'], limit=1),
+                         ['kj-2'])
+        self.assertEqual(app_ids(status=['completed'], after='kj-2'),
+                         ['kj-4'])
+
+    def test_delete(self):
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        self.persistence.delete('kj-1')
+        self.assertEqual(self.persistence.get_all(), {})
+        self.assertEqual(self.persistence.get_index(), [])
+        self.assertNotIn('asperathos_index:kj-1', self.etcd.store)
+        self.assertNotIn('kj-1', self.persistence.revisions)
+
+    def test_delete_leaves_no_tombstone(self):
+        self.persistence.get_all()
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        revision = self.persistence.revisions['kj-1']
+        payload = self.etcd.store['kj-1'][0]
+        self.persistence.delete('kj-1')
+        self.assertEqual(self.persistence.cache.entries, {})
+        self.assertEqual(self.persistence.index_cache.entries, {})
+
+        # A local write applied after the watch reached its deletion
+        self.persistence.cache.update('kj-1', revision, payload)
+        self.assertEqual(self.persistence.get_all(), {})
+
+
+class TestEtcd3CleanupPersistence(unittest.TestCase):
+
+    """
+    Set up an Etcd3CleanupPersistence over a mock of etcd
+    """
+
+    def setUp(self):
+        self.persistence = Etcd3CleanupPersistence('localhost', 2379)
+        self.etcd = MockEtcd()
+        self.persistence.etcd_connection = self.etcd
+
+    def tearDown(self):
+        pass
+
+    def test_get_all_by_deadline(self):
+        self.persistence.put('kj-1', 1500000000.5)
+        self.persistence.put('kj-2', 999999999.0)
+        self.persistence.put('kj-3', 1200000000.0)
+
+        self.assertEqual(self.persistence.get_all(),
+                         [('kj-2', 999999999.0), ('kj-3', 1200000000.0),
+                          ('kj-1', 1500000000.5)])
+
+    def test_delete(self):
+        self.persistence.put('kj-1', 100.0)
+        self.persistence.put('kj-2', 200.0)
+        self.persistence.delete('kj-1')
+        self.assertEqual(self.persistence.get('kj-1'), None)
+        self.assertEqual(self.persistence.get_all(), [('kj-2', 200.0)])
+
+        self.persistence.delete_all()
+        self.assertEqual(self.persistence.get_all(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
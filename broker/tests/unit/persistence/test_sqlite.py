@@ -0,0 +1,187 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import dill
+import peewee
+import datetime
+import unittest
+
+from broker.persistence.sqlite.model import db, JobState, JobIndex, \
+    JobPayload, CleanupDeadline
+from broker.persistence.sqlite.plugin import SqliteJobPersistence, \
+    SqliteCleanupPersistence
+from broker.tests.unit.mocks.state_mock import StateMock
+
+
+class TestSqliteJobPersistence(unittest.TestCase):
+
+    """
+    Set up a SqliteJobPersistence over an in-memory database
+    """
+
+    def setUp(self):
+        self.db = peewee.SqliteDatabase(':memory:')
+        self.models = [JobState, JobIndex, JobPayload]
+        self.db.bind(self.models)
+        self.db.connect()
+        SqliteJobPersistence.legacy_migrated = False
+        self.persistence = SqliteJobPersistence()
+
+    def tearDown(self):
+        self.db.close()
+        db.bind(self.models)
+
+    def test_put_and_get(self):
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        state = self.persistence.get('kj-1')
+        self.assertEqual(state.app_id, 'kj-1')
+        self.assertEqual(state.data, {'cmd': ['python', 'job.py']})
+
+        index = JobIndex.get(JobIndex.app_id == 'kj-1')
+        self.assertEqual(index.status, 'ongoing')
+        self.assertEqual(index.job_resources_lifetime, 10)
+        self.assertFalse(index.del_resources_authorization)
+
+    def test_put_updates_index(self):
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        self.persistence.put('kj-1', StateMock('kj-1', 'completed', True))
+        self.assertEqual(JobIndex.select().count(), 1)
+        self.assertEqual(JobPayload.select().count(), 1)
+        index = JobIndex.get(JobIndex.app_id == 'kj-1')
+        self.assertEqual(index.status, 'completed')
+        self.assertTrue(index.del_resources_authorization)
+
+    def test_get_finished_jobs(self):
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        self.persistence.put('kj-2', StateMock('kj-2', 'completed', True))
+        finished_jobs = self.persistence.get_finished_jobs()
+        self.assertEqual(list(finished_jobs), ['kj-2'])
+        self.assertEqual(finished_jobs['kj-2'].status, 'completed')
+
+    def test_get_many(self):
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        self.persistence.put('kj-2', StateMock('kj-2', 'completed'))
+        self.persistence.put('kj-3', StateMock('kj-3'))
+        jobs = self.persistence.get_many(['kj-2', 'kj-3', 'kj-missing'])
+        self.assertEqual(sorted(jobs), ['kj-2', 'kj-3'])
+        self.assertEqual(jobs['kj-2'].status, 'completed')
+
+    def test_delete(self):
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        self.persistence.delete('kj-1')
+        self.persistence.delete('kj-missing')
+        self.assertEqual(self.persistence.get_all(), {})
+        self.assertEqual(JobIndex.select().count(), 0)
+
+    def test_delete_all(self):
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        self.persistence.put('kj-2', StateMock('kj-2'))
+        self.persistence.delete_all()
+        self.assertEqual(self.persistence.get_all(), {})
+        self.assertEqual(JobIndex.select().count(), 0)
+
+    def put_jobs(self):
+        for day, status in enumerate(['ongoing', 'completed', 'failed',
+                                      'completed'], 1):
+            app_id = 'kj-%d' % day
+            self.persistence.put(app_id, StateMock(
+                app_id, status,
+                starting_time=datetime.datetime(2019, 1, day)))
+
+    def test_get_index(self):
+        self.put_jobs()
+        index = self.persistence.get_index()
+
+        self.assertEqual([job['app_id'] for job in index],
+                         ['kj-1', 'kj-2', 'kj-3', 'kj-4'])
+        self.assertEqual(index[1]['status'], 'completed')
+        self.assertEqual(index[1]['starting_time'],
+                         datetime.datetime(2019, 1, 2))
+
+    def test_get_index_filters(self):
+        self.put_jobs()
+
+        def app_ids(**kwargs):
+            return [job['app_id']
+                    for job in self.persistence.get_index(**kwargs)]
+
+        self.assertEqual(app_ids(status=['completed', 'failed']),
+                         ['kj-2', 'kj-3', 'kj-4'])
+        self.assertEqual(app_ids(since=datetime.datetime(2019, 1, 2),
+                                 until=datetime.datetime(2019, 1, 4)),
+                         ['kj-2', 'kj-3'])
+        self.assertEqual(app_ids(status=['completed'], limit=1),
+                         ['kj-2'])
+        self.assertEqual(app_ids(status=['completed'], after='kj-2'),
+                         ['kj-4'])
+
+    def test_migrate_legacy_states(self):
+        JobState.create_table()
+        JobState.create(app_id='kj-1',
+                        obj_serialized=dill.dumps(StateMock('kj-1')))
+
+        SqliteJobPersistence.legacy_migrated = False
+        SqliteJobPersistence()
+
+        self.assertFalse(JobState.table_exists())
+        self.assertEqual(list(self.persistence.get_all()), ['kj-1'])
+        self.assertEqual(JobIndex.get(JobIndex.app_id == 'kj-1').status,
+                         'ongoing')
+
+
+class TestSqliteCleanupPersistence(unittest.TestCase):
+
+    """
+    Set up a SqliteCleanupPersistence over an in-memory database
+    """
+
+    def setUp(self):
+        self.db = peewee.SqliteDatabase(':memory:')
+        self.models = [CleanupDeadline]
+        self.db.bind(self.models)
+        self.db.connect()
+        self.persistence = SqliteCleanupPersistence()
+
+    def tearDown(self):
+        self.db.close()
+        db.bind(self.models)
+
+    def test_get_all_by_deadline(self):
+        self.persistence.put('kj-1', 300.5)
+        self.persistence.put('kj-2', 100.0)
+        self.persistence.put('kj-3', 200.0)
+
+        self.assertEqual(self.persistence.get_all(),
+                         [('kj-2', 100.0), ('kj-3', 200.0), ('kj-1', 300.5)])
+
+    def test_put_replaces_deadline(self):
+        self.persistence.put('kj-1', 100.0)
+        self.persistence.put('kj-1', 400.0)
+        self.assertEqual(self.persistence.get('kj-1'), 400.0)
+        self.assertEqual(CleanupDeadline.select().count(), 1)
+
+    def test_delete(self):
+        self.persistence.put('kj-1', 100.0)
+        self.persistence.put('kj-2', 200.0)
+        self.persistence.delete('kj-1')
+        self.persistence.delete('kj-missing')
+        self.assertEqual(self.persistence.get_all(), [('kj-2', 200.0)])
+
+        self.persistence.delete_all()
+        self.assertEqual(self.persistence.get_all(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
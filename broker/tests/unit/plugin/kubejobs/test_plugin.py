@@ -14,8 +14,11 @@
 # limitations under the License.
 
 import copy
+import etcd3
 import json
 import requests_mock
+import threading
+import time
 import unittest
 import datetime
 
@@ -23,7 +26,14 @@ from broker import exceptions as ex
 from kubejobs import KubeJobsExecutor
 from kubejobs import KubeJobsProvider
 from broker.service import api
-from broker.tests.unit.mocks.k8s_mock import MockKube
+from broker.service.api import v10
+from broker.service import state_flusher
+from broker.persistence import connectors
+from broker.persistence.etcd_db.plugin import Etcd3JobPersistence
+from broker.service.job_status_watcher import JobStatusWatcher
+from broker.service.submission_queue import SubmissionQueue
+from broker.tests.unit.mocks.etcd_mock import MockEtcd
+from broker.tests.unit.mocks.k8s_mock import Job, MockKube, Status
 from broker.tests.unit.mocks.persistence_mock import PersistenceMock
 from broker.tests.unit.mocks.redis_mock import MockRedis
 from broker.persistence.sqlite import plugin as sqlite
@@ -56,8 +66,21 @@ class TestKubeJobsPlugin(unittest.TestCase):
         with open('broker/tests/unit/mocks/body_request.json') as f:
             self.jsonRequest = json.load(f)
 
+        # Taken as running, so no watch thread is started
+        self.watcher = JobStatusWatcher()
+        self.watcher.active = True
+        self.job_status_watcher = v10.job_status_watcher
+        v10.job_status_watcher = self.watcher
+
+        # The only worker is busy, so the submissions stay queued
+        self.queue = SubmissionQueue(workers=1)
+        self.queue.running = {None: 1}
+        self.submission_queue = v10.submission_queue
+        v10.submission_queue = self.queue
+
     def tearDown(self):
-        pass
+        v10.job_status_watcher = self.job_status_watcher
+        v10.submission_queue = self.submission_queue
 
     def test_repr(self):
         """
@@ -74,6 +97,54 @@ class TestKubeJobsPlugin(unittest.TestCase):
         job1.pop('starting_time')
         self.assertEqual(job1, job1_repr)
 
+    def test_status_view(self):
+        """
+        Test that the status view is reused until the state of the
+        job changes
+        """
+        view = self.job1.status_view()
+        self.assertIs(self.job1.status_view(), view)
+        self.assertEqual(view, json.loads(self.job1.__repr__()))
+
+        self.assertNotIn('queue_position', view)
+        self.job1.queue_position = 3
+        self.assertEqual(self.job1.status_view()['queue_position'], 3)
+        self.job1.queue_position = None
+        self.assertNotIn('queue_position', self.job1.status_view())
+
+        self.job1.update_application_state('ongoing')
+        self.assertIsNot(self.job1.status_view(), view)
+        self.assertEqual(self.job1.status_view()['status'], 'ongoing')
+
+        self.job1.report = {'status': 'reported', 'final_replicas': 2}
+        self.assertEqual(self.job1.status_view()['status'], 'reported')
+        self.assertEqual(self.job1.status_view()['final_replicas'], 2)
+
+        self.job1.queue_progress = {'pushed': 10, 'total': None}
+        self.assertEqual(self.job1.status_view()['queue_progress'],
+                         {'pushed': 10, 'total': None})
+        self.job1.queue_progress['pushed'] = 20
+        self.assertEqual(self.job1.status_view()['queue_progress']['pushed'],
+                         20)
+
+    def test_status_view_changed_while_built(self):
+        """
+        Test that a status view built while the job changes is not
+        reused after the change
+        """
+        start_time = self.job1.get_application_start_time
+
+        def change_status():
+            self.job1.status = 'ongoing'
+            return start_time()
+
+        self.job1.get_application_start_time = change_status
+        view = self.job1.status_view()
+        self.job1.get_application_start_time = start_time
+
+        self.assertIsNot(self.job1.status_view(), view)
+        self.assertEqual(self.job1.status_view()['status'], 'ongoing')
+
     def test_get_db_connector(self):
         """
         Verify that get_db_connector returns the default persistence
@@ -82,6 +153,18 @@ class TestKubeJobsPlugin(unittest.TestCase):
         self.assertTrue(isinstance(self.job1.get_db_connector(),
                                    sqlite.SqliteJobPersistence))
 
+    def test_shared_db_connector(self):
+        """
+        Verify that every executor shares the same persistence
+        connector, unless one is given to it
+        """
+        self.assertIs(self.job1.get_db_connector(),
+                      KubeJobsExecutor(self.job_id2).db_connector)
+
+        connector = PersistenceMock()
+        job = KubeJobsExecutor(self.job_id2, db_connector=connector)
+        self.assertIs(job.db_connector, connector)
+
     def test_get_workload(self):
         """
         Verify that the workload has been pulled correctly
@@ -93,6 +176,21 @@ class TestKubeJobsPlugin(unittest.TestCase):
 
             self.assertEqual(self.job1.get_workload(data), jobs)
 
+    def test_stream_workload(self):
+        """
+        Verify that the workload is read line by line, including
+        lines split between two reads and a last line without a
+        line break
+        """
+        data = {"redis_workload": "http://workload.com"}
+        jobs = ["http://workload.com/item-%d" % i for i in range(20000)]
+        with requests_mock.Mocker() as m:
+            m.get("http://workload.com", content="\n".join(jobs).encode())
+
+            workload = self.job1.stream_workload(data)
+            self.assertEqual(next(workload), jobs[0])
+            self.assertEqual(list(workload), jobs[1:])
+
     def test_update_env_vars(self):
         """
         Verify that the enviroment variables has been updated
@@ -119,6 +217,29 @@ class TestKubeJobsPlugin(unittest.TestCase):
         self.assertEqual(self.job1.redis_ip, "0.0.0.0")
         self.assertEqual(self.job1.redis_port, "2364")
 
+    def test_setup_shared_redis(self):
+        """
+        Verify that a job using a shared redis gets one of the shared
+        servers and namespaced keys, without provisioning a redis
+        """
+        shared_redis = api.shared_redis
+        api.shared_redis = [('10.0.0.5', 6379), ('10.0.0.6', 6380)]
+        try:
+            data = {'env_vars': {}}
+            self.job1.update_env_vars(data)
+            self.job1.setup_redis()
+        finally:
+            api.shared_redis = shared_redis
+
+        self.assertIn((self.job1.redis_ip, self.job1.redis_port),
+                      [('10.0.0.5', 6379), ('10.0.0.6', 6380)])
+        self.assertEqual(self.job1.redis_prefix, self.job_id1 + ':')
+        self.assertEqual(self.job1.key('job'), self.job_id1 + ':job')
+        self.assertEqual(data['env_vars'],
+                         {'REDIS_HOST': self.job1.redis_ip,
+                          'REDIS_PORT': str(self.job1.redis_port),
+                          'REDIS_KEY_PREFIX': self.job_id1 + ':'})
+
     def test_setup_metric_persistence(self):
         """
         Verify that visualizer components has been created and connected
@@ -242,6 +363,34 @@ class TestKubeJobsPlugin(unittest.TestCase):
 
             length = self.job1.push_jobs_to_redis(data)
             self.assertEqual(length, 3)
+            self.assertEqual(self.job1.rds.map['job'],
+                             ['job1.com', 'job2.com', 'job3.com'])
+            self.assertEqual(self.job1.queue_progress,
+                             {'pushed': 3, 'total': 3})
+            self.assertEqual(self.job1.rds.get('job_sealed'), 3)
+
+    def test_push_to_queue_in_chunks(self):
+        """
+        Verify that the items are pushed in chunks, with several
+        RPUSH commands per pipeline execution
+        """
+        chunk_size = api.redis_push_chunk_size
+        api.redis_push_chunk_size = 10
+        try:
+            items = ['job%d.com' % i for i in range(250)]
+            length = self.job1.push_to_queue(iter(items), len(items))
+        finally:
+            api.redis_push_chunk_size = chunk_size
+
+        self.assertEqual(length, 250)
+        self.assertEqual(self.job1.rds.map['job'], items)
+
+        pipeline = self.job1.rds.pipelines[-1]
+        # 25 chunks of 10 items, 8 chunks per round trip
+        self.assertEqual(pipeline.executions, 4)
+
+        job = json.loads(self.job1.__repr__())
+        self.assertEqual(job['queue_progress'], {'pushed': 250, 'total': 250})
 
     def test_trigger_job(self):
         """
@@ -256,6 +405,187 @@ class TestKubeJobsPlugin(unittest.TestCase):
         self.job1.trigger_job(data)
         self.assertEqual(self.job1.get_application_state(), 'ongoing')
 
+    def test_fill_queue_and_trigger_job(self):
+        """
+        Verify that by default the job is only triggered once the
+        whole workload is in the queue
+        """
+        data = {'cmd': ['python', 'job.py'],
+                'img': 'dockerhub.com/image:latest',
+                'init_size': 1,
+                'env_vars': {}}
+        states = []
+
+        def stream_workload(data):
+            for i in range(2500):
+                states.append(self.job1.get_application_state())
+                yield 'job%d.com' % i
+
+        self.job1.stream_workload = stream_workload
+        self.assertEqual(self.job1.fill_queue_and_trigger_job(data), 2500)
+        self.assertEqual(set(states), set(['created']))
+        self.assertEqual(self.job1.get_application_state(), 'ongoing')
+        self.assertEqual(self.job1.rds.get('job_sealed'), 2500)
+
+    def test_fill_queue_and_trigger_job_streaming(self):
+        """
+        Verify that with stream_queue the job is triggered as soon as
+        the first chunk is in the queue, and the queue is sealed after
+        the last item
+        """
+        data = {'cmd': ['python', 'job.py'],
+                'img': 'dockerhub.com/image:latest',
+                'init_size': 1,
+                'env_vars': {},
+                'stream_queue': True}
+        triggered = threading.Event()
+        sealed = []
+
+        def trigger_job(data):
+            sealed.append(self.job1.rds.get('job_sealed'))
+            self.job1.update_application_state('ongoing')
+            triggered.set()
+
+        def stream_workload(data):
+            for i in range(2500):
+                if i == 2000:
+                    triggered.wait(5)
+                yield 'job%d.com' % i
+
+        self.job1.trigger_job = trigger_job
+        self.job1.stream_workload = stream_workload
+        self.assertEqual(self.job1.fill_queue_and_trigger_job(data), 2500)
+
+        self.assertTrue(triggered.is_set())
+        self.assertEqual(sealed, [None])
+        self.assertEqual(len(self.job1.rds.map['job']), 2500)
+        self.assertEqual(self.job1.rds.get('job_sealed'), 2500)
+
+    def test_fill_queue_and_trigger_job_streaming_error(self):
+        """
+        Verify that the job is not triggered when the workload can
+        not be read
+        """
+        data = {'stream_queue': True}
+
+        def stream_workload(data):
+            raise Exception("Workload not found")
+            yield
+
+        self.job1.stream_workload = stream_workload
+        self.assertRaises(Exception,
+                          self.job1.fill_queue_and_trigger_job, data)
+        self.assertEqual(self.job1.get_application_state(), 'created')
+
+    def test_fill_queue_streaming_stops_when_not_ready(self):
+        """
+        Verify that the rest of the workload is not pushed when the Job
+        can not be created
+        """
+        data = {'stream_queue': True}
+        read = []
+
+        def stream_workload(data):
+            for i in range(10 ** 6):
+                read.append(i)
+                yield 'job%d.com' % i
+
+        def ready():
+            raise Exception("Visualization failed")
+
+        self.job1.stream_workload = stream_workload
+        with self.assertRaises(Exception) as error:
+            self.job1.fill_queue_and_trigger_job(data, ready)
+        self.assertEqual(str(error.exception), "Visualization failed")
+        self.assertLess(len(read), 10 ** 5)
+        self.assertEqual(self.job1.get_application_state(), 'created')
+        self.assertIsNone(self.job1.rds.get('job_sealed'))
+
+    def test_run_startup_stages(self):
+        """
+        Verify that redis and the metrics persistence are provisioned
+        at the same time and that the time of each stage is recorded
+        """
+        def setup_redis():
+            time.sleep(0.2)
+            self.job1.redis_ip, self.job1.redis_port = '0.0.0.0', '2364'
+
+        def setup_metric_persistence(data):
+            time.sleep(0.2)
+            return {}, None
+
+        calls = []
+        self.job1.setup_redis = setup_redis
+        self.job1.setup_metric_persistence = setup_metric_persistence
+        self.job1.update_visualizer_info = \
+            lambda *args: calls.append('update_visualizer_info')
+        self.job1.start_visualization = \
+            lambda data: calls.append('start_visualization')
+        self.job1.fill_queue_and_trigger_job = \
+            lambda data, ready: ready() or 10
+        self.job1.update_monitor_info = \
+            lambda *args: calls.append(('update_monitor_info', args))
+        self.job1.start_monitoring = \
+            lambda data: calls.append('start_monitoring')
+        self.job1.start_controlling = \
+            lambda data: calls.append('start_controlling')
+        self.job1.data = {}
+
+        start = time.time()
+        self.job1.run_startup_stages({})
+
+        self.assertLess(time.time() - start, 0.35)
+        self.assertEqual(calls[-3:], [('update_monitor_info', ({}, None, 10)),
+                                      'start_monitoring',
+                                      'start_controlling'])
+        self.assertEqual(self.job1.data, {'redis_ip': '0.0.0.0',
+                                          'redis_port': '2364'})
+        self.assertEqual(sorted(self.job1.startup_timings),
+                         ['controlling', 'metrics', 'monitoring', 'queue',
+                          'redis', 'visualization'])
+        job = json.loads(self.job1.__repr__())
+        self.assertIn('startup_timings', job)
+
+    def test_visualization_failure_does_not_create_job(self):
+        """
+        Verify that the Job is not created when the visualization
+        fails, even though the queue is filled at the same time
+        """
+        def start_visualization(data):
+            time.sleep(0.1)
+            raise Exception("Visualizer unavailable")
+
+        triggered = []
+        self.job1.setup_redis = lambda: None
+        self.job1.setup_metric_persistence = lambda data: ({}, None)
+        self.job1.update_visualizer_info = lambda *args: None
+        self.job1.start_visualization = start_visualization
+        self.job1.push_jobs_to_redis = lambda data: 10
+        self.job1.trigger_job = lambda data: triggered.append(data)
+
+        with self.assertRaises(Exception) as error:
+            self.job1.run_startup_stages({})
+        self.assertEqual(str(error.exception), "Visualizer unavailable")
+        self.assertEqual(triggered, [])
+
+    def test_metrics_failure_does_not_start_queue(self):
+        """
+        Verify that a failure before the visualization does not leave
+        the queue waiting for it
+        """
+        def setup_metric_persistence(data):
+            raise Exception("InfluxDB unavailable")
+
+        self.job1.setup_redis = lambda: None
+        self.job1.setup_metric_persistence = setup_metric_persistence
+        self.job1.fill_queue_and_trigger_job = \
+            lambda data, ready: ready() or 10
+
+        with self.assertRaises(Exception) as error:
+            self.job1.run_startup_stages({})
+        self.assertEqual(str(error.exception), "InfluxDB unavailable")
+        self.assertNotIn('queue', self.job1.startup_timings)
+
     def test_start_monitoring(self):
         """
         Verify that start monitoring request has done without errors
@@ -291,6 +621,73 @@ class TestKubeJobsPlugin(unittest.TestCase):
 
             self.job1.delete_job_resources()
 
+    def test_delete_job_resources_deadline(self):
+        """
+        Verify that every request of a deletion shares a single
+        deadline
+        """
+        timeouts = []
+        self.job1.k8s.terminate_job = \
+            lambda app_id, redis, timeout: timeouts.append(timeout)
+        teardown_timeout = api.teardown_timeout
+
+        def slow_stop(request, context):
+            time.sleep(0.2)
+            return ""
+
+        try:
+            api.teardown_timeout = 5
+            with requests_mock.Mocker() as m:
+                m.put(api.monitor_url + '/monitoring/'
+                      + self.job_id1 + '/stop', text=slow_stop)
+                m.put(api.controller_url + '/scaling/'
+                      + self.job_id1 + '/stop', text="")
+                self.assertTrue(self.job1.delete_job_resources())
+                self.assertLess(timeouts[0], 4.9)
+
+                api.teardown_timeout = 0.1
+                with self.assertRaises(ex.TimeoutException):
+                    self.job1.delete_job_resources(raise_errors=True)
+        finally:
+            api.teardown_timeout = teardown_timeout
+
+    def test_delete_job_resources_shared_redis(self):
+        """
+        Verify that only the keys of the job are deleted from a shared
+        redis
+        """
+        self.job1.redis_prefix = self.job_id1 + ':'
+        self.job2.redis_prefix = self.job_id2 + ':'
+        self.job2.rds = self.job1.rds
+
+        for job in (self.job1, self.job2):
+            job.push_to_queue(['item-1', 'item-2'])
+            job.rds.rpush(job.key('job:errors'), 'error')
+
+        with requests_mock.Mocker() as m:
+            m.put(api.monitor_url + '/monitoring/'
+                  + self.job_id1 + '/stop', text="")
+            m.put(api.controller_url + '/scaling/'
+                  + self.job_id1 + '/stop', text="")
+
+            self.assertTrue(self.job1.delete_job_resources())
+
+        self.assertEqual(sorted(k for k in self.job1.rds.map
+                                if k.startswith('kj-')),
+                         [self.job_id2 + ':job', self.job_id2 + ':job:errors',
+                          self.job_id2 + ':job_sealed'])
+
+    def test_synchronize_records_sync_time(self):
+        """
+        Verify that reading the job status from Kubernetes records
+        when the status was synchronized
+        """
+        self.assertIsNone(self.job1.last_synced_at)
+
+        before = datetime.datetime.now()
+        self.job1.synchronize()
+        self.assertGreaterEqual(self.job1.last_synced_at, before)
+
     def test_get_update_application_state(self):
         """
         Test the Get and Update Application State of
@@ -381,6 +778,36 @@ class TestKubeJobsPlugin(unittest.TestCase):
             self.job1.wait_job_finish()
             self.assertEqual(self.job1.get_application_state(), 'completed')
 
+    def test_wait_job_finish_after_synchronize(self):
+        """
+        Test that a Job completing right after its status is read
+        still wakes up the thread waiting for it
+        """
+        self.job1.k8s.get_job_status = lambda app_id: Status(1)
+        synchronize = self.job1.synchronize
+
+        def synchronize_and_complete():
+            synchronize()
+            self.watcher.dispatch('MODIFIED',
+                                  Job(None, self.job_id1, "2"))
+
+        self.job1.synchronize = synchronize_and_complete
+        self.job1.data = {'monitor_info': {}, 'monitor_plugin': 'kubejobs'}
+        self.job1.update_application_state("ongoing")
+
+        with requests_mock.Mocker() as m:
+            m.get(api.monitor_url + '/monitoring/' +
+                  self.job1.app_id + '/report', text='{}')
+            thread = threading.Thread(target=self.job1.wait_job_finish,
+                                      kwargs={'check_interval': 0.01})
+            thread.daemon = True
+            thread.start()
+            thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(self.job1.get_application_state(), 'completed')
+        self.assertEqual(self.watcher.executors, {})
+
     def test_enable_detailed_report_if_visualizer_is_enabled(self):
 
         self.job1.data = {'enable_visualizer': True}
@@ -477,6 +904,38 @@ class TestKubeJobsPlugin(unittest.TestCase):
         self.job2.stop_application()
         self.assertEqual(self.job2.get_application_state(), 'stopped')
 
+    def test_stop_queued_job(self):
+        """
+        Test that stopping a job waiting in the submission queue takes
+        it out of the queue, before any of its resources exist
+        """
+        self.job1.rds = None
+        self.queue.submit(self.job1, {})
+        self.queue.submit(self.job2, {})
+
+        self.job1.stop_application()
+        self.assertEqual(self.job1.get_application_state(), 'stopped')
+        self.assertTrue(self.job1.terminated)
+        self.assertIsNone(self.job1.queue_position)
+        self.assertEqual(self.job2.queue_position, 1)
+        self.assertEqual(self.queue.metrics()['queued'], 1)
+
+    def test_terminate_queued_job(self):
+        """
+        Test that terminating a queued job does not delete anything
+        in the cluster
+        """
+        def terminate_job(app_id, redis=True):
+            raise Exception("No Job to delete")
+
+        self.job1.k8s.terminate_job = terminate_job
+        self.queue.submit(self.job1, {})
+
+        self.job1.terminate_job()
+        self.assertEqual(self.job1.get_application_state(), 'terminated')
+        self.assertTrue(self.job1.job_finished.is_set())
+        self.assertEqual(self.queue.metrics()['queued'], 0)
+
 
 class TestKubeJobsProvider(unittest.TestCase):
 
@@ -487,8 +946,58 @@ class TestKubeJobsProvider(unittest.TestCase):
         self.provider1 = KubeJobsProvider()
         self.provider2 = KubeJobsProvider()
 
+        self.persistence = Etcd3JobPersistence('localhost', 2379)
+        self.persistence.etcd_connection = MockEtcd()
+        self.configured_job_persistence = \
+            connectors.configured_job_persistence
+        connectors.configured_job_persistence = lambda: self.persistence
+
+        # The only worker is busy, so the submissions stay queued
+        self.queue = SubmissionQueue(workers=1, max_size=1)
+        self.queue.running = {None: 1}
+        self.submission_queue = v10.submission_queue
+        v10.submission_queue = self.queue
+
     def tearDown(self):
-        pass
+        connectors.configured_job_persistence = \
+            self.configured_job_persistence
+        v10.submission_queue = self.submission_queue
+
+    def test_execute_stores_queued_submission(self):
+        """
+        Test that a queued submission is stored, and removed again
+        when the queue refuses it
+        """
+        app_id, executor = self.provider1.execute({'cmd': ['true']})
+        self.assertEqual(executor.queue_position, 1)
+
+        index = self.persistence.get_index()
+        self.assertEqual([job['app_id'] for job in index], [app_id])
+        self.assertEqual(index[0]['status'], 'created')
+        self.assertEqual(self.persistence.get(app_id).data,
+                         {'cmd': ['true']})
+
+        with self.assertRaises(ex.TooManyRequestsException):
+            self.provider1.execute({'cmd': ['true']})
+        self.assertEqual([job['app_id']
+                          for job in self.persistence.get_index()],
+                         [app_id])
+
+    def test_execute_refused_after_failed_write(self):
+        """
+        Test that a submission refused by the queue, whose state could
+        not be stored, is not written later by the flusher
+        """
+        self.provider1.execute({'cmd': ['true']})
+        dirty = set(state_flusher.FLUSHER.dirty)
+
+        def fail(states):
+            raise etcd3.exceptions.ConnectionFailedError()
+
+        self.persistence.put_many = fail
+        with self.assertRaises(ex.TooManyRequestsException):
+            self.provider1.execute({'cmd': ['true']})
+        self.assertEqual(set(state_flusher.FLUSHER.dirty), dirty)
 
     def test_get_title(self):
         """
@@ -13,11 +13,62 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import threading
+import time
 import unittest
 
 from broker.service.job_cleaner_daemon import JobCleanerDaemon
 
 
+class JobMock():
+
+    def __init__(self, app_id, deleted, failures=0, delay=0):
+        self.app_id = app_id
+        self.deleted = deleted
+        self.failures = failures
+        self.delay = delay
+
+    def delete_job_resources(self, raise_errors=False):
+        time.sleep(self.delay)
+        self.deleted.append(self.app_id)
+        if self.failures > 0:
+            self.failures -= 1
+            if raise_errors:
+                raise Exception("Service unavailable")
+            return False
+        return True
+
+
+class FailingSubmissions(dict):
+    """ Fails to read each job the first ``failures`` times. """
+
+    def __init__(self, submissions, failures):
+        super(FailingSubmissions, self).__init__(submissions)
+        self.failures = failures
+        self.reads = []
+
+    def get(self, app_id, default=None):
+        self.reads.append(app_id)
+        if self.reads.count(app_id) <= self.failures:
+            raise Exception("Could not decode %s" % app_id)
+        return super(FailingSubmissions, self).get(app_id, default)
+
+
+class CleanupConnectorMock():
+
+    def __init__(self, deadlines=None):
+        self.deadlines = dict(deadlines or {})
+
+    def put(self, app_id, deadline):
+        self.deadlines[app_id] = deadline
+
+    def delete(self, app_id):
+        self.deadlines.pop(app_id, None)
+
+    def get_all(self):
+        return sorted(self.deadlines.items(), key=lambda item: item[1])
+
+
 class TestJobCleaner(unittest.TestCase):
 
     """
@@ -25,10 +76,209 @@ class TestJobCleaner(unittest.TestCase):
     """
 
     def setUp(self):
-        self.cleaner = JobCleanerDaemon({})
+        self.deleted = []
+        self.submissions = dict([(app_id, JobMock(app_id, self.deleted))
+                                 for app_id in ['kj-1', 'kj-2', 'kj-3']])
+        self.cleaner = JobCleanerDaemon(self.submissions, workers=4,
+                                        retries=3, backoff=0.05)
 
     def tearDown(self):
-        pass
+        self.cleaner.cancel('kj-1')
+        self.cleaner.cancel('kj-2')
+        self.cleaner.cancel('kj-3')
+
+    def wait_idle(self):
+        for _ in range(500):
+            metrics = self.cleaner.metrics()
+            if not self.cleaner.active and metrics['running'] == 0 and \
+               metrics['queued'] == 0:
+                return
+            time.sleep(0.01)
+        self.fail("Cleaner still busy: %s" % self.cleaner.metrics())
+
+    def test_deletes_in_deadline_order(self):
+        self.cleaner.insert_element('kj-1', 0.2)
+        self.cleaner.insert_element('kj-2', 0.05)
+        self.cleaner.insert_element('kj-3', 0.1)
+        self.wait_idle()
+
+        self.assertEqual(self.deleted, ['kj-2', 'kj-3', 'kj-1'])
+        self.assertFalse(self.cleaner.active)
+        self.assertEqual(self.cleaner.pending(), 0)
+
+    def test_earlier_insert_wakes_worker(self):
+        self.cleaner.insert_element('kj-1', 60)
+        self.cleaner.insert_element('kj-2', 0.05)
+        thread = self.cleaner.thread
+
+        for _ in range(100):
+            if self.deleted:
+                break
+            threading.Event().wait(0.01)
+
+        self.assertEqual(self.deleted, ['kj-2'])
+        self.assertIs(self.cleaner.thread, thread)
+        self.assertEqual(self.cleaner.pending(), 1)
+
+    def test_cancel(self):
+        self.cleaner.insert_element('kj-1', 0.05)
+        self.cleaner.insert_element('kj-2', 0.1)
+
+        self.assertTrue(self.cleaner.cancel('kj-1'))
+        self.assertFalse(self.cleaner.cancel('kj-1'))
+        self.wait_idle()
+
+        self.assertEqual(self.deleted, ['kj-2'])
+
+    def test_reschedule(self):
+        self.cleaner.insert_element('kj-1', 0.05)
+        self.cleaner.insert_element('kj-1', 0.15)
+        self.cleaner.insert_element('kj-2', 0.1)
+        self.wait_idle()
+
+        self.assertEqual(self.deleted, ['kj-2', 'kj-1'])
+
+    def test_missing_job_is_skipped(self):
+        self.cleaner.insert_element('kj-missing', 0.05)
+        self.cleaner.insert_element('kj-1', 0.1)
+        self.wait_idle()
+
+        self.assertEqual(self.deleted, ['kj-1'])
+
+    def test_read_error_is_retried(self):
+        self.cleaner.submissions = FailingSubmissions(self.submissions, 1)
+        self.cleaner.insert_element('kj-1', 0)
+        self.cleaner.insert_element('kj-2', 0.1)
+        self.wait_idle()
+
+        self.assertEqual(self.deleted, ['kj-1', 'kj-2'])
+        self.assertEqual(self.cleaner.submissions.reads,
+                         ['kj-1', 'kj-1', 'kj-2', 'kj-2'])
+
+    def test_unreadable_job_is_given_up(self):
+        self.cleaner.submissions = FailingSubmissions(self.submissions, 5)
+        self.cleaner.insert_element('kj-1', 0)
+        self.wait_idle()
+
+        self.assertEqual(self.deleted, [])
+        self.assertEqual(self.cleaner.submissions.reads, ['kj-1'] * 3)
+        self.assertEqual(self.cleaner.attempts, {})
+        self.assertEqual(self.cleaner.pending(), 0)
+
+    def test_retry_with_backoff(self):
+        self.submissions['kj-1'].failures = 2
+        self.cleaner.insert_element('kj-1', 0)
+        self.wait_idle()
+
+        self.assertEqual(self.deleted, ['kj-1', 'kj-1', 'kj-1'])
+        metrics = self.cleaner.metrics()
+        self.assertEqual(metrics['retried'], 2)
+        self.assertEqual(metrics['succeeded'], 1)
+        self.assertEqual(metrics['failed'], 0)
+
+    def test_gives_up_after_retries(self):
+        self.submissions['kj-1'].failures = 5
+        self.cleaner.insert_element('kj-1', 0)
+        self.wait_idle()
+
+        self.assertEqual(self.deleted, ['kj-1', 'kj-1', 'kj-1'])
+        self.assertEqual(self.cleaner.metrics()['failed'], 1)
+        self.assertEqual(self.cleaner.attempts, {})
+
+    def test_slow_teardown_does_not_block_others(self):
+        self.submissions['kj-1'].delay = 0.5
+        self.cleaner.insert_element('kj-1', 0)
+        self.cleaner.insert_element('kj-2', 0.05)
+        self.cleaner.insert_element('kj-3', 0.05)
+        self.wait_idle()
+
+        self.assertEqual(self.deleted, ['kj-2', 'kj-3', 'kj-1'])
+        metrics = self.cleaner.metrics()
+        self.assertEqual(metrics['succeeded'], 3)
+        self.assertGreaterEqual(metrics['max_latency'], 0.5)
+
+    def test_cancellations_do_not_grow_queue(self):
+        for i in range(10000):
+            self.cleaner.insert_element('kj-1', 60 + i)
+            self.cleaner.cancel('kj-1')
+
+        self.assertEqual(self.cleaner.pending(), 0)
+        self.assertLess(len(self.cleaner.queue), 100)
+
+    def test_stores_deadlines(self):
+        connector = CleanupConnectorMock()
+        self.cleaner.cleanup_connector = connector
+
+        now = time.time()
+        self.cleaner.insert_element('kj-1', 60)
+        self.cleaner.insert_element('kj-2', 0.05)
+        self.assertAlmostEqual(connector.deadlines['kj-1'], now + 60,
+                               delta=1)
+
+        self.cleaner.cancel('kj-1')
+        self.assertNotIn('kj-1', connector.deadlines)
+
+        self.wait_idle()
+        self.assertEqual(self.deleted, ['kj-2'])
+        self.assertEqual(connector.deadlines, {})
+
+    def test_stores_retry_deadline(self):
+        connector = CleanupConnectorMock()
+        self.cleaner.cleanup_connector = connector
+        self.cleaner.backoff = 60
+        self.submissions['kj-1'].failures = 1
+
+        self.cleaner.insert_element('kj-1', 0)
+        for _ in range(100):
+            if self.cleaner.metrics()['retried']:
+                break
+            time.sleep(0.01)
+
+        self.assertGreater(connector.deadlines['kj-1'], time.time() + 50)
+
+    def test_stores_without_holding_the_condition(self):
+        connector = CleanupConnectorMock()
+        held = []
+
+        def probe():
+            # The worker thread may hold the condition for a moment
+            acquired = self.cleaner.condition.acquire(timeout=1)
+            if acquired:
+                self.cleaner.condition.release()
+            held.append(not acquired)
+
+        def put(app_id, deadline):
+            # Another thread can take the condition during the write
+            thread = threading.Thread(target=probe)
+            thread.start()
+            thread.join()
+            connector.deadlines[app_id] = deadline
+
+        connector.put = put
+        self.cleaner.cleanup_connector = connector
+        self.cleaner.insert_element('kj-1', 60)
+
+        self.assertEqual(held, [False])
+        self.assertIn('kj-1', connector.deadlines)
+
+    def test_restore(self):
+        now = time.time()
+        connector = CleanupConnectorMock({'kj-1': now - 10,
+                                          'kj-2': now + 60,
+                                          'kj-3': now + 0.05})
+        self.cleaner.cleanup_connector = connector
+
+        self.assertEqual(self.cleaner.restore(), ['kj-1', 'kj-3', 'kj-2'])
+        self.assertIn('kj-2', self.cleaner.deadlines)
+        self.assertEqual(connector.deadlines['kj-2'], now + 60)
+
+        self.cleaner.cancel('kj-2')
+        self.wait_idle()
+        self.assertEqual(self.deleted, ['kj-1', 'kj-3'])
+        self.assertEqual(connector.deadlines, {})
+
+    def test_restore_without_connector(self):
+        self.assertEqual(self.cleaner.restore(), [])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import unittest
+
+from broker.service import state_flusher
+from broker.service.job_status_watcher import JobStatusWatcher
+from broker.tests.unit.mocks.k8s_mock import Job, MockKube
+from broker.tests.unit.mocks.persistence_mock import PersistenceMock
+from kubejobs import KubeJobsExecutor
+
+
+class TestJobStatusWatcher(unittest.TestCase):
+
+    """
+    Set up Job Status Watcher instance
+    """
+
+    def setUp(self):
+        self.job_id = "kj-000001"
+        self.watcher = JobStatusWatcher()
+        self.watcher.k8s = MockKube(self.job_id)
+
+        self.job = KubeJobsExecutor(self.job_id)
+        self.job.db_connector = PersistenceMock()
+        self.job.update_application_state("ongoing")
+
+        # Registered directly to avoid starting the watch thread
+        self.watcher.executors[self.job_id] = self.job
+
+    def tearDown(self):
+        pass
+
+    def test_list_jobs(self):
+        self.watcher.list_jobs()
+        self.assertEqual(self.watcher.resource_version, "1")
+        self.assertEqual(self.job.get_application_state(), "ongoing")
+        self.assertFalse(self.job.job_finished.is_set())
+        self.assertIsNotNone(self.job.last_synced_at)
+
+    def test_watch_marks_jobs_synced(self):
+        self.watcher.k8s.events = [
+            {'type': 'MODIFIED', 'object': Job(1, "kj-000002", "2")}]
+        self.assertIsNone(self.job.last_synced_at)
+
+        before = datetime.datetime.now()
+        self.watcher.watch_jobs()
+        self.assertGreaterEqual(self.job.last_synced_at, before)
+
+    def test_list_jobs_missing_job(self):
+        self.watcher.k8s = MockKube("kj-000002")
+        self.watcher.list_jobs()
+        self.assertEqual(self.job.get_application_state(), "not found")
+        self.assertTrue(self.job.terminated)
+        self.assertNotIn(self.job_id, self.watcher.executors)
+
+    def test_reconcile(self):
+        found = KubeJobsExecutor("kj-000002")
+        found.db_connector = PersistenceMock()
+        found.update_application_state("ongoing")
+        missing = KubeJobsExecutor("kj-000003")
+        missing.db_connector = PersistenceMock()
+        missing.update_application_state("ongoing")
+        self.watcher.k8s = MockKube("kj-000002", replicas=None)
+
+        self.watcher.reconcile([found, missing])
+        self.assertEqual(found.get_application_state(), "completed")
+        self.assertTrue(found.job_finished.is_set())
+        self.assertEqual(missing.get_application_state(), "not found")
+        self.assertTrue(missing.terminated)
+        # Written in the batch flushed after the missing jobs
+        self.assertNotIn("kj-000003", state_flusher.FLUSHER.dirty)
+        # The finished executors are not left registered
+        self.assertEqual(list(self.watcher.executors), [self.job_id])
+
+    def test_reconcile_starts_watch_after_list(self):
+        running = KubeJobsExecutor("kj-000002")
+        running.db_connector = PersistenceMock()
+        running.update_application_state("ongoing")
+        self.watcher.k8s = MockKube("kj-000002")
+        started = []
+        self.watcher.start_thread = lambda: started.append(True)
+
+        self.watcher.reconcile([running])
+        self.assertIs(self.watcher.get_executor("kj-000002"), running)
+        # The watch resumes from the list, missing no event
+        self.assertEqual(self.watcher.resource_version, "1")
+        self.assertEqual(started, [True])
+
+    def test_watch_completed_job(self):
+        self.watcher.k8s.events = [
+            {'type': 'MODIFIED', 'object': Job(None, self.job_id, "2")}]
+        self.watcher.watch_jobs()
+        self.assertEqual(self.watcher.resource_version, "2")
+        self.assertEqual(self.job.get_application_state(), "completed")
+        self.assertTrue(self.job.job_finished.is_set())
+
+    def test_watch_ignores_unregistered_jobs(self):
+        self.watcher.k8s.events = [
+            {'type': 'MODIFIED', 'object': Job(None, "kj-000002", "2")}]
+        self.watcher.watch_jobs()
+        self.assertEqual(self.job.get_application_state(), "ongoing")
+
+    def test_watch_deleted_job(self):
+        self.watcher.k8s.events = [
+            {'type': 'DELETED', 'object': Job(1, self.job_id, "2")}]
+        self.watcher.watch_jobs()
+        self.assertEqual(self.job.get_application_state(), "not found")
+        self.assertNotIn(self.job_id, self.watcher.executors)
+
+    def test_watch_expired_resource_version(self):
+        self.watcher.resource_version = "1"
+        self.watcher.k8s.events = [{'type': 'ERROR', 'object': {}}]
+        self.watcher.watch_jobs()
+        self.assertIsNone(self.watcher.resource_version)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import unittest
+
+from broker import exceptions as ex
+from broker.persistence.etcd_db.plugin import Etcd3JobPersistence
+from broker.service.api import v10
+from broker.tests.unit.mocks.etcd_mock import MockEtcd
+from kubejobs import KubeJobsExecutor
+
+
+class TestListSubmissions(unittest.TestCase):
+
+    """
+    Set up the API over jobs stored in an in-memory etcd
+    """
+
+    def setUp(self):
+        self.persistence = Etcd3JobPersistence('localhost', 2379)
+        self.persistence.etcd_connection = MockEtcd()
+        for day in [1, 2, 3]:
+            app_id = 'kj-%d' % day
+            self.persistence.put(app_id, KubeJobsExecutor(
+                app_id, starting_time=datetime.datetime(2019, 1, day)))
+        self.db_connector = v10.db_connector
+        v10.db_connector = self.persistence
+
+    def tearDown(self):
+        v10.db_connector = self.db_connector
+
+    def listed(self, args):
+        return [job['app_id'] for job in
+                v10.list_submissions(args)['submissions']]
+
+    def test_time_range(self):
+        self.assertEqual(self.listed({'since': '2019-01-02T00:00:00',
+                                      'until': '2019-01-03T00:00:00'}),
+                         ['kj-2'])
+
+    def test_time_with_offset(self):
+        since = datetime.datetime(2019, 1, 2).astimezone()
+        self.assertEqual(self.listed({'since': since.isoformat()}),
+                         ['kj-2', 'kj-3'])
+
+        utc = datetime.datetime(2019, 1, 2, tzinfo=datetime.timezone.utc)
+        self.assertEqual(v10.parse_time('2019-01-02T03:00:00+03:00'),
+                         utc.astimezone().replace(tzinfo=None))
+
+    def test_invalid_time(self):
+        with self.assertRaises(ex.BadRequestException):
+            v10.list_submissions({'since': 'yesterday'})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import peewee
+import unittest
+
+from broker import exceptions as ex
+from broker.service.state_flusher import StateFlusher
+from broker.tests.unit.mocks.persistence_mock import PersistenceMock
+
+
+class RecordingPersistence(PersistenceMock):
+
+    transient_errors = (peewee.OperationalError,)
+
+    def __init__(self):
+        self.batches = []
+
+    def put_many(self, states):
+        self.batches.append(sorted(states))
+
+
+class ExecutorMock():
+
+    def __init__(self, app_id, db_connector):
+        self.app_id = app_id
+        self.db_connector = db_connector
+
+
+class TestStateFlusher(unittest.TestCase):
+
+    """
+    Set up State Flusher instance
+    """
+
+    def setUp(self):
+        self.flusher = StateFlusher(60)
+        # Avoids starting the writer thread
+        self.flusher.active = True
+        self.db = RecordingPersistence()
+        self.job1 = ExecutorMock('kj-1', self.db)
+        self.job2 = ExecutorMock('kj-2', self.db)
+
+    def tearDown(self):
+        pass
+
+    def test_writes_are_coalesced(self):
+        for _ in range(5):
+            self.flusher.mark_dirty(self.job1)
+            self.flusher.mark_dirty(self.job2)
+        self.flusher.flush()
+        self.assertEqual(self.db.batches, [['kj-1', 'kj-2']])
+        self.flusher.flush()
+        self.assertEqual(len(self.db.batches), 1)
+
+    def test_flush_executor(self):
+        self.flusher.mark_dirty(self.job1)
+        self.flusher.mark_dirty(self.job2)
+        self.flusher.flush(self.job1)
+        self.assertEqual(self.db.batches, [['kj-1']])
+        self.assertEqual(list(self.flusher.dirty), ['kj-2'])
+
+    def test_discard(self):
+        self.flusher.mark_dirty(self.job1)
+        self.flusher.discard('kj-1')
+        self.flusher.flush()
+        self.assertEqual(self.db.batches, [])
+
+    def test_one_batch_per_connector(self):
+        other_db = RecordingPersistence()
+        self.flusher.mark_dirty(self.job1)
+        self.flusher.mark_dirty(ExecutorMock('kj-3', other_db))
+        self.flusher.flush()
+        self.assertEqual(self.db.batches, [['kj-1']])
+        self.assertEqual(other_db.batches, [['kj-3']])
+
+    def test_discarded_while_in_a_batch(self):
+        batch = self.flusher.take({'kj-1': self.job1, 'kj-2': self.job2})
+        self.flusher.discard('kj-1')
+        self.flusher.write(batch)
+        self.assertEqual(self.db.batches, [['kj-2']])
+        self.assertEqual(self.flusher.taken, {})
+        self.assertEqual(self.flusher.discarded, set())
+
+        self.flusher.mark_dirty(self.job1)
+        self.flusher.flush()
+        self.assertEqual(self.db.batches, [['kj-2'], ['kj-1']])
+
+    def test_failed_writes_are_requeued(self):
+        def fail(states):
+            raise peewee.OperationalError("database is locked")
+
+        self.db.put_many = fail
+        self.flusher.mark_dirty(self.job1)
+        self.flusher.flush()
+        self.assertEqual(list(self.flusher.dirty), ['kj-1'])
+
+    def test_invalid_states_are_not_requeued(self):
+        def fail(states):
+            raise TypeError("Object of type set is not JSON serializable")
+
+        self.db.put_many = fail
+        self.flusher.mark_dirty(self.job1)
+        self.flusher.flush()
+        self.assertEqual(self.flusher.dirty, {})
+
+    def test_conflicting_writes_are_retried(self):
+        conflicts = []
+
+        def conflict(states):
+            if len(conflicts) < 1:
+                conflicts.append(sorted(states))
+                raise ex.ConcurrentUpdateException(['kj-1'])
+            self.db.batches.append(sorted(states))
+
+        self.db.put_many = conflict
+        self.flusher.mark_dirty(self.job1)
+        self.flusher.mark_dirty(self.job2)
+        self.flusher.flush()
+        self.assertEqual(conflicts, [['kj-1', 'kj-2']])
+        self.assertEqual(self.db.batches, [['kj-1']])
+        self.assertEqual(self.flusher.dirty, {})
+
+    def test_conflicting_writes_are_requeued(self):
+        def conflict(states):
+            raise ex.ConcurrentUpdateException(['kj-1'])
+
+        self.db.put_many = conflict
+        self.flusher.mark_dirty(self.job1)
+        self.flusher.flush()
+        self.assertEqual(list(self.flusher.dirty), ['kj-1'])
+
+
+if __name__ == "__main__":
+    unittest.main()
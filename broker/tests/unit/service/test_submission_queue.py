@@ -0,0 +1,135 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+from broker import exceptions as ex
+from broker.service.submission_queue import SubmissionQueue
+
+
+class ExecutorMock():
+
+    def __init__(self, app_id, fail=False):
+        self.app_id = app_id
+        self.fail = fail
+        self.queue_position = None
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.finished = threading.Event()
+
+    def setup_application(self, data):
+        self.started.set()
+        self.release.wait(5)
+        if self.fail:
+            raise Exception("Startup failed")
+
+    def finish_application(self):
+        self.finished.set()
+
+
+class TestSubmissionQueue(unittest.TestCase):
+
+    """
+    Set up a Submission Queue with two workers
+    """
+
+    def setUp(self):
+        self.queue = SubmissionQueue(workers=2, max_size=2)
+        self.executors = []
+
+    def tearDown(self):
+        for executor in self.executors:
+            executor.release.set()
+        self.queue.pool.shutdown(wait=True)
+
+    def submit(self, app_id, cluster=None, fail=False):
+        executor = ExecutorMock(app_id, fail)
+        self.executors.append(executor)
+        self.queue.submit(executor, {}, cluster)
+        return executor
+
+    def wait(self, condition, timeout=5):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_bounded_workers(self):
+        first = self.submit("kj-1")
+        second = self.submit("kj-2")
+        third = self.submit("kj-3")
+        self.assertTrue(first.started.wait(5))
+        self.assertTrue(second.started.wait(5))
+        self.assertFalse(third.started.is_set())
+        self.assertIsNone(first.queue_position)
+        self.assertEqual(third.queue_position, 1)
+
+        first.release.set()
+        self.assertTrue(first.finished.wait(5))
+        self.assertTrue(third.started.wait(5))
+        self.assertIsNone(third.queue_position)
+
+    def test_full_queue(self):
+        for app_id in ["kj-1", "kj-2", "kj-3", "kj-4"]:
+            self.submit(app_id)
+        self.assertEqual(self.executors[3].queue_position, 2)
+
+        with self.assertRaises(ex.TooManyRequestsException) as error:
+            self.submit("kj-5")
+        self.assertEqual(error.exception.retry_after, 1)
+        self.assertEqual(self.queue.metrics()['queued'], 2)
+
+    def test_cancel(self):
+        first = self.submit("kj-1")
+        self.submit("kj-2")
+        third = self.submit("kj-3")
+        fourth = self.submit("kj-4")
+        self.assertTrue(first.started.wait(5))
+
+        self.assertTrue(self.queue.cancel(third))
+        self.assertIsNone(third.queue_position)
+        self.assertEqual(fourth.queue_position, 1)
+        # Already handed to a worker
+        self.assertFalse(self.queue.cancel(first))
+
+        first.release.set()
+        self.assertTrue(fourth.started.wait(5))
+        self.assertFalse(third.started.is_set())
+
+    def test_cluster_limit(self):
+        self.queue = SubmissionQueue(workers=2, max_size=2, cluster_limit=1)
+        first = self.submit("kj-1", "cluster-a")
+        second = self.submit("kj-2", "cluster-a")
+        third = self.submit("kj-3", "cluster-b")
+        self.assertTrue(third.started.wait(5))
+        self.assertTrue(first.started.is_set())
+        self.assertFalse(second.started.is_set())
+        self.assertEqual(second.queue_position, 1)
+
+        first.release.set()
+        self.assertTrue(second.started.wait(5))
+
+    def test_failed_startup(self):
+        failed = self.submit("kj-1", fail=True)
+        failed.release.set()
+        self.wait(lambda: self.queue.metrics()['started'] == 1)
+        self.assertFalse(failed.finished.is_set())
+        self.assertEqual(self.queue.metrics()['starting'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
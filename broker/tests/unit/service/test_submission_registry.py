@@ -0,0 +1,125 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import peewee
+import unittest
+
+from broker.persistence.etcd_db.plugin import Etcd3JobPersistence
+from broker.persistence.sqlite.model import db, JobIndex, JobPayload
+from broker.persistence.sqlite.plugin import SqliteJobPersistence
+from broker.service.submission_registry import SubmissionRegistry
+from broker.tests.unit.mocks.etcd_mock import MockEtcd
+from broker.tests.unit.mocks.state_mock import StateMock
+from kubejobs import KubeJobsExecutor
+
+
+class TestSubmissionRegistry(unittest.TestCase):
+
+    """
+    Set up a registry over jobs stored in an in-memory database
+    """
+
+    def setUp(self):
+        self.db = peewee.SqliteDatabase(':memory:')
+        self.models = [JobIndex, JobPayload]
+        self.db.bind(self.models)
+        self.db.connect()
+        SqliteJobPersistence.legacy_migrated = True
+        self.persistence = SqliteJobPersistence()
+        self.persistence.put('kj-1', StateMock('kj-1'))
+        self.persistence.put('kj-2', StateMock('kj-2', 'completed', True))
+
+        self.decoded = []
+        get = self.persistence.get
+
+        def counted_get(app_id):
+            self.decoded.append(app_id)
+            return get(app_id)
+
+        self.persistence.get = counted_get
+        self.registry = SubmissionRegistry(self.persistence)
+
+    def tearDown(self):
+        self.db.close()
+        db.bind(self.models)
+
+    def test_loads_only_the_index(self):
+        self.assertEqual(sorted(self.registry), ['kj-1', 'kj-2'])
+        self.assertIn('kj-2', self.registry)
+        self.assertEqual(len(self.registry), 2)
+        self.assertEqual([row['app_id'] for row in
+                          self.registry.rows(status=['completed'])],
+                         ['kj-2'])
+        self.assertEqual(self.decoded, [])
+
+    def test_decodes_on_first_access(self):
+        job = self.registry['kj-2']
+        self.assertEqual(job.status, 'completed')
+        self.assertIs(self.registry.get('kj-2'), job)
+        self.assertEqual(self.decoded, ['kj-2'])
+
+    def test_items_decoded_in_batch(self):
+        job = self.registry['kj-1']
+        get_many = self.persistence.get_many
+        batches = []
+
+        def unlocked_get_many(app_ids):
+            batches.append((list(app_ids), self.registry.lock.locked()))
+            return get_many(app_ids)
+
+        self.persistence.get_many = unlocked_get_many
+        items = dict(self.registry.items())
+        self.assertEqual(batches, [(['kj-2'], False)])
+
+        self.assertEqual(sorted(items), ['kj-1', 'kj-2'])
+        self.assertIs(items['kj-1'], job)
+        self.assertEqual(items['kj-2'].status, 'completed')
+        self.assertIs(self.registry['kj-2'], items['kj-2'])
+        # Only the first access read a single job
+        self.assertEqual(self.decoded, ['kj-1'])
+
+    def test_finished_rows_over_etcd(self):
+        persistence = Etcd3JobPersistence('localhost', 2379)
+        persistence.etcd_connection = MockEtcd()
+        persistence.put('kj-1', KubeJobsExecutor('kj-1'))
+        persistence.put('kj-2', KubeJobsExecutor(
+            'kj-2', status='completed', del_resources_authorization=True))
+
+        registry = SubmissionRegistry(persistence)
+        self.assertEqual([row['app_id'] for row in registry.rows()
+                          if row['del_resources_authorization']],
+                         ['kj-2'])
+
+    def test_missing_submission(self):
+        self.assertIsNone(self.registry.get('kj-3'))
+        self.assertNotIn('kj-3', self.registry)
+        with self.assertRaises(KeyError):
+            self.registry['kj-3']
+
+    def test_new_and_deleted_submissions(self):
+        job = StateMock('kj-3')
+        self.registry['kj-3'] = job
+        self.assertIs(self.registry['kj-3'], job)
+        self.assertEqual(sorted(self.registry), ['kj-1', 'kj-2', 'kj-3'])
+
+        del self.registry['kj-1']
+        del self.registry['kj-3']
+        self.assertEqual(list(self.registry), ['kj-2'])
+        with self.assertRaises(KeyError):
+            del self.registry['kj-1']
+
+
+if __name__ == "__main__":
+    unittest.main()
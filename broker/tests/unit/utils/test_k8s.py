@@ -0,0 +1,194 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import unittest
+
+import kubernetes as kube
+
+from broker.utils.plugins import k8s
+
+
+def pod(ready):
+    condition = kube.client.V1PodCondition(type='Ready',
+                                           status=str(ready))
+    return kube.client.V1Pod(
+        status=kube.client.V1PodStatus(conditions=[condition]))
+
+
+class ClientsMock():
+
+    def core_v1(self, conf_path):
+        return self
+
+    def batch_v1(self, conf_path):
+        return self
+
+    def __init__(self):
+        self.patches = []
+        self.deleted = []
+        self.missing = set()
+
+    def list_namespaced_pod(self, **kwargs):
+        pass
+
+    def patch_namespaced_pod(self, name, namespace, body):
+        self.patches.append((name, body))
+
+    def delete_namespaced_job(self, name, namespace, body,
+                              _request_timeout=None):
+        self.delete('job', name, _request_timeout)
+
+    def delete_namespaced_service(self, name, namespace, body,
+                                  _request_timeout=None):
+        self.delete('service', name, _request_timeout)
+
+    def delete_collection_namespaced_pod(self, namespace, label_selector,
+                                         _request_timeout=None):
+        self.deleted.append(('pods', label_selector, _request_timeout))
+
+    def delete(self, kind, name, timeout):
+        if (kind, name) in self.missing:
+            raise kube.client.rest.ApiException(status=404)
+        self.deleted.append((kind, name, timeout))
+
+
+class WatchMock():
+
+    def __init__(self, events):
+        self.events = events
+        self.kwargs = None
+        self.stopped = False
+
+    def __call__(self):
+        return self
+
+    def stream(self, function, **kwargs):
+        self.kwargs = kwargs
+        for event in self.events:
+            if isinstance(event, Exception):
+                raise event
+            yield event
+
+    def stop(self):
+        self.stopped = True
+
+
+class TestK8sReadiness(unittest.TestCase):
+
+    """
+    Replace the Kubernetes clients and watch used by the k8s helpers
+    """
+
+    def setUp(self):
+        self.k8s_clients = k8s.k8s_clients
+        self.watch = k8s.kube.watch.Watch
+        k8s.k8s_clients = ClientsMock()
+
+    def tearDown(self):
+        k8s.k8s_clients = self.k8s_clients
+        k8s.kube.watch.Watch = self.watch
+
+    def test_pod_is_ready(self):
+        self.assertTrue(k8s.pod_is_ready(pod(True)))
+        self.assertFalse(k8s.pod_is_ready(pod(False)))
+        self.assertFalse(k8s.pod_is_ready(kube.client.V1Pod()))
+
+    def test_wait_pod_ready(self):
+        watch = WatchMock([{'type': 'ADDED', 'object': pod(False)},
+                           {'type': 'MODIFIED', 'object': pod(True)}])
+        k8s.kube.watch.Watch = watch
+
+        self.assertTrue(k8s.wait_pod_ready('redis-kj-1', timeout=5))
+        self.assertEqual(watch.kwargs['field_selector'],
+                         'metadata.name=redis-kj-1')
+        self.assertTrue(watch.stopped)
+
+    def test_wait_pod_ready_timeout(self):
+        k8s.kube.watch.Watch = \
+            WatchMock([{'type': 'ADDED', 'object': pod(False)}])
+        self.assertFalse(k8s.wait_pod_ready('redis-kj-1', timeout=5))
+
+    def test_wait_pod_ready_watch_error(self):
+        k8s.kube.watch.Watch = WatchMock([Exception("Forbidden")])
+        self.assertFalse(k8s.wait_pod_ready('redis-kj-1', timeout=5))
+
+    def test_lease_pooled_redis(self):
+        k8s.lease_pooled_redis('redis-pool-1', 'kj-1')
+
+        name, body = k8s.k8s_clients.patches[0]
+        self.assertEqual(name, 'redis-pool-1')
+        self.assertEqual(body['metadata']['labels'],
+                         {'app': 'redis-kj-1',
+                          k8s.REDIS_POOL_LABEL: 'leased'})
+
+    def test_pooled_redis_spec(self):
+        spec = k8s.redis_pod_spec('redis-pool-1',
+                                  labels={k8s.REDIS_POOL_LABEL: 'idle'})
+
+        self.assertEqual(spec['metadata']['labels'],
+                         {'app': 'redis-pool-1',
+                          k8s.REDIS_POOL_LABEL: 'idle'})
+
+    def test_terminate_job_deletes_job_first(self):
+        k8s.terminate_job('kj-1', timeout=5)
+
+        self.assertEqual(k8s.k8s_clients.deleted,
+                         [('job', 'kj-1', 5),
+                          ('pods', 'app=redis-kj-1', 5),
+                          ('service', 'redis-kj-1', 5)])
+
+    def test_terminate_job_retry(self):
+        # A previous attempt deleted the Job and the redis Service
+        k8s.k8s_clients.missing = {('job', 'kj-1'),
+                                   ('service', 'redis-kj-1')}
+        k8s.terminate_job('kj-1')
+
+        self.assertEqual(k8s.k8s_clients.deleted,
+                         [('pods', 'app=redis-kj-1', None)])
+
+    def test_delete_if_found_raises_other_errors(self):
+        def delete(**kwargs):
+            raise kube.client.rest.ApiException(status=500)
+
+        with self.assertRaises(kube.client.rest.ApiException):
+            k8s.delete_if_found(delete, name='kj-1')
+
+    def test_probe_with_backoff(self):
+        attempts = []
+
+        def probe():
+            attempts.append(time.time())
+            if len(attempts) < 3:
+                raise Exception("Connection refused")
+            return len(attempts) == 4
+
+        start = time.time()
+        self.assertTrue(k8s.probe_with_backoff(probe, 5, initial_delay=0.02))
+
+        # 0.02 + 0.04 + 0.08 seconds between the four probes
+        self.assertEqual(len(attempts), 4)
+        self.assertGreaterEqual(attempts[-1] - start, 0.14)
+        self.assertLess(attempts[-1] - start, 0.5)
+
+    def test_probe_with_backoff_timeout(self):
+        start = time.time()
+        self.assertFalse(k8s.probe_with_backoff(lambda: False, 0.2,
+                                                initial_delay=0.02))
+        self.assertLess(time.time() - start, 0.4)
+
+
+if __name__ == "__main__":
+    unittest.main()
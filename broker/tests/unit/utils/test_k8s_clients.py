@@ -0,0 +1,77 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+from broker.utils.plugins import k8s_clients
+
+KUBECONFIG = """
+apiVersion: v1
+kind: Config
+clusters:
+- name: asperathos
+  cluster:
+    server: http://127.0.0.1:8080
+users:
+- name: asperathos
+  user:
+    token: asperathos
+contexts:
+- name: asperathos
+  context:
+    cluster: asperathos
+    user: asperathos
+current-context: asperathos
+"""
+
+
+class TestK8sClients(unittest.TestCase):
+
+    """
+    Set up a kubeconfig file
+    """
+
+    def setUp(self):
+        fd, self.conf_path = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as f:
+            f.write(KUBECONFIG)
+
+    def tearDown(self):
+        k8s_clients.invalidate(self.conf_path)
+        os.remove(self.conf_path)
+
+    def test_client_is_reused(self):
+        client = k8s_clients.get_api_client(self.conf_path)
+        self.assertIs(k8s_clients.get_api_client(self.conf_path), client)
+        self.assertIs(k8s_clients.batch_v1(self.conf_path).api_client,
+                      client)
+        self.assertIs(k8s_clients.core_v1(self.conf_path).api_client,
+                      client)
+
+    def test_invalidate(self):
+        client = k8s_clients.get_api_client(self.conf_path)
+        k8s_clients.invalidate(self.conf_path)
+        self.assertIsNot(k8s_clients.get_api_client(self.conf_path), client)
+
+    def test_invalidate_all(self):
+        client = k8s_clients.get_api_client(self.conf_path)
+        k8s_clients.invalidate()
+        self.assertIsNot(k8s_clients.get_api_client(self.conf_path), client)
+
+
+if __name__ == "__main__":
+    unittest.main()
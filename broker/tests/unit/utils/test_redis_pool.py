@@ -0,0 +1,124 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import unittest
+
+from broker.utils.plugins import redis_pool
+
+
+class K8sPoolMock():
+
+    def __init__(self, idle=(), unready=()):
+        self.idle = list(idle)
+        self.unready = set(unready)
+        self.created = []
+        self.deleted = []
+
+    def list_pooled_redis(self, namespace="default"):
+        return list(self.idle)
+
+    def create_pooled_redis(self, name, namespace="default"):
+        self.created.append(name)
+
+    def wait_pod_ready(self, name, namespace="default", timeout=60):
+        # Pods are numbered from 1 in the order they were created
+        return self.created.index(name) + 1 not in self.unready
+
+    def delete_pooled_redis(self, name, namespace="default"):
+        self.deleted.append(name)
+
+
+class TestRedisPool(unittest.TestCase):
+
+    """
+    Replace the k8s helpers used by the pool of redis Pods
+    """
+
+    def setUp(self):
+        self.k8s = redis_pool.k8s
+
+    def tearDown(self):
+        redis_pool.k8s = self.k8s
+
+    def wait(self, pool):
+        # Warming the pool and each lease start their own threads
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            thread = pool.thread
+            if thread is not None:
+                thread.join(5)
+            if pool.provisioning == 0 and pool.thread is thread:
+                break
+            time.sleep(0.01)
+
+    def fill(self, pool):
+        pool.start()
+        self.wait(pool)
+
+    def test_disabled(self):
+        redis_pool.k8s = K8sPoolMock()
+        pool = redis_pool.RedisPool(0)
+
+        self.assertIsNone(pool.lease())
+        self.assertIsNone(pool.thread)
+        self.assertEqual(redis_pool.k8s.created, [])
+
+    def test_replenish(self):
+        redis_pool.k8s = K8sPoolMock()
+        pool = redis_pool.RedisPool(3)
+        self.fill(pool)
+
+        self.assertEqual(len(redis_pool.k8s.created), 3)
+        self.assertEqual(list(pool.idle), redis_pool.k8s.created)
+
+        leased = [pool.lease(), pool.lease()]
+        self.wait(pool)
+
+        self.assertEqual(leased, redis_pool.k8s.created[:2])
+        self.assertNotIn(leased[0], pool.idle)
+        self.assertEqual(len(pool.idle), 3)
+        self.assertEqual(len(redis_pool.k8s.created), 5)
+        self.assertEqual(pool.provisioning, 0)
+
+    def test_adopt_idle_pods(self):
+        redis_pool.k8s = K8sPoolMock(idle=['redis-pool-1', 'redis-pool-2'])
+        pool = redis_pool.RedisPool(3)
+        self.fill(pool)
+
+        self.assertEqual(list(pool.idle)[:2], ['redis-pool-1',
+                                               'redis-pool-2'])
+        self.assertEqual(len(redis_pool.k8s.created), 1)
+        self.assertEqual(pool.lease(), 'redis-pool-1')
+        self.wait(pool)
+
+    def test_pod_not_ready(self):
+        redis_pool.k8s = K8sPoolMock(unready=[2])
+        pool = redis_pool.RedisPool(2)
+        self.fill(pool)
+
+        created = redis_pool.k8s.created
+        self.assertEqual(redis_pool.k8s.deleted, [created[1]])
+        self.assertEqual(list(pool.idle), [created[0]])
+        self.assertEqual(pool.provisioning, 0)
+
+        # The missing Pod is only replaced on the next lease
+        pool.lease()
+        self.wait(pool)
+        self.assertEqual(list(pool.idle), created[2:])
+
+
+if __name__ == "__main__":
+    unittest.main()
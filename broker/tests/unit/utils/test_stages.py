@@ -0,0 +1,89 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import unittest
+
+from broker.utils.stages import StageGraph
+
+
+class TestStageGraph(unittest.TestCase):
+
+    """
+    Set up a StageGraph
+    """
+
+    def setUp(self):
+        self.graph = StageGraph()
+        self.calls = []
+
+    def tearDown(self):
+        pass
+
+    def stage(self, name, duration=0, result=None, error=None):
+        def run():
+            time.sleep(duration)
+            self.calls.append(name)
+            if error is not None:
+                raise error
+            return result
+        return run
+
+    def test_runs_independent_stages_concurrently(self):
+        self.graph.add('a', self.stage('a', 0.2, 1))
+        self.graph.add('b', self.stage('b', 0.2, 2))
+        self.graph.add('c', self.stage('c', 0, 3), requires=['a', 'b'])
+
+        start = time.time()
+        results = self.graph.run()
+
+        self.assertLess(time.time() - start, 0.35)
+        self.assertEqual(results, {'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(self.calls[-1], 'c')
+
+    def test_runs_stage_after_its_requirements(self):
+        self.graph.add('a', self.stage('a', 0.1))
+        self.graph.add('b', self.stage('b'), requires=['a'])
+        self.graph.add('c', self.stage('c', 0.2))
+        self.graph.run()
+
+        self.assertEqual(self.calls, ['a', 'b', 'c'])
+
+    def test_records_timings(self):
+        self.graph.add('a', self.stage('a', 0.1))
+        self.graph.add('b', self.stage('b'), requires=['a'])
+        self.graph.run()
+
+        self.assertEqual(sorted(self.graph.timings), ['a', 'b'])
+        self.assertGreaterEqual(self.graph.timings['a']['duration'], 0.1)
+        self.assertGreaterEqual(self.graph.timings['b']['start'], 0.1)
+
+    def test_failure_stops_dependent_stages(self):
+        self.graph.add('a', self.stage('a', error=ValueError("a failed")))
+        self.graph.add('b', self.stage('b', 0.1))
+        self.graph.add('c', self.stage('c'), requires=['a'])
+        self.graph.add('d', self.stage('d'), requires=['b'])
+
+        self.assertRaises(ValueError, self.graph.run)
+        self.assertEqual(self.calls, ['a', 'b'])
+        self.assertIn('a', self.graph.timings)
+
+    def test_unknown_requirement(self):
+        self.assertRaises(ValueError, self.graph.add, 'a',
+                          self.stage('a'), ['b'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -81,6 +81,8 @@ class Rest(flask.Blueprint):
                     return access_denied(e)
                 except ex.BadRequestException as e:
                     return bad_request(e)
+                except ex.TooManyRequestsException as e:
+                    return too_many_requests(e)
                 except Exception as e:
                     return internal_error(500, 'Internal Server Error', e)
 
@@ -260,3 +262,17 @@ def not_found(error):
                                        name=error.code))
 
     return render_error_message(error_code, error, error.code)
+
+
+def too_many_requests(error):
+    error_code = 429
+
+    LOG.log("Request refused: "
+            "error_code={code}, error_message={message}, "
+            "error_name={name}".format(code=error_code,
+                                       message=error.message,
+                                       name=error.code))
+
+    resp = render_error_message(error_code, error.message, error.code)
+    resp.headers['Retry-After'] = str(error.retry_after)
+    return resp
@@ -39,10 +39,10 @@ def start_controller_k8s(controller_url, app_id, data):
     requests.post(request_url, data=data, headers=headers)
 
 
-def stop_controller(controller_url, app_id):
+def stop_controller(controller_url, app_id, timeout=None):
     stop_scaling_url = controller_url + '/scaling/' + app_id + '/stop'
     headers = {'Content-type': 'application/json'}
-    requests.put(stop_scaling_url, headers=headers)
+    requests.put(stop_scaling_url, headers=headers, timeout=timeout)
 
 
 def setup_environment(controller_url, instances, cap, data):
@@ -52,10 +52,10 @@ def start_monitor(monitor_url, app_id, plugin, plugin_info, collect_period):
     requests.post(request_url, data=data, headers=headers)
 
 
-def stop_monitor(monitor_url, app_id):
+def stop_monitor(monitor_url, app_id, timeout=None):
     request_url = monitor_url + '/monitoring/' + app_id + "/stop"
     headers = {'Content-type': 'application/json'}
-    requests.put(request_url, headers=headers)
+    requests.put(request_url, headers=headers, timeout=timeout)
 
 
 def install_plugin(source, plugin):
@@ -28,7 +28,7 @@ def start_visualization(visualizer_url, app_id, data):
     requests.post(request_url, data=visualizer_body, headers=headers)
 
 
-def stop_visualization(visualizer_url, app_id, data):
+def stop_visualization(visualizer_url, app_id, data, timeout=None):
 
     request_url = visualizer_url + '/visualizing/' + app_id + '/stop'
     headers = {'Content-type': 'application/json'}
@@ -39,7 +39,8 @@ def stop_visualization(visualizer_url, app_id, data):
     visualizer_data['datasource_type'] = data['datasource_type']
     visualizer_body = json.dumps(visualizer_data)
 
-    requests.put(request_url, data=visualizer_body, headers=headers)
+    requests.put(request_url, data=visualizer_body, headers=headers,
+                 timeout=timeout)
 
 
 def get_visualizer_url(visualizer_url, app_id):
@@ -20,9 +20,18 @@ import redis
 from broker.service import api
 from influxdb import InfluxDBClient
 from broker.utils.logger import Log
+from broker.utils.plugins import k8s_clients
 
 KUBEJOBS_LOG = Log("KubeJobsPlugin", "logs/kubejobs.log")
 
+# Seconds between the first two connection probes of a provisioned
+# service, doubled after each failed probe up to PROBE_MAX_DELAY
+PROBE_INITIAL_DELAY = 0.02
+PROBE_MAX_DELAY = 2
+
+# Label of the pre-provisioned redis Pods, either idle or leased
+REDIS_POOL_LABEL = "asperathos-redis-pool"
+
 
 def create_job(app_id, cmd, img, init_size, env_vars,
                config_id="",
@@ -39,8 +48,6 @@ def create_job(app_id, cmd, img, init_size, env_vars,
                secrets=[],
                **kwargs):
 
-    kube.config.load_kube_config(api.k8s_conf_path)
-
     obj_meta = kube.client.V1ObjectMeta(
         name=app_id)
 
@@ -113,36 +120,25 @@ def create_job(app_id, cmd, img, init_size, env_vars,
         spec=job_spec)
 
     KUBEJOBS_LOG.log(job)
-    batch_v1 = kube.client.BatchV1Api()
+    batch_v1 = k8s_clients.batch_v1(api.k8s_conf_path)
     batch_v1.create_namespaced_job("default", job)
 
     return job
 
 
-def provision_redis_or_die(app_id, namespace="default",
-                           redis_port=6379, timeout=60):
-    """Provision a redis database for the workload being executed.
-
-    Create a redis-master Pod and expose it through a NodePort Service.
-    Once created this method waits ``timeout`` seconds until the
-    database is Ready, failing otherwise.
+def redis_pod_spec(name, redis_port=6379, labels=None):
+    """Build the spec of a redis-master Pod named ``name``, labeled
+    with ``app: name`` plus ``labels``.
     """
 
-    # load kubernetes config
-    kube.config.load_kube_config(api.k8s_conf_path)
-
-    # name redis instance as ``redis-{app_id}``
-    name = "redis-%s" % app_id
-
-    # create the Pod object for redis
-    redis_pod_spec = {
+    pod_labels = {"app": name}
+    pod_labels.update(labels or {})
+    return {
         "apiVersion": "v1",
         "kind": "Pod",
         "metadata": {
             "name": name,
-            "labels": {
-                "app": name
-            }
+            "labels": pod_labels
         },
         "spec": {
             "containers": [{
@@ -154,11 +150,82 @@ def provision_redis_or_die(app_id, namespace="default",
                 }],
                 "ports": [{
                     "containerPort": redis_port
-                }]
+                }],
+                "readinessProbe": {
+                    "tcpSocket": {
+                        "port": redis_port
+                    },
+                    "periodSeconds": 1
+                }
             }]
         }
     }
 
+
+def create_pooled_redis(name, namespace="default", redis_port=6379):
+    """Create an idle redis Pod for the pool of pre-provisioned
+    databases. It is not exposed by any Service until it is leased.
+    """
+
+    CoreV1Api = k8s_clients.core_v1(api.k8s_conf_path)
+    CoreV1Api.create_namespaced_pod(
+        namespace=namespace,
+        body=redis_pod_spec(name, redis_port, {REDIS_POOL_LABEL: "idle"}))
+
+
+def list_pooled_redis(namespace="default"):
+    """List the names of the idle pooled redis Pods that are Ready."""
+
+    CoreV1Api = k8s_clients.core_v1(api.k8s_conf_path)
+    pods = CoreV1Api.list_namespaced_pod(
+        namespace=namespace, label_selector="%s=idle" % REDIS_POOL_LABEL)
+    return [pod.metadata.name for pod in pods.items if pod_is_ready(pod)]
+
+
+def lease_pooled_redis(pod_name, app_id, namespace="default"):
+    """Hand the pooled Pod ``pod_name`` over to ``app_id`` by labeling
+    it as its redis, ``app: redis-{app_id}``, the label selected by the
+    Service of the job and used to delete its resources.
+    """
+
+    CoreV1Api = k8s_clients.core_v1(api.k8s_conf_path)
+    CoreV1Api.patch_namespaced_pod(
+        name=pod_name, namespace=namespace,
+        body={"metadata": {"labels": {"app": "redis-%s" % app_id,
+                                      REDIS_POOL_LABEL: "leased"}}})
+
+
+def delete_pooled_redis(pod_name, namespace="default"):
+    CoreV1Api = k8s_clients.core_v1(api.k8s_conf_path)
+    CoreV1Api.delete_namespaced_pod(
+        name=pod_name, namespace=namespace,
+        body=kube.client.V1DeleteOptions())
+
+
+def provision_redis_or_die(app_id, namespace="default",
+                           redis_port=6379, timeout=60, pod_name=None):
+    """Provision a redis database for the workload being executed.
+
+    Create a redis-master Pod and expose it through a NodePort Service.
+    If ``pod_name`` is given, that already running Pod, taken from the
+    pool of pre-provisioned databases, is used instead of a new one.
+    Once created this method waits ``timeout`` seconds until the
+    database is Ready, failing otherwise.
+    """
+
+    # name redis instance as ``redis-{app_id}``
+    name = "redis-%s" % app_id
+
+    CoreV1Api = k8s_clients.core_v1(api.k8s_conf_path)
+    if pod_name is not None:
+        try:
+            lease_pooled_redis(pod_name, app_id, namespace)
+            KUBEJOBS_LOG.log("leased pooled redis Pod %s" % pod_name)
+        except kube.client.rest.ApiException as e:
+            KUBEJOBS_LOG.log("could not lease redis Pod %s: %s"
+                             % (pod_name, e))
+            pod_name = None
+
     # create the Service object for redis
     redis_svc_spec = {
         "apiVersion": "v1",
@@ -179,13 +246,13 @@ def provision_redis_or_die(app_id, namespace="default",
     }
 
     # create Pod and Service
-    CoreV1Api = kube.client.CoreV1Api()
     node_port = None
     try:
         # TODO(clenimar): improve logging
-        KUBEJOBS_LOG.log("creating pod...")
-        CoreV1Api.create_namespaced_pod(
-            namespace=namespace, body=redis_pod_spec)
+        if pod_name is None:
+            KUBEJOBS_LOG.log("creating pod...")
+            CoreV1Api.create_namespaced_pod(
+                namespace=namespace, body=redis_pod_spec(name, redis_port))
         KUBEJOBS_LOG.log("creating service...")
         s = CoreV1Api.create_namespaced_service(
             namespace=namespace, body=redis_svc_spec)
@@ -204,22 +271,20 @@ def provision_redis_or_die(app_id, namespace="default",
     # wait until the redis instance is Ready
     # (ie. accessible via the Service)
     # if it takes longer than ``timeout`` seconds, die
-    redis_ready = False
     start = time.time()
-    while time.time() - start < timeout:
-        time.sleep(5)
-        KUBEJOBS_LOG.log("trying redis on %s:%s..." % (redis_ip, node_port))
-        try:
-            r = redis.StrictRedis(host=redis_ip, port=node_port)
-            if r.info()['loading'] == 0:
-                redis_ready = True
-                KUBEJOBS_LOG.log("connected to redis on %s:%s!"
-                                 % (redis_ip, node_port))
-                break
-        except redis.exceptions.ConnectionError:
-            KUBEJOBS_LOG.log("redis is not ready yet")
+    wait_pod_ready(pod_name or name, namespace, timeout)
+
+    def redis_is_ready():
+        r = redis.StrictRedis(host=redis_ip, port=node_port)
+        return r.info()['loading'] == 0
+
+    KUBEJOBS_LOG.log("trying redis on %s:%s..." % (redis_ip, node_port))
+    redis_ready = probe_with_backoff(redis_is_ready,
+                                     timeout - (time.time() - start))
 
     if redis_ready:
+        KUBEJOBS_LOG.log("connected to redis on %s:%s!"
+                         % (redis_ip, node_port))
         return redis_ip, node_port
     else:
         KUBEJOBS_LOG.log("timed out waiting for redis to be available.")
@@ -230,58 +295,159 @@ def provision_redis_or_die(app_id, namespace="default",
         raise Exception("Could not provision redis")
 
 
+def pod_is_ready(pod):
+    """Whether ``pod`` reports the Ready condition."""
+
+    conditions = (pod.status and pod.status.conditions) or []
+    return any(c.type == 'Ready' and c.status == 'True' for c in conditions)
+
+
+def wait_pod_ready(name, namespace="default", timeout=60):
+    """Wait up to ``timeout`` seconds for the Pod ``name`` to be Ready,
+    following its events through a watch instead of polling it.
+
+    Returns True if the Pod became Ready. A failure of the watch is
+    logged and returns False, leaving the readiness to be checked by
+    probing the service itself.
+    """
+
+    CoreV1Api = k8s_clients.core_v1(api.k8s_conf_path)
+    watch = kube.watch.Watch()
+    deadline = time.time() + timeout
+    try:
+        for event in watch.stream(CoreV1Api.list_namespaced_pod,
+                                  namespace=namespace,
+                                  field_selector="metadata.name=%s" % name,
+                                  timeout_seconds=max(int(timeout), 1)):
+            if event['type'] != 'DELETED' and pod_is_ready(event['object']):
+                return True
+            if time.time() >= deadline:
+                break
+    except Exception as e:
+        KUBEJOBS_LOG.log("could not watch pod %s: %s" % (name, e))
+    finally:
+        watch.stop()
+    return False
+
+
+def probe_with_backoff(probe, timeout, initial_delay=PROBE_INITIAL_DELAY,
+                       max_delay=PROBE_MAX_DELAY):
+    """Call ``probe`` until it returns True, waiting ``initial_delay``
+    seconds after the first failure and twice as long after each of
+    the next ones. A probe that raises counts as a failure.
+
+    Returns False if the probe did not succeed in ``timeout`` seconds.
+    """
+
+    deadline = time.time() + timeout
+    delay = initial_delay
+    while True:
+        try:
+            if probe():
+                return True
+        except Exception as e:
+            KUBEJOBS_LOG.log("service is not ready yet: %s" % e)
+
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
+
+
 def completed(app_id, namespace="default"):
-    job_api = kube.client.BatchV1Api()
+    job_api = k8s_clients.batch_v1(api.k8s_conf_path)
     job = job_api.read_namespaced_job_status(name=app_id, namespace=namespace)
     return job.status.completion_time is not None
 
 
 def get_job_status(app_id, namespace="default"):
-    kube.config.load_kube_config(api.k8s_conf_path)
-
-    job_api = kube.client.BatchV1Api()
+    job_api = k8s_clients.batch_v1(api.k8s_conf_path)
     job = job_api.read_namespaced_job_status(name=app_id, namespace=namespace)
     status = job.status
     return status
 
 
-def delete_redis_resources(app_id, namespace="default"):
-    """Delete redis resources (Pod and Service) for a given ``app_id``"""
+def list_jobs(namespace="default"):
+    """List every Job in ``namespace`` with a single API call."""
 
-    # load kubernetes config
-    kube.config.load_kube_config(api.k8s_conf_path)
+    job_api = k8s_clients.batch_v1(api.k8s_conf_path)
+    return job_api.list_namespaced_job(namespace=namespace)
+
+
+def watch_jobs(namespace="default", resource_version=None,
+               timeout_seconds=60):
+    """Stream the Job events of ``namespace`` starting right after
+    ``resource_version``. The stream ends after ``timeout_seconds``
+    and must be resumed from the last resource version received.
+    """
 
-    CoreV1Api = kube.client.CoreV1Api()
+    job_api = k8s_clients.batch_v1(api.k8s_conf_path)
+    watch = kube.watch.Watch()
+    return watch.stream(job_api.list_namespaced_job,
+                        namespace=namespace,
+                        resource_version=resource_version,
+                        timeout_seconds=timeout_seconds)
+
+
+def delete_redis_resources(app_id, namespace="default", timeout=None):
+    """Delete redis resources (Pod and Service) for a given ``app_id``.
+    Resources already deleted are skipped, so that the deletion can be
+    retried, and each request waits at most ``timeout`` seconds.
+    """
+
+    CoreV1Api = k8s_clients.core_v1(api.k8s_conf_path)
 
     KUBEJOBS_LOG.log("deleting redis resources for job %s" % app_id)
     name = "redis-%s" % app_id
     # create generic ``V1DeleteOptions``
     delete = kube.client.V1DeleteOptions()
-    CoreV1Api.delete_namespaced_pod(
-        name=name, namespace=namespace, body=delete)
-    CoreV1Api.delete_namespaced_service(
-        name=name, namespace=namespace, body=delete)
+    # the Pod is selected by its label, since a Pod leased from the
+    # pool keeps the name it was created with
+    CoreV1Api.delete_collection_namespaced_pod(
+        namespace=namespace, label_selector="app=%s" % name,
+        _request_timeout=timeout)
+    delete_if_found(CoreV1Api.delete_namespaced_service,
+                    name=name, namespace=namespace, body=delete,
+                    _request_timeout=timeout)
+
+
+def terminate_job(app_id, namespace="default", redis=True, timeout=None):
+    """Delete the Job ``app_id`` and, if ``redis``, its redis Pod and
+    Service. Jobs using a shared Redis have none.
+
+    The Job is deleted first and resources already deleted are
+    skipped, so that a failed termination can be retried. Each request
+    waits at most ``timeout`` seconds.
+    """
 
+    batch_v1 = k8s_clients.batch_v1(api.k8s_conf_path)
 
-def terminate_job(app_id, namespace="default"):
+    delete = kube.client.V1DeleteOptions(propagation_policy='Foreground')
 
-    kube.config.load_kube_config(api.k8s_conf_path)
+    delete_if_found(batch_v1.delete_namespaced_job,
+                    name=app_id, namespace=namespace, body=delete,
+                    _request_timeout=timeout)
+    if redis:
+        delete_redis_resources(app_id, namespace, timeout)
 
-    batch_v1 = kube.client.BatchV1Api()
 
-    delete = kube.client.V1DeleteOptions(propagation_policy='Foreground')
-
-    delete_redis_resources(app_id)
-    batch_v1.delete_namespaced_job(
-        name=app_id, namespace=namespace, body=delete)
+def delete_if_found(delete, **kwargs):
+    """Call the ``delete`` method of the Kubernetes API, taking an
+    object that does not exist anymore as deleted.
+    """
+    try:
+        delete(**kwargs)
+    except kube.client.rest.ApiException as e:
+        if e.status != 404:
+            raise
+        KUBEJOBS_LOG.log("%s already deleted" % kwargs.get('name'))
 
 
 def create_influxdb(app_id, database_name="asperathos",
                     img="influxdb", namespace="default",
                     visualizer_port=8086, timeout=60):
 
-    kube.config.load_kube_config(api.k8s_conf_path)
-
     influx_pod_spec = {
         "apiVersion": "v1",
         "kind": "Pod",
@@ -328,7 +494,7 @@ def create_influxdb(app_id, database_name="asperathos",
         }
     }
 
-    CoreV1Api = kube.client.CoreV1Api()
+    CoreV1Api = k8s_clients.core_v1(api.k8s_conf_path)
     node_port = None
 
     # Gets the redis ip if the value is not explicitic in the config file
@@ -344,32 +510,23 @@ def create_influxdb(app_id, database_name="asperathos",
         KUBEJOBS_LOG.log("Creating InfluxDB Service...")
         s = CoreV1Api.create_namespaced_service(
             namespace=namespace, body=influx_svc_spec)
-        ready = False
-        attempts = timeout
-        while not ready:
-            read = CoreV1Api.read_namespaced_pod_status(name="influxdb-%s"
-                                                        % app_id,
-                                                        namespace=namespace)
-            node_port = s.spec.ports[0].node_port
-
-            if read.status.phase == "Running" and node_port is not None:
-                try:
-                    # TODO change redis_ip to node_ip
-                    client = InfluxDBClient(redis_ip, node_port, 'root',
-                                            'root', database_name)
-                    client.create_database(database_name)
-                    KUBEJOBS_LOG.log("InfluxDB is ready!!")
-                    ready = True
-                except Exception:
-                    KUBEJOBS_LOG.log("InfluxDB is not ready yet...")
-            else:
-                attempts -= 1
-                if attempts > 0:
-                    time.sleep(1)
-                else:
-                    raise Exception("InfluxDB cannot be started!"
-                                    "Time limite exceded...")
-            time.sleep(1)
+        node_port = s.spec.ports[0].node_port
+
+        start = time.time()
+        wait_pod_ready("influxdb-%s" % app_id, namespace, timeout)
+
+        def influxdb_is_ready():
+            # TODO change redis_ip to node_ip
+            client = InfluxDBClient(redis_ip, node_port, 'root',
+                                    'root', database_name)
+            client.create_database(database_name)
+            return True
+
+        if not probe_with_backoff(influxdb_is_ready,
+                                  timeout - (time.time() - start)):
+            raise Exception("InfluxDB cannot be started!"
+                            "Time limite exceded...")
+        KUBEJOBS_LOG.log("InfluxDB is ready!!")
 
         influxdb_data = {"port": node_port, "name": database_name}
         return influxdb_data
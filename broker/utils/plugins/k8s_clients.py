@@ -0,0 +1,58 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Registry of Kubernetes API clients, one per kubeconfig file.
+Each kubeconfig is parsed only once and its client keeps a pool of
+keep-alive connections that is shared by every API object built on
+top of it. Whenever the content of a kubeconfig changes (e.g. a new
+cluster is activated), its client must be invalidated.
+"""
+
+import threading
+
+import kubernetes as kube
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_api_client(k8s_conf_path):
+    with _lock:
+        client = _clients.get(k8s_conf_path)
+        if client is None:
+            client = kube.config.new_client_from_config(
+                config_file=k8s_conf_path)
+            _clients[k8s_conf_path] = client
+        return client
+
+
+def batch_v1(k8s_conf_path):
+    return kube.client.BatchV1Api(get_api_client(k8s_conf_path))
+
+
+def core_v1(k8s_conf_path):
+    return kube.client.CoreV1Api(get_api_client(k8s_conf_path))
+
+
+def invalidate(k8s_conf_path=None):
+    """ Drop the cached client of ``k8s_conf_path``, or of every
+    kubeconfig if no path is given. Requests already in flight keep
+    using the old client until they finish.
+    """
+    with _lock:
+        if k8s_conf_path is None:
+            _clients.clear()
+        else:
+            _clients.pop(k8s_conf_path, None)
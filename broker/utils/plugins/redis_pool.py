@@ -0,0 +1,122 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+import uuid
+
+from broker.service import api
+from broker.utils.logger import Log
+from broker.utils.plugins import k8s
+
+POOL_LOG = Log("RedisPool", "logs/redis_pool.log")
+
+
+class RedisPool(object):
+    """ Keeps up to ``size`` idle redis Pods running, so a new job
+    gets its queue without waiting for a Pod to be scheduled and
+    started. Each leased Pod is replaced right away by a new one,
+    created and waited for in a background thread. A pool of size 0
+    is disabled and never creates a Pod.
+    """
+
+    def __init__(self, size, namespace="default", timeout=60):
+        self.size = size
+        self.namespace = namespace
+        self.timeout = timeout
+        self.idle = collections.deque()
+        self.provisioning = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        """ Adopt the idle Pods left by a previous run of the broker
+        and create the missing ones, in background.
+        """
+        if self.size > 0:
+            self.start_thread(self.warm)
+
+    def warm(self):
+        try:
+            self.adopt()
+        except Exception as e:
+            POOL_LOG.log("Error adopting idle redis Pods: %s" % e)
+        self.replenish()
+
+    def adopt(self):
+        names = k8s.list_pooled_redis(self.namespace)
+        with self.lock:
+            free = self.size - len(self.idle) - self.provisioning
+            for name in [n for n in names if n not in self.idle][:free]:
+                self.idle.append(name)
+        POOL_LOG.log("Adopted %d idle redis Pods" % len(self.idle))
+
+    def lease(self):
+        """ Take an idle Pod out of the pool and start replacing it.
+
+        Returns:
+            string: The name of the Pod, or None if the pool is empty
+        """
+        with self.lock:
+            name = self.idle.popleft() if self.idle else None
+        self.replenish()
+        return name
+
+    def replenish(self):
+        with self.lock:
+            count = self.size - len(self.idle) - self.provisioning
+            if count <= 0:
+                return
+            self.provisioning += count
+        self.start_thread(self.provision, count)
+
+    def provision(self, count):
+        """ Create ``count`` Pods at once and add to the pool the ones
+        that become Ready. Pods that do not are deleted, and are only
+        replaced on the next lease.
+        """
+        names = []
+        try:
+            for _ in range(count):
+                name = "redis-pool-%s" % uuid.uuid4().hex[:8]
+                k8s.create_pooled_redis(name, self.namespace)
+                names.append(name)
+        except Exception as e:
+            POOL_LOG.log("Error creating a redis Pod: %s" % e)
+        with self.lock:
+            self.provisioning -= count - len(names)
+
+        for name in names:
+            ready = k8s.wait_pod_ready(name, self.namespace, self.timeout)
+            with self.lock:
+                self.provisioning -= 1
+                if ready:
+                    self.idle.append(name)
+            if not ready:
+                POOL_LOG.log("Redis Pod %s is not Ready, deleting it"
+                             % name)
+                try:
+                    k8s.delete_pooled_redis(name, self.namespace)
+                except Exception as e:
+                    POOL_LOG.log("Error deleting %s: %s" % (name, e))
+
+    def start_thread(self, target, *args):
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+        self.thread = thread
+
+
+POOL = RedisPool(getattr(api, 'redis_pool_size', 0))
@@ -0,0 +1,84 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class StageGraph(object):
+    """ Runs a set of stages, each one in its own thread as soon as
+    every stage it requires has finished. When a stage fails, no other
+    stage is started, the running ones are waited for, and the error
+    is raised.
+
+    The time each stage started, relative to the start of the graph,
+    and how long it took are kept in ``timings``.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.results = {}
+        self.timings = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, function, requires=()):
+        for required in requires:
+            if required not in self.stages:
+                raise ValueError("Unknown stage required by %s: %s"
+                                 % (name, required))
+        self.stages[name] = (function, tuple(requires))
+
+    def run(self):
+        start = time.time()
+        pending = dict(self.stages)
+        running = {}
+        error = None
+
+        with ThreadPoolExecutor(max_workers=max(len(pending), 1)) as pool:
+            while pending or running:
+                if error is None:
+                    for name in [n for n, (f, requires) in pending.items()
+                                 if all(r in self.results for r in requires)]:
+                        function = pending.pop(name)[0]
+                        running[pool.submit(self.run_stage, name,
+                                            function, start)] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        error = error or e
+
+        if error is not None:
+            raise error
+        return self.results
+
+    def run_stage(self, name, function, start):
+        stage_start = time.time()
+        try:
+            return function()
+        finally:
+            with self.lock:
+                self.timings[name] = {
+                    'start': round(stage_start - start, 3),
+                    'duration': round(time.time() - stage_start, 3)
+                }
@@ -20,14 +20,18 @@ import six
 import threading
 import time
 import uuid
+import zlib
 
 from broker.service import api
+from broker.service import state_flusher
 from broker.plugins import base
-from broker.persistence.etcd_db import plugin as etcd
-from broker.persistence.sqlite import plugin as sqlite
+from broker.persistence import codec
+from broker.persistence import connectors
 from broker.utils import ids
 from broker.utils import logger
+from broker.utils import stages
 from broker.utils.plugins import k8s
+from broker.utils.plugins import redis_pool
 from broker.utils.framework import monitor, controller, visualizer
 from broker import exceptions as ex
 
@@ -36,6 +40,30 @@ KUBEJOBS_LOG = logger.Log("KubeJobsPlugin", "logs/kubejobs.log")
 application_time_log = \
     logger.Log("Application_time", "logs/application_time.log")
 
+# Statuses kept by a job that is not found in the cluster: the ones it
+# reached on its own, and 'created' while it was never started
+NOT_FOUND_KEPT_STATES = [state for state in codec.FINAL_STATES
+                         if state not in ('terminated', 'not found')]
+NOT_FOUND_KEPT_STATES.append('created')
+
+# RPUSH commands sent to Redis before waiting for their replies
+PUSH_PIPELINE_DEPTH = 8
+
+# Bytes read from the workload download at a time
+WORKLOAD_READ_SIZE = 64 * 1024
+
+# Set, to the number of items, once the whole workload is in the queue
+QUEUE_SEALED_KEY = "job_sealed"
+
+# Keys deleted by each command when cleaning up a shared Redis
+REDIS_DELETE_BATCH = 1000
+
+# Attributes shown by the status view, which is rebuilt when any of
+# them differs from the values it was built from
+STATUS_VIEW_FIELDS = ('app_id', 'starting_time', 'status',
+                      'visualizer_url', 'redis_ip', 'redis_port',
+                      'report', 'queue_position')
+
 
 class KubeJobsExecutor(base.GenericApplicationExecutor):
 
@@ -48,8 +76,10 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
                  data=None, enable_detailed_report=False,
                  job_resources_lifetime=0, report={},
                  del_resources_authorization=False, finish_time=None,
-                 redis_ip=None, redis_port=None):
+                 redis_ip=None, redis_port=None, redis_prefix="",
+                 db_connector=None):
 
+        self._status_view = None
         self.job_resources_lifetime = job_resources_lifetime
         self.id = ids.ID_Generator().get_ID()
         self.app_id = app_id
@@ -57,32 +87,70 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
         self.rds = redis
         self.redis_ip = redis_ip
         self.redis_port = redis_port
+        self.redis_prefix = redis_prefix
         self.status = status
         self.job_completed = job_completed
         self.terminated = terminated
         self.visualizer_url = visualizer_url
         self.k8s = k8s
-        self.db_connector = self.get_db_connector()
+        self.db_connector = db_connector or self.get_db_connector()
+        self.state_flusher = state_flusher.FLUSHER
         self.enable_visualizer = enable_visualizer
         self.enable_detailed_report = enable_detailed_report
         self.report = report
         self.data = data
         self.finish_time = finish_time
         self.del_resources_authorization = del_resources_authorization
+        self.job_finished = threading.Event()
+        # Position in the submission queue while waiting to start
+        self.queue_position = None
+        self.queue_progress = None
+        self.startup_timings = {}
+        # When the status was last read from, or confirmed by, Kubernetes
+        self.last_synced_at = None
 
     def __repr__(self):
+        return json.dumps(self.status_view())
 
-        representation = {
-            "app_id": self.app_id,
-            "starting_time": str(self.get_application_start_time()),
-            "status": self.status,
-            "visualizer_url": self.visualizer_url,
-            "redis_ip": self.redis_ip,
-            "redis_port": self.redis_port
-        }
+    def status_view(self):
+        """ The status of the job as a dict, built again only when
+        one of the STATUS_VIEW_FIELDS differs from the values it was
+        built from. The fields are read before the view is built, so a
+        view built while one of them changes is replaced on the next
+        call. The progress of the startup, which changes in place, is
+        added on each call.
 
-        representation.update(self.report)
-        return json.dumps(representation)
+        The returned dict must not be modified.
+        """
+        fields = tuple(getattr(self, name) for name in STATUS_VIEW_FIELDS)
+        cached = self._status_view
+        if cached is not None and cached[0] == fields:
+            view = cached[1]
+        else:
+            view = {
+                "app_id": self.app_id,
+                "starting_time": str(self.get_application_start_time()),
+                "status": self.status,
+                "visualizer_url": self.visualizer_url,
+                "redis_ip": self.redis_ip,
+                "redis_port": self.redis_port
+            }
+            if self.queue_position is not None:
+                view["queue_position"] = self.queue_position
+            view.update(self.report)
+            self._status_view = (fields, view)
+
+        if self.queue_progress is None and not self.startup_timings:
+            return view
+
+        view = dict(view)
+        if self.queue_progress is not None:
+            view["queue_progress"] = dict(self.queue_progress)
+        if self.startup_timings:
+            view["startup_timings"] = dict(self.startup_timings)
+        # The report is shown over the other fields, as it always was
+        view.update(self.report)
+        return view
 
     def get_report(self):
         report = {}
@@ -128,21 +196,22 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
                           self.job_completed,
                           self.enable_visualizer,
                           self.redis_ip,
-                          self.redis_port))
+                          self.redis_port,
+                          self.redis_prefix))
 
     def get_db_connector(self):
-        if (api.plugin_name == "etcd"):
-            return etcd.Etcd3JobPersistence(api.persistence_ip,
-                                            api.persistence_port)
-
-        elif (api.plugin_name == "sqlite"):
-            return sqlite.SqliteJobPersistence()
+        return connectors.configured_job_persistence()
 
     def enable_detailed_report_if_visualizer_is_enabled(self):
         if self.data['enable_visualizer']:
             self.enable_detailed_report = True
 
     def start_application(self, data):
+        self.setup_application(data)
+        self.finish_application()
+
+    def setup_application(self, data):
+        """ Provision the services of the job and start it. """
         try:
             self.data = data
             self.persist_state()
@@ -150,40 +219,121 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
             self.enable_detailed_report_if_visualizer_is_enabled()
             self.activate_related_cluster(data)
             self.update_env_vars(data)
-            self.setup_redis()
-            database_data, datasource_type = \
-                self.setup_metric_persistence(data)
-            self.update_visualizer_info(data, database_data, self.redis_ip)
-            self.start_visualization(data)
-            self.persist_state()
-            queue_size = self.push_jobs_to_redis(data)
-            self.trigger_job(data)
+            self.run_startup_stages(data)
+
+        except Exception as ex:
+            self.fail(ex)
+            raise
+
+    def finish_application(self):
+        """ Wait for the end of a started job and finish it. """
+        try:
+            self.wait_job_finish(check_interval=1)
+
+        except Exception as ex:
+            self.fail(ex)
+            raise
+
+        KUBEJOBS_LOG.log("Application finished.")
+
+    def fail(self, ex):
+        self.terminated = True
+        self.update_application_state("error")
+        KUBEJOBS_LOG.log("ERROR: %s" % ex)
+
+    def run_startup_stages(self, data):
+        """ Provision the services of the job and start it. Redis and
+        the metrics persistence are provisioned at the same time, and
+        the queue is filled while the visualization starts. The Job is
+        only created once the visualization has started, so it is not
+        left running when the visualization fails. The time taken by
+        each stage is kept in ``startup_timings``.
+        """
+        graph = stages.StageGraph()
+        self.startup_timings = graph.timings
+        visualization_done = threading.Event()
+        visualization_errors = []
+
+        def visualization():
+            try:
+                database_data, datasource_type = graph.results['metrics']
+                self.update_visualizer_info(data, database_data,
+                                            self.redis_ip)
+                self.start_visualization(data)
+                self.persist_state()
+            except Exception as e:
+                visualization_errors.append(e)
+                raise
+            finally:
+                visualization_done.set()
+
+        def visualization_ready():
+            visualization_done.wait()
+            if visualization_errors:
+                raise visualization_errors[0]
+
+        def queue():
+            queue_size = self.fill_queue_and_trigger_job(
+                data, ready=visualization_ready)
             self.persist_state()
+            return queue_size
+
+        def monitoring():
+            database_data, datasource_type = graph.results['metrics']
             self.update_monitor_info(database_data, datasource_type,
-                                     queue_size)
+                                     graph.results['queue'])
             self.start_monitoring(data)
+
+        def controlling():
             self.add_redis_info_to_data()
             self.start_controlling(data)
-            self.wait_job_finish(check_interval=1)
 
-        except Exception as ex:
-            self.terminated = True
-            self.update_application_state("error")
-            KUBEJOBS_LOG.log("ERROR: %s" % ex)
-            raise
+        graph.add('redis', self.setup_redis)
+        graph.add('metrics', lambda: self.setup_metric_persistence(data))
+        graph.add('visualization', visualization,
+                  requires=['redis', 'metrics'])
+        # Started along with the visualization, which it waits for
+        # Also requires metrics, or it would wait on a skipped visualization
+        graph.add('queue', queue, requires=['redis', 'metrics'])
+        graph.add('monitoring', monitoring,
+                  requires=['metrics', 'queue', 'visualization'])
+        graph.add('controlling', controlling, requires=['monitoring'])
 
-        KUBEJOBS_LOG.log("Application finished.")
+        try:
+            graph.run()
+        finally:
+            KUBEJOBS_LOG.log("Startup stages of %s: %s"
+                             % (self.app_id, self.startup_timings))
 
     def add_redis_info_to_data(self):
         self.data.update({'redis_ip': self.redis_ip,
                           'redis_port': self.redis_port})
+        if self.redis_prefix:
+            self.data['redis_key_prefix'] = self.redis_prefix
+
+    def key(self, name):
+        """ Name of the Redis key ``name`` of this job, prefixed by
+        its app_id when the Redis is shared with other jobs.
+        """
+        return self.redis_prefix + name
 
     def get_workload(self, data):
-        # Download files that contains the items
-        jobs = requests.get(data['redis_workload']).text.\
-            split('\n')[:-1]
+        return list(self.stream_workload(data))
 
-        return jobs
+    def stream_workload(self, data):
+        """ Download the file that contains the items, yielding one
+        item per line as the file arrives, so only a chunk of it is
+        held in memory at a time.
+        """
+        response = requests.get(data['redis_workload'], stream=True)
+        try:
+            if response.encoding is None:
+                response.encoding = 'utf-8'
+            for line in response.iter_lines(chunk_size=WORKLOAD_READ_SIZE,
+                                            decode_unicode=True):
+                yield line
+        finally:
+            response.close()
 
     def activate_related_cluster(self, data):
         # If the cluster name is informed in data, active the cluster
@@ -192,7 +342,15 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
 
     def update_env_vars(self, data):
         # inject REDIS_HOST in the environment
-        data['env_vars']['REDIS_HOST'] = 'redis-%s' % self.app_id
+        if api.shared_redis:
+            # along with the port and the prefix of the keys of the job
+            host, port = shared_redis_address(self.app_id)
+            data['env_vars']['REDIS_HOST'] = host
+            data['env_vars']['REDIS_PORT'] = str(port)
+            data['env_vars']['REDIS_KEY_PREFIX'] = \
+                shared_key_prefix(self.app_id)
+        else:
+            data['env_vars']['REDIS_HOST'] = 'redis-%s' % self.app_id
 
         # inject SCONE_CONFIG_ID in the environment
         config_id = data.get('config_id')
@@ -203,9 +361,20 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
             data['env_vars']['SCONE_CONFIG_ID'] = config_id
 
     def setup_redis(self):
-        # Provision a redis database for the job. Die in case of error.
-        self.redis_ip, self.redis_port = \
-            self.k8s.provision_redis_or_die(self.app_id)
+        if api.shared_redis:
+            # Use one of the shared servers, with namespaced keys
+            self.redis_ip, self.redis_port = \
+                shared_redis_address(self.app_id)
+            self.redis_prefix = shared_key_prefix(self.app_id)
+            if self.rds is None:
+                self.rds = shared_redis_client(self.redis_ip,
+                                               self.redis_port)
+        else:
+            # Provision a redis database for the job, taken from the pool
+            # of idle ones when there is any. Die in case of error.
+            self.redis_ip, self.redis_port = \
+                self.k8s.provision_redis_or_die(
+                    self.app_id, pod_name=redis_pool.POOL.lease())
 
         # create a new Redis client and fill the work queue
         if(self.rds is None):
@@ -263,6 +432,8 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
                     'max_replicas': self.data["control_parameters"]["max_rep"],
                     'min_replicas': self.data["control_parameters"]["min_rep"]
                     })
+        if self.redis_prefix:
+            self.data['monitor_info']['redis_key_prefix'] = self.redis_prefix
         # 'cpu_agent_port': agent_port})
 
     def _get_control_parameters(self):
@@ -291,14 +462,115 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
                 "Dashboard of the job created on: %s" %
                 (self.visualizer_url))
 
-    def push_jobs_to_redis(self, data):
+    def fill_queue_and_trigger_job(self, data, ready=None):
+        """ Fill the job queue and create the Job. By default the Job
+        is only created once the whole workload is in the queue. With
+        ``stream_queue`` set in the submission, it is created as soon
+        as the first items are, while the rest of the workload is
+        still being pushed.
+
+        When given, ``ready`` is called right before the Job is
+        created, and prevents its creation by raising. The rest of the
+        workload is then not downloaded.
+
+        Returns:
+            int -- The number of items in the queue
+        """
+        if not data.get('stream_queue', False):
+            queue_size = self.push_jobs_to_redis(data)
+            if ready is not None:
+                ready()
+            self.trigger_job(data)
+            return queue_size
+
+        first_batch = threading.Event()
+        stop = threading.Event()
+        result = {}
+
+        def producer():
+            try:
+                result['size'] = self.push_jobs_to_redis(data, first_batch,
+                                                         stop)
+            except Exception as e:
+                result['error'] = e
+            finally:
+                first_batch.set()
+
+        thread = threading.Thread(target=producer)
+        thread.daemon = True
+        thread.start()
+
+        first_batch.wait()
+        try:
+            if 'error' not in result:
+                if ready is not None:
+                    ready()
+                self.trigger_job(data)
+        except Exception:
+            stop.set()
+            raise
+        finally:
+            thread.join()
+
+        if 'error' in result:
+            raise result['error']
+        return result['size']
+
+    def push_jobs_to_redis(self, data, first_batch=None, stop=None):
 
-        jobs = self.get_workload(data)
         KUBEJOBS_LOG.log("Creating Redis queue")
-        for job in jobs:
-            self.rds.rpush("job", job)
+        return self.push_to_queue(self.stream_workload(data),
+                                  first_batch=first_batch, stop=stop)
 
-        return len(jobs)
+    def push_to_queue(self, items, total=None, first_batch=None, stop=None):
+        """ Append ``items`` to the job queue, ``redis_push_chunk_size``
+        items per RPUSH, pipelining up to PUSH_PIPELINE_DEPTH commands
+        per round trip. ``queue_progress`` is updated after each round
+        trip, and QUEUE_SEALED_KEY is set once every item is pushed.
+
+        When given, ``first_batch`` is set as soon as the first chunk
+        is in the queue, and ``stop`` is checked after each chunk: once
+        it is set, the push ends there and the queue is not sealed.
+
+        Returns:
+            int -- The number of items pushed
+        """
+        chunk_size = max(api.redis_push_chunk_size, 1)
+        pipeline = self.rds.pipeline(transaction=False)
+        self.queue_progress = {'pushed': 0, 'total': total}
+        pipeline.delete(self.key(QUEUE_SEALED_KEY))
+
+        chunk = []
+        commands = 0
+        pushed = 0
+        for item in items:
+            chunk.append(item)
+            if len(chunk) < chunk_size:
+                continue
+            pipeline.rpush(self.key("job"), *chunk)
+            pushed += len(chunk)
+            chunk = []
+            if stop is not None and stop.is_set():
+                return pushed
+            commands += 1
+            if commands == PUSH_PIPELINE_DEPTH or \
+               (first_batch is not None and not first_batch.is_set()):
+                pipeline.execute()
+                commands = 0
+                self.queue_progress['pushed'] = pushed
+                if first_batch is not None:
+                    first_batch.set()
+
+        if chunk:
+            pipeline.rpush(self.key("job"), *chunk)
+            pushed += len(chunk)
+        pipeline.set(self.key(QUEUE_SEALED_KEY), pushed)
+        pipeline.execute()
+        self.queue_progress = {'pushed': pushed, 'total': pushed}
+        if first_batch is not None:
+            first_batch.set()
+
+        return pushed
 
     def trigger_job(self, data):
         KUBEJOBS_LOG.log("Creating Job")
@@ -343,18 +615,29 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
         controller.start_controller_k8s(api.controller_url,
                                         self.app_id, data)
 
-    def wait_job_finish(self, check_interval=1):
-        if not self.job_completed and not self.terminated:
-            while not self.job_completed and not self.terminated:
+    def wait_job_finish(self, check_interval=1, reconciled=False):
+        """ Wait for the end of the job and finish it. A ``reconciled``
+        job has just been synchronized with the cluster, and is
+        finished even if it has already ended.
+        """
+        if reconciled or (not self.job_completed and not self.terminated):
+            # The job status is followed by the shared watcher, which
+            # wakes this thread up when the job ends. It is registered
+            # before its status is read, so that an event ending the
+            # job right after the read is not lost.
+            api.v10.job_status_watcher.register(self)
+            if not reconciled:
                 self.synchronize()
-                time.sleep(check_interval)
+            while not self.job_completed and not self.terminated:
+                self.job_finished.wait(check_interval)
+            api.v10.job_status_watcher.unregister(self.app_id)
             KUBEJOBS_LOG.log("Job finished - Status: "
                              + self.get_application_state())
             self.get_report()
             self.finish_time = datetime.datetime.now()
             self.set_job_resources_lifetime()
             self.del_resources_authorization = True
-            self.persist_state()
+            self.persist_state(flush=True)
             self.schedule_resources_deletion()
 
     def set_job_resources_lifetime(self):
@@ -375,28 +658,60 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
         else:
             self.delete_job_resources()
 
-    def delete_job_resources(self):
+    def delete_job_resources(self, raise_errors=False):
+        """ Stop the services of the job and delete its resources in
+        the cluster. A failure is logged and the job is considered
+        cleaned up anyway, unless ``raise_errors`` is set, in which
+        case it is raised and the deletion can be retried.
+
+        Every request of the deletion shares a deadline of
+        teardown_timeout seconds, and the resources already deleted by
+        a previous attempt are skipped.
+
+        Returns:
+            bool -- Whether every resource was deleted without errors
+        """
+        deadline = time.monotonic() + api.teardown_timeout
+
+        def remaining():
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                raise ex.TimeoutException(api.teardown_timeout,
+                                          "teardown of " + self.app_id,
+                                          "teardown_timeout")
+            return timeout
+
         try:
             if self.enable_visualizer:
                 visualizer.stop_visualization(api.visualizer_url,
                                               self.app_id,
-                                              self.data['visualizer_info'])
+                                              self.data['visualizer_info'],
+                                              remaining())
 
-            monitor.stop_monitor(api.monitor_url, self.app_id)
+            monitor.stop_monitor(api.monitor_url, self.app_id, remaining())
             controller.stop_controller(api.controller_url,
-                                       self.app_id)
+                                       self.app_id, remaining())
 
             self.visualizer_url = "Url is dead!"
             KUBEJOBS_LOG.log("Stoped services")
 
             # delete redis resources
             if not self.get_application_state() == 'terminated':
-                self.k8s.terminate_job(self.app_id)
+                self.k8s.terminate_job(self.app_id,
+                                       redis=not self.redis_prefix,
+                                       timeout=remaining())
+            if self.redis_prefix:
+                self.delete_redis_keys()
+            deleted = True
         except Exception:
+            if raise_errors:
+                raise
             KUBEJOBS_LOG.log("Job " + self.app_id +
                              " resources already deleted!")
+            deleted = False
         self.del_resources_authorization = False
-        self.persist_state()
+        self.persist_state(flush=True)
+        return deleted
 
     def get_application_state(self):
         return self.status
@@ -412,32 +727,72 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
 
     def update_application_state(self, state):
         self.status = state
-        self.persist_state()
+        self.persist_state(flush=state in codec.FINAL_STATES)
+
+    def delete_redis_keys(self):
+        """ Delete every key of the job from the shared Redis. """
+        if self.rds is None:
+            self.rds = shared_redis_client(self.redis_ip, self.redis_port)
+
+        keys = []
+        for key in self.rds.scan_iter(match=self.redis_prefix + "*",
+                                      count=REDIS_DELETE_BATCH):
+            keys.append(key)
+            if len(keys) == REDIS_DELETE_BATCH:
+                self.rds.delete(*keys)
+                keys = []
+        if keys:
+            self.rds.delete(*keys)
 
     def terminate_job(self):
-        self.k8s.terminate_job(self.app_id)
+        if self.cancel_submission("terminated"):
+            return
+        self.k8s.terminate_job(self.app_id, redis=not self.redis_prefix)
         self.update_application_state("terminated")
         self.finish_time = datetime.datetime.now()
         self.del_resources_authorization = True
 
     def stop_application(self):
-        self.rds.delete("job")
-        self.rds.rpush("stop", "stop")
+        if self.cancel_submission("stopped"):
+            return
+        self.rds.delete(self.key("job"))
+        self.rds.rpush(self.key("stop"), "stop")
         self.finish_time = datetime.datetime.now()
         self.del_resources_authorization = True
         self.terminated = True
         self.update_application_state("stopped")
+        self.job_finished.set()
+
+    def cancel_submission(self, state):
+        """ End the job with ``state`` if it is still waiting in the
+        submission queue, before any of its resources exist.
+
+        Returns:
+            bool -- Whether the job was waiting and has been ended
+        """
+        if not api.v10.submission_queue.cancel(self):
+            return False
+        self.finish_time = datetime.datetime.now()
+        self.terminated = True
+        self.update_application_state(state)
+        self.job_finished.set()
+        return True
 
     def errors(self):
         try:
             self.rds.ping()
         except redis.exceptions.ConnectionError:
             return ()
-        return self.rds.lrange("job:errors", 0, -1)
+        return self.rds.lrange(self.key("job:errors"), 0, -1)
 
-    def persist_state(self):
-        self.db_connector.\
-            put(self.app_id, self)
+    def persist_state(self, flush=False):
+        """ Mark the state of the job to be written in the next batch
+        of the state flusher, or write it right away if ``flush``.
+        """
+        if flush:
+            self.state_flusher.flush(self)
+        else:
+            self.state_flusher.mark_dirty(self)
 
     def synchronize(self, tries=10):
         """ Infer the job state from job status in Kubernetes.
@@ -453,32 +808,46 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
         while tries > 0:
             try:
                 current_status = self.k8s.get_job_status(self.app_id)
-                if current_status.active is not None:
-                    if self.get_application_state() != 'ongoing':
-                        self.update_application_state("ongoing")
-                else:
-                    condition = current_status.conditions.pop().type
-                    if condition == 'Complete':
-                        if self.get_application_state() != 'stopped':
-                            self.job_completed = True
-                            self.update_application_state("completed")
-                        else:
-                            self.terminated = True
-                    else:
-                        self.terminated = True
-                        self.update_application_state("failed")
+                self.update_from_job_status(current_status)
                 break
             except Exception:
                 tries -= 1
                 if tries <= 0:
+                    self.mark_job_not_found()
+
+    def update_from_job_status(self, current_status):
+        """ Update the job state from a Kubernetes job status, either
+        read directly or received from the job status watcher.
+        """
+        if current_status.active is not None:
+            if self.get_application_state() != 'ongoing':
+                self.update_application_state("ongoing")
+        elif current_status.conditions:
+            condition = current_status.conditions[-1].type
+            if condition == 'Complete':
+                if self.get_application_state() != 'stopped':
+                    self.job_completed = True
+                    self.update_application_state("completed")
+                else:
                     self.terminated = True
-                    final_states = ['completed', 'failed',
-                                    'error', 'created', 'stopped']
+            else:
+                self.terminated = True
+                self.update_application_state("failed")
 
-                    if self.status not in final_states:
+        self.last_synced_at = datetime.datetime.now()
+        if self.job_completed or self.terminated:
+            self.job_finished.set()
 
-                        self.update_application_state('not found')
-                    self.persist_state()
+    def mark_job_not_found(self, flush=True):
+        """ Mark the job as not found in the cluster. Without ``flush``
+        its state is only marked to be written in the next batch.
+        """
+        self.last_synced_at = datetime.datetime.now()
+        self.terminated = True
+        if self.status not in NOT_FOUND_KEPT_STATES:
+            self.status = 'not found'
+        self.persist_state(flush=flush)
+        self.job_finished.set()
 
     def validate(self, data):
         data_model = {
@@ -555,11 +924,23 @@ class KubeJobsProvider(base.PluginInterface):
 
     def execute(self, data):
         app_id = 'kj-' + str(uuid.uuid4())[0:7]
-        executor = KubeJobsExecutor(app_id)
+        executor = KubeJobsExecutor(app_id, data=data)
+
+        # Stored while it waits, so that it is listed and queued again
+        # if the manager restarts before it starts
+        executor.persist_state(flush=True)
 
-        handling_thread = threading.Thread(target=executor.start_application,
-                                           args=(data,))
-        handling_thread.start()
+        # Started by the workers of the submission queue, which may
+        # refuse it when too many submissions are waiting
+        try:
+            api.v10.submission_queue.submit(executor, data,
+                                            data.get('cluster_name'))
+        except ex.TooManyRequestsException:
+            # A write of its state requeued by the flusher would
+            # store it again
+            executor.state_flusher.discard(app_id)
+            executor.db_connector.delete(app_id)
+            raise
         return app_id, executor
 
 
@@ -569,7 +950,7 @@ def rebuild(app_id, starting_time,
             del_resources_auth, finish_time,
             job_resources_lifetime,
             terminated, job_completed,
-            enable_visualizer, redis_ip, redis_port):
+            enable_visualizer, redis_ip, redis_port, redis_prefix=""):
 
     obj = KubeJobsExecutor(app_id=app_id,
                            starting_time=starting_time,
@@ -584,8 +965,36 @@ def rebuild(app_id, starting_time,
                            job_completed=job_completed,
                            enable_visualizer=enable_visualizer,
                            redis_ip=redis_ip,
-                           redis_port=redis_port)
+                           redis_port=redis_port,
+                           redis_prefix=redis_prefix)
     return obj
 
 
+def shared_key_prefix(app_id):
+    return "%s:" % app_id
+
+
+def shared_redis_address(app_id):
+    """ Pick the shared Redis server of ``app_id``, always the same
+    one for a given app_id.
+    """
+    shards = api.shared_redis
+    return shards[zlib.crc32(app_id.encode('utf-8')) % len(shards)]
+
+
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+def shared_redis_client(host, port):
+    """ Client of a shared Redis server, reused by every job placed on
+    it so they share its pool of connections.
+    """
+    with _shared_clients_lock:
+        if (host, port) not in _shared_clients:
+            _shared_clients[(host, port)] = redis.StrictRedis(host=host,
+                                                              port=port)
+        return _shared_clients[(host, port)]
+
+
 PLUGIN = KubeJobsProvider
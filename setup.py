@@ -35,6 +35,10 @@ setup(
 
     install_requires=['flask'],
 
+    extras_require={
+        'waitress': ['waitress'],
+    },
+
     entry_points={
         'console_scripts': [
             'broker=broker.cli.main:main',